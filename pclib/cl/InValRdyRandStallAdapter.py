@@ -7,6 +7,8 @@ from copy        import deepcopy
 from random      import Random
 from pymtl       import *
 
+from random_schedules import mk_stall_schedule
+
 #-------------------------------------------------------------------------
 # InValRdyRandStallAdapter
 #-------------------------------------------------------------------------
@@ -26,6 +28,10 @@ class InValRdyRandStallAdapter (object):
     s.rgen = Random()
     s.rgen.seed(seed)
 
+    # Stalls are drawn from the generator in batches
+
+    s.go   = mk_stall_schedule( s.rgen, stall_prob )
+
   def empty( s ):
     return s.data == None
 
@@ -33,7 +39,7 @@ class InValRdyRandStallAdapter (object):
     assert not s.empty()
     item = s.data
     s.data = None
-    s.in_.rdy.next = ( s.rgen.random() > s.stall_prob )
+    s.in_.rdy.next = next( s.go )
     return item
 
   def first( s ):
@@ -44,5 +50,5 @@ class InValRdyRandStallAdapter (object):
     if s.in_.rdy and s.in_.val:
       s.data = deepcopy(s.in_.msg)
 
-    s.in_.rdy.next = ( s.data == None ) and ( s.rgen.random() > s.stall_prob )
+    s.in_.rdy.next = ( s.data == None ) and next( s.go )
 
@@ -4,12 +4,20 @@
 # Models an inelastic pipeline at an output interface. Note that if
 # nstages is set to zero, then this essentially models a single-entry
 # bypass queue.
-
-from copy        import deepcopy
-from collections import deque
+#
+# Rather than shifting every stage of the pipeline each cycle, in-flight
+# messages are kept in a heap ordered by the time at which they leave the
+# pipeline. Time only advances on cycles where the pipeline is not stalled
+# by the output queue, so a message enqueued with a latency of n leaves
+# after n unstalled cycles, just like in an n-stage pipeline, while each
+# cycle does a constant amount of work regardless of the latency. Each
+# message can optionally be given its own latency (e.g., to model bank
+# conflicts or row buffer hits), in which case messages leave in order of
+# their ready time, one per cycle.
+
+from heapq       import heappush, heappop
 from pymtl       import *
 from pclib.cl    import OutValRdyQueueAdapter
-from pipelines   import Pipeline
 
 #-------------------------------------------------------------------------
 # OutValRdyInelasticPipeAdapter
@@ -24,22 +32,29 @@ class OutValRdyInelasticPipeAdapter (object):
     # instantiate a single-entry bypass queue adapter
     s.out_q      = OutValRdyQueueAdapter( out )
 
-    # instantiate a cycle-level pipeline
-    if s.nstages > 0:
-      s.pipe       = Pipeline( s.nstages )
+    # in-flight messages as ( ready time, sequence number, message )
+    s.pipe       = []
+    s.time       = 0
+    s.seq        = 0
+    s.enq_time   = -1
 
   def full( s ):
     if s.nstages == 0:
       return s.out_q.full()
     else:
-      return not s.pipe.data[0] == None
+      return s.enq_time == s.time
 
-  def enq( s, item ):
+  def enq( s, item, latency=None ):
     assert not s.full()
     if s.nstages == 0:
       s.out_q.enq( item )
     else:
-      s.pipe.insert( item )
+      if latency is None:
+        latency = s.nstages
+      assert latency > 0
+      heappush( s.pipe, ( s.time + latency, s.seq, item ) )
+      s.seq     += 1
+      s.enq_time = s.time
 
   def xtick( s ):
 
@@ -53,14 +68,19 @@ class OutValRdyInelasticPipeAdapter (object):
       if not s.out_q.full():
 
         # Items graduating from pipeline, add to output queue
-        if s.pipe.ready():
-          s.out_q.enq( s.pipe.remove() )
+        if s.pipe and s.pipe[0][0] <= s.time + 1:
+          s.out_q.enq( heappop( s.pipe )[2] )
 
         # Advance the pipeline
-        s.pipe.advance()
+        s.time += 1
 
   def __str__( s ):
     if s.nstages > 0:
-      return ''.join([ ("*" if x != None else ' ') for x in s.pipe.data ])
+      stages = [ ' ' ] * s.nstages
+      for ready, seq, item in s.pipe:
+        stage = s.nstages - ( ready - s.time )
+        if stage >= 0:
+          stages[ min( stage, s.nstages - 1 ) ] = '*'
+      return ''.join( stages )
     else:
       return ""
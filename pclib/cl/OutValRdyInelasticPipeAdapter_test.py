@@ -185,3 +185,61 @@ def test_valrdy_protocol( dump_vcd, nstages ):
   sim.cycle()
   sim.cycle()
   sim.cycle()
+
+#-------------------------------------------------------------------------
+# Test variable latency
+#-------------------------------------------------------------------------
+# Each message is given its own latency, so messages leave the pipeline
+# in order of their ready time rather than in the order they entered.
+
+class VariableLatencyModelCL (Model):
+
+  def __init__( s, latency_fn ):
+
+    s.in_   = InValRdyBundle  (16)
+    s.out   = OutValRdyBundle (16)
+
+    s.in_q  = InValRdyQueueAdapter( s.in_ )
+    s.out_q = OutValRdyInelasticPipeAdapter( s.out, 1 )
+
+    @s.tick_cl
+    def block():
+      s.in_q.xtick()
+      s.out_q.xtick()
+      if not s.in_q.empty() and not s.out_q.full():
+        msg = s.in_q.deq()
+        s.out_q.enq( msg, latency_fn( msg ) )
+
+  def line_trace( s ):
+    return "{}({}){}".format( s.in_, s.out_q, s.out )
+
+class VariableLatencyHarness (Model):
+
+  def __init__( s, src_msgs, sink_msgs, latency_fn ):
+
+    s.src   = TestSource             ( 16, src_msgs,  0 )
+    s.model = VariableLatencyModelCL ( latency_fn )
+    s.sink  = TestSink               ( 16, sink_msgs, 0 )
+
+    s.connect( s.src.out,   s.model.in_ )
+    s.connect( s.model.out, s.sink.in_  )
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace()   + " > " + \
+           s.model.line_trace() + " > " + \
+           s.sink.line_trace()
+
+def test_variable_latency( dump_vcd ):
+
+  # Odd messages take one cycle and even messages take six, with one
+  # message entering the pipeline every cycle
+
+  msgs    = range( 8 )
+  latency = lambda msg: 1 if msg % 2 else 6
+  order   = sorted( msgs, key=lambda i: ( i + latency( i ), i ) )
+  assert order == [ 1, 3, 0, 5, 2, 7, 4, 6 ]
+
+  run_sim( VariableLatencyHarness( msgs, order, latency ), dump_vcd )
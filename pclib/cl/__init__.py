@@ -10,6 +10,8 @@ from pipelines import Pipeline
 from adapters import InValRdyQueueAdapter
 from adapters import OutValRdyQueueAdapter
 
+from random_schedules import mk_delay_schedule, mk_stall_schedule
+
 from InValRdyRandStallAdapter      import InValRdyRandStallAdapter
 from OutValRdyInelasticPipeAdapter import OutValRdyInelasticPipeAdapter
 
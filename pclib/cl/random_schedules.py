@@ -0,0 +1,44 @@
+#=========================================================================
+# random_schedules
+#=========================================================================
+# Precomputed schedules of random delays and stalls for the randomized
+# test adapters.
+#
+# Calling Random.randint() on every transfer is surprisingly expensive
+# (it goes through several layers of Python in randrange), and with many
+# randomized ports per harness it shows up near the top of profiles. The
+# schedules below instead draw a block of samples at a time with a single
+# list comprehension, and hand them out one at a time through a
+# generator. The samples are computed exactly like randint() and the
+# stall checks computed them before, so a given seed still produces the
+# same delays and stalls.
+
+#-------------------------------------------------------------------------
+# mk_delay_schedule
+#-------------------------------------------------------------------------
+# Return an iterator of random integers in [lo, hi] drawn from rgen,
+# equivalent to calling rgen.randint( lo, hi ) for each one.
+
+def mk_delay_schedule( rgen, lo, hi, batch_size=4096 ):
+
+  width = hi - lo + 1
+  assert 0 < width < 2**53
+
+  rand = rgen.random
+  while True:
+    for delay in [ lo + int( rand() * width ) for _ in xrange( batch_size ) ]:
+      yield delay
+
+#-------------------------------------------------------------------------
+# mk_stall_schedule
+#-------------------------------------------------------------------------
+# Return an iterator of bools which are False with probability
+# stall_prob, equivalent to checking rgen.random() > stall_prob for each
+# one.
+
+def mk_stall_schedule( rgen, stall_prob, batch_size=4096 ):
+
+  rand = rgen.random
+  while True:
+    for go in [ rand() > stall_prob for _ in xrange( batch_size ) ]:
+      yield go
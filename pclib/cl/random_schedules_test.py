@@ -0,0 +1,34 @@
+#=========================================================================
+# random_schedules_test.py
+#=========================================================================
+
+import pytest
+
+from itertools import islice
+from random    import Random
+
+from random_schedules import mk_delay_schedule, mk_stall_schedule
+
+#-------------------------------------------------------------------------
+# test_delay_schedule
+#-------------------------------------------------------------------------
+# Schedules have to reproduce the sequences of the unbatched generator,
+# including across batch boundaries.
+
+@pytest.mark.parametrize( 'lo, hi', [ (1, 1), (1, 9), (0, 1000) ] )
+def test_delay_schedule( lo, hi ):
+  rgen   = Random( 0xb601bc01 )
+  ref    = [ rgen.randint( lo, hi ) for _ in range( 100 ) ]
+  delays = mk_delay_schedule( Random( 0xb601bc01 ), lo, hi, batch_size=7 )
+  assert list( islice( delays, 100 ) ) == ref
+
+#-------------------------------------------------------------------------
+# test_stall_schedule
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( 'stall_prob', [ 0, 0.5, 1 ] )
+def test_stall_schedule( stall_prob ):
+  rgen   = Random( 0x9dd809a6 )
+  ref    = [ rgen.random() > stall_prob for _ in range( 100 ) ]
+  stalls = mk_stall_schedule( Random( 0x9dd809a6 ), stall_prob, batch_size=7 )
+  assert list( islice( stalls, 100 ) ) == ref
@@ -5,11 +5,15 @@
 # essentially turns reads/writes into memory requests sent over a
 # port-based memory interface. We use greenlets to enable us to wait
 # until the response has come back before returning to the function
-# accessing the list.
+# accessing the list. Larger ranges can be transferred with read_block
+# and write_block, which pipeline one request per word.
 
 from greenlet import greenlet
+from pymtl    import bytes_to_uint, uint_to_bytes
 
-class BytesMemPortAdapter (object):
+from MemPortBurstAdapter import MemPortBurstAdapter
+
+class BytesMemPortAdapter (MemPortBurstAdapter):
 
   #-----------------------------------------------------------------------
   # Constructor
@@ -152,6 +156,47 @@ class BytesMemPortAdapter (object):
     s.memreq.val.next  = 0
     s.memresp.rdy.next = 0
 
+  #-----------------------------------------------------------------------
+  # read_block
+  #-----------------------------------------------------------------------
+  # Read nbytes starting at addr with one request per (aligned) word, and
+  # return them as a bytearray.
+
+  def read_block( s, addr, nbytes ):
+
+    reqs  = [ ( s.MemReqMsgType.TYPE_READ, addr, nbytes, 0 )
+              for addr, nbytes in s._words( addr, nbytes ) ]
+    data  = bytearray()
+    for value in s._burst( reqs ):
+      data += uint_to_bytes( value, value.nbits/8 )
+    return data
+
+  #-----------------------------------------------------------------------
+  # write_block
+  #-----------------------------------------------------------------------
+  # Write the bytes in data starting at addr with one request per
+  # (aligned) word.
+
+  def write_block( s, addr, data ):
+
+    data = bytearray( data )
+    reqs = []
+    pos  = 0
+    for addr, nbytes in s._words( addr, len( data ) ):
+      reqs.append( ( s.MemReqMsgType.TYPE_WRITE, addr, nbytes,
+                     bytes_to_uint( data[ pos : pos + nbytes ] ) ) )
+      pos += nbytes
+    s._burst( reqs )
+
+  def _words( s, addr, nbytes ):
+    addr        = int( addr )
+    word_nbytes = s.memreq.msg.data.nbits/8
+    end         = addr + int( nbytes )
+    while addr < end:
+      nbytes = min( word_nbytes - addr % word_nbytes, end - addr )
+      yield addr, nbytes
+      addr += nbytes
+
   #-----------------------------------------------------------------------
   # line_trace
   #-----------------------------------------------------------------------
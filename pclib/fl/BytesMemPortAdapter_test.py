@@ -27,6 +27,12 @@ def mem_copy( mem, src_ptr, dest_ptr, nbytes ):
   for i in range(nbytes):
     mem[dest_ptr+i] = mem[src_ptr+i]
 
+# Same copy using block transfers
+
+def mem_copy_block( mem, src_ptr, dest_ptr, nbytes ):
+
+  mem.write_block( dest_ptr, mem.read_block( src_ptr, nbytes ) )
+
 #-------------------------------------------------------------------------
 # Test for underlying mem_copy
 #-------------------------------------------------------------------------
@@ -59,7 +65,7 @@ class MemCopy (Model):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, mem_ifc_types, src_ptr, dest_ptr, nbytes ):
+  def __init__( s, mem_ifc_types, src_ptr, dest_ptr, nbytes, block=False ):
 
     s.src_ptr  = src_ptr
     s.dest_ptr = dest_ptr
@@ -88,10 +94,12 @@ class MemCopy (Model):
     # BytesMemPortAdapter object will return the data and the underlying
     # mem_copy function will move onto writing the memory.
 
+    copy = mem_copy_block if block else mem_copy
+
     @s.tick_fl
     def logic():
       if not s.reset:
-        mem_copy( s.mem, s.src_ptr, s.dest_ptr, s.nbytes )
+        copy( s.mem, s.src_ptr, s.dest_ptr, s.nbytes )
         s.done = True
 
   #-----------------------------------------------------------------------
@@ -114,11 +122,12 @@ class MemCopy (Model):
 
 class TestHarness( Model ):
 
-  def __init__( s, src_ptr, dest_ptr, nbytes, stall_prob, latency ):
+  def __init__( s, src_ptr, dest_ptr, nbytes, stall_prob, latency,
+                block=False ):
 
     # Instantiate models
 
-    s.mcopy = MemCopy( MemMsg4B(), src_ptr, dest_ptr, nbytes )
+    s.mcopy = MemCopy( MemMsg4B(), src_ptr, dest_ptr, nbytes, block )
     s.mem   = TestMemory( MemMsg4B(), 1, stall_prob, latency )
 
     # Connect models
@@ -133,12 +142,11 @@ class TestHarness( Model ):
     return s.mcopy.line_trace() + " " + s.mem.line_trace()
 
 #-------------------------------------------------------------------------
-# test
+# run_test
 #-------------------------------------------------------------------------
 
-@pytest.mark.parametrize( "stall_prob,latency",
-                          [ (0,0), (0.2,2), (0.5,4) ] )
-def test( dump_vcd, stall_prob, latency ):
+def run_test( dump_vcd, stall_prob, latency, src_ptr=0x1000, dest_ptr=0x2000,
+              block=False ):
 
   # Test data we want to write into memory
 
@@ -150,13 +158,14 @@ def test( dump_vcd, stall_prob, latency ):
 
   # Instantiate and elaborate the model
 
-  th = TestHarness( 0x1000, 0x2000, len(data_bytes), stall_prob, latency )
+  th = TestHarness( src_ptr, dest_ptr, len(data_bytes), stall_prob, latency,
+                    block )
   th.vcd_file = dump_vcd
   th.elaborate()
 
   # Write the data into the test memory
 
-  th.mem.write_mem( 0x1000, data_bytes )
+  th.mem.write_mem( src_ptr, data_bytes )
 
   # Create a simulator using the simulation tool
 
@@ -171,6 +180,8 @@ def test( dump_vcd, stall_prob, latency ):
     sim.print_line_trace()
     sim.cycle()
 
+  ncycles = sim.ncycles
+
   # Add a couple extra ticks so that the VCD dump is nicer
 
   sim.cycle()
@@ -179,7 +190,7 @@ def test( dump_vcd, stall_prob, latency ):
 
   # Read the data back out of the test memory
 
-  result_bytes = th.mem.read_mem( 0x2000, len(data_bytes) )
+  result_bytes = th.mem.read_mem( dest_ptr, len(data_bytes) )
 
   # Convert result bytes into list of ints
 
@@ -189,3 +200,35 @@ def test( dump_vcd, stall_prob, latency ):
 
   assert result == data
 
+  return ncycles
+
+#-------------------------------------------------------------------------
+# test
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "stall_prob,latency",
+                          [ (0,0), (0.2,2), (0.5,4) ] )
+def test( dump_vcd, stall_prob, latency ):
+  run_test( dump_vcd, stall_prob, latency )
+
+#-------------------------------------------------------------------------
+# test_block
+#-------------------------------------------------------------------------
+# Block transfers keep several requests in flight, including unaligned
+# blocks and responses which come back out of order.
+
+def latency_fn( memreq ):
+  return 8 - 2 * ( memreq.opaque.uint() % 4 )
+
+@pytest.mark.parametrize( "stall_prob,latency,src_ptr,dest_ptr", [
+  ( 0,   0,          0x1000, 0x2000 ),
+  ( 0.2, 2,          0x1000, 0x2000 ),
+  ( 0.5, 4,          0x1001, 0x2003 ),
+  ( 0,   latency_fn, 0x1002, 0x2000 ),
+])
+def test_block( dump_vcd, stall_prob, latency, src_ptr, dest_ptr ):
+  ncycles = run_test( dump_vcd, stall_prob, latency, src_ptr, dest_ptr,
+                      block=True )
+
+  if stall_prob == 0 and latency == 0:
+    assert ncycles < run_test( dump_vcd, stall_prob, latency ) / 4
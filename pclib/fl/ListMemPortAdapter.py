@@ -5,15 +5,18 @@
 # essentially turns reads/writes into memory requests sent over a
 # port-based memory interface. We use greenlets to enable us to wait
 # until the response has come back before returning to the function
-# accessing the list.
+# accessing the list. Ranges of the list can be transferred with
+# read_block and write_block, which pipeline one request per element.
 
 from greenlet import greenlet
 
+from MemPortBurstAdapter import MemPortBurstAdapter
+
 #-------------------------------------------------------------------------
 # ListMemPortAdapter
 #-------------------------------------------------------------------------
 
-class ListMemPortAdapter (object):
+class ListMemPortAdapter (MemPortBurstAdapter):
 
   #-----------------------------------------------------------------------
   # Constructor
@@ -154,6 +157,25 @@ class ListMemPortAdapter (object):
     s.memreq.val.next  = 0
     s.memresp.rdy.next = 0
 
+  #-----------------------------------------------------------------------
+  # read_block
+  #-----------------------------------------------------------------------
+  # Return the list of n elements starting at index idx.
+
+  def read_block( s, idx, n ):
+    reqs = [ ( s.MemReqMsgType.TYPE_READ, s.base + 4 * ( idx + i ), 4, 0 )
+             for i in range( n ) ]
+    return [ x.int() for x in s._burst( reqs ) ]
+
+  #-----------------------------------------------------------------------
+  # write_block
+  #-----------------------------------------------------------------------
+  # Write the elements in values starting at index idx.
+
+  def write_block( s, idx, values ):
+    s._burst( [ ( s.MemReqMsgType.TYPE_WRITE, s.base + 4 * ( idx + i ), 4, x )
+                for i, x in enumerate( values ) ] )
+
   def set_base( s, addr ):
     s.base = addr
     s.base_set = True
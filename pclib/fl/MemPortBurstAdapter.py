@@ -0,0 +1,103 @@
+#=========================================================================
+# MemPortBurstAdapter
+#=========================================================================
+# Base class for the memory port adapters which adds block transfers.
+# Rather than waiting for the response to each request before sending
+# the next one, a burst keeps up to max_inflight requests in flight. Each
+# in-flight request gets its own tag in the opaque field, so responses
+# can also come back out of order. A new request can be sent and a
+# response received every cycle, so we only switch back to the simulator
+# once per cycle for the whole burst instead of several times per word.
+#
+# Subclasses need to set memreq, memresp, MemReqMsgType and trace.
+
+from collections import deque
+from greenlet    import greenlet
+
+#-------------------------------------------------------------------------
+# MemPortBurstAdapter
+#-------------------------------------------------------------------------
+
+class MemPortBurstAdapter (object):
+
+  # Maximum number of requests in flight, also limited by the number of
+  # distinct opaque values
+
+  max_inflight = 16
+
+  #-----------------------------------------------------------------------
+  # _burst
+  #-----------------------------------------------------------------------
+  # Send the requests in reqs, which is a list of ( type, addr, nbytes,
+  # data ) tuples, and return the data of the responses, in the order of
+  # the requests.
+
+  def _burst( s, reqs ):
+
+    nreqs  = len( reqs )
+    resps  = [ None ] * nreqs
+    if nreqs == 0:
+      return resps
+
+    word_nbytes = s.memreq.msg.data.nbits/8
+    ntags       = min( s.max_inflight, 2**s.MemReqMsgType.opaque.nbits )
+
+    free_tags = deque( range( ntags ) )
+    inflight  = {}
+    sent      = 0
+    received  = 0
+    presented = None
+
+    s.memresp.rdy.next = 1
+
+    while True:
+
+      # Present the next request while there is a free tag
+
+      if sent < nreqs and free_tags:
+        if presented != sent:
+          type_, addr, nbytes, data = reqs[sent]
+
+          memreq_msg        = s.MemReqMsgType()
+          memreq_msg.type_  = type_
+          memreq_msg.opaque = free_tags[0]
+          memreq_msg.addr   = addr
+          memreq_msg.len    = nbytes if nbytes < word_nbytes else 0
+          memreq_msg.data   = data
+
+          s.memreq.msg.next = memreq_msg
+          presented = sent
+
+        s.memreq.val.next = 1
+      else:
+        s.memreq.val.next = 0
+
+      # Wait for the next cycle
+
+      greenlet.getcurrent().parent.switch(0)
+
+      s.trace = ":" if sent == nreqs else ";"
+
+      # Request accepted
+
+      if s.memreq.val and s.memreq.rdy:
+        inflight[ free_tags.popleft() ] = sent
+        sent   += 1
+        s.trace = "r" if reqs[ sent - 1 ][0] == s.MemReqMsgType.TYPE_READ else "w"
+
+      # Response received
+
+      if s.memresp.val and s.memresp.rdy:
+        tag = int( s.memresp.msg.opaque )
+        idx = inflight.pop( tag )
+        resps[ idx ] = s.memresp.msg.data[ 0 : reqs[ idx ][2]*8 ]
+        free_tags.append( tag )
+        received += 1
+
+        if received == nreqs:
+          break
+
+    s.trace = " "
+    s.memreq.val.next  = 0
+    s.memresp.rdy.next = 0
+    return resps
@@ -0,0 +1,188 @@
+#=========================================================================
+# MsgTrace
+#=========================================================================
+# Compact binary message traces for test sources and sinks.
+#
+# A trace file starts with an 8-byte magic string, followed by the
+# length of a JSON header as a little-endian 32-bit integer and the
+# header itself, which describes the message type:
+#
+#   { "version" : 1, "dtype" : "NetMsg_4_16_32", "nbits" : 60,
+#     "record_nbytes" : 8, "fields" : [ [ "payload", 0, 32 ], ... ] }
+#
+# The header is padded to a multiple of eight bytes, and is followed by
+# one fixed-width record per message holding the message value as a
+# little-endian unsigned integer. The number of messages is implied by
+# the file size, so traces can be written as a stream.
+#
+# MsgTraceReader memory-maps a trace and can be passed directly as the
+# messages of a TestSource or TestSink, which pull one message at a
+# time. MsgTraceRecorder records every transaction on a val/rdy interface
+# during simulation:
+#
+#   s.rec = MsgTraceRecorder( dtype, 'trace.bin' )
+#   s.connect( s.rec.msg, s.src.out.msg )
+#   s.connect( s.rec.val, s.src.out.val )
+#   s.connect( s.rec.rdy, s.src.out.rdy )
+#   ...
+#   model.rec.close()
+#
+#   s.src = TestSource( dtype, MsgTraceReader( 'trace.bin', dtype ) )
+
+import os
+import json
+import mmap
+import struct
+
+from pymtl import *
+
+MAGIC   = 'PYMTLMSG'
+VERSION = 1
+
+#-------------------------------------------------------------------------
+# mk_header
+#-------------------------------------------------------------------------
+# Return the header describing dtype, which is either a bitwidth or a
+# Bits/BitStruct instance.
+
+def mk_header( dtype ):
+
+  nbits  = dtype if isinstance( dtype, int ) else dtype.nbits
+  fields = getattr( dtype, '_bitfields', {} )
+
+  return {
+    'version'       : VERSION,
+    'dtype'         : type( dtype ).__name__ if fields else 'Bits',
+    'nbits'         : nbits,
+    'record_nbytes' : ( nbits + 7 ) // 8,
+    'fields'        : sorted( ( [ name, x.start, x.stop ]
+                                for name, x in fields.items() ),
+                              key=lambda x: x[1] ),
+  }
+
+#-------------------------------------------------------------------------
+# MsgTraceWriter
+#-------------------------------------------------------------------------
+
+class MsgTraceWriter( object ):
+
+  def __init__( s, filename, dtype ):
+
+    s.filename = filename
+    s.header   = mk_header( dtype )
+    s.nbytes   = s.header['record_nbytes']
+    s.nmsgs    = 0
+
+    header = json.dumps( s.header, sort_keys=True )
+    header = header.ljust( -( len( MAGIC ) + 4 + len( header ) ) % 8
+                           + len( header ) )
+
+    s._file = open( filename, 'wb' )
+    s._file.write( MAGIC + struct.pack( '<I', len( header ) ) + header )
+
+  def write( s, msg ):
+    s._file.write( uint_to_bytes( msg, s.nbytes ) )
+    s.nmsgs += 1
+
+  def close( s ):
+    s._file.close()
+
+  def __enter__( s ):
+    return s
+
+  def __exit__( s, *exc ):
+    s.close()
+
+#-------------------------------------------------------------------------
+# MsgTraceReader
+#-------------------------------------------------------------------------
+# Sequence of the messages in a trace file. If dtype is given it has to
+# match the header of the trace, and the messages are returned as
+# instances of dtype, otherwise they are returned as Bits.
+
+class MsgTraceReader( object ):
+
+  def __init__( s, filename, dtype=None ):
+
+    s.filename = filename
+
+    with open( filename, 'rb' ) as fd:
+
+      if fd.read( len( MAGIC ) ) != MAGIC:
+        raise ValueError( "{} is not a message trace".format( filename ) )
+
+      header_nbytes, = struct.unpack( '<I', fd.read( 4 ) )
+      s.header = json.loads( fd.read( header_nbytes ) )
+      s.offset = len( MAGIC ) + 4 + header_nbytes
+
+      if s.header['version'] != VERSION:
+        raise ValueError( "{} has unsupported version {}".format(
+                          filename, s.header['version'] ) )
+
+      size   = os.fstat( fd.fileno() ).st_size
+      s._map = mmap.mmap( fd.fileno(), 0, access=mmap.ACCESS_READ )
+
+    s.nbits  = s.header['nbits']
+    s.nbytes = s.header['record_nbytes']
+    s.nmsgs  = ( size - s.offset ) // s.nbytes
+
+    if dtype is None or isinstance( dtype, int ):
+      s._cls  = Bits
+      nbits   = dtype or s.nbits
+      match   = nbits == s.nbits
+    else:
+      s._cls  = type( dtype )
+      match   = mk_header( dtype ) == s.header
+
+    if not match:
+      raise ValueError( "Message type {} does not match the header of {}: "
+                        "{}".format( mk_header( dtype ), filename, s.header ) )
+
+  def __len__( s ):
+    return s.nmsgs
+
+  def __getitem__( s, idx ):
+    if idx < 0:
+      idx += s.nmsgs
+    if not 0 <= idx < s.nmsgs:
+      raise IndexError( "message index {} out of range".format( idx ) )
+    return s._read( s.offset + idx * s.nbytes )
+
+  def __iter__( s ):
+    for addr in xrange( s.offset, s.offset + s.nmsgs * s.nbytes, s.nbytes ):
+      yield s._read( addr )
+
+  def _read( s, addr ):
+    data = s._map[ addr : addr + s.nbytes ]
+    return s._cls( s.nbits, bytes_to_uint( data ) )
+
+  def close( s ):
+    s._map.close()
+
+#-------------------------------------------------------------------------
+# MsgTraceRecorder
+#-------------------------------------------------------------------------
+# Writes every message transferred on a val/rdy interface to a trace.
+# The ports only observe the interface, so all three are inputs which
+# have to be connected to the msg, val and rdy signals of the interface.
+
+class MsgTraceRecorder( Model ):
+
+  def __init__( s, dtype, filename ):
+
+    s.msg = InPort( dtype )
+    s.val = InPort( 1     )
+    s.rdy = InPort( 1     )
+
+    s.writer = MsgTraceWriter( filename, dtype )
+
+    @s.tick
+    def tick():
+      if not s.reset and s.val and s.rdy:
+        s.writer.write( s.msg )
+
+  def close( s ):
+    s.writer.close()
+
+  def line_trace( s ):
+    return "{:>4}".format( s.writer.nmsgs )
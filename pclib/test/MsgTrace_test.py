@@ -0,0 +1,128 @@
+#=========================================================================
+# MsgTrace_test.py
+#=========================================================================
+
+from __future__ import print_function
+
+import pytest
+
+from pymtl      import *
+from pclib.ifcs import NetMsg
+from pclib.test import TestSource, TestSink
+
+from MsgTrace   import MsgTraceWriter, MsgTraceReader, MsgTraceRecorder
+
+#-------------------------------------------------------------------------
+# Helpers
+#-------------------------------------------------------------------------
+
+def mk_msg( src, dest, opaque, payload ):
+  msg         = NetMsg( 4, 16, 32 )
+  msg.src     = src
+  msg.dest    = dest
+  msg.opaque  = opaque
+  msg.payload = payload
+  return msg
+
+msgs = [ mk_msg( i % 4, ( i + 1 ) % 4, i, 0x100 * i + i ) for i in range( 16 ) ]
+
+#-------------------------------------------------------------------------
+# test_write_read
+#-------------------------------------------------------------------------
+
+def test_write_read( tmpdir ):
+  filename = str( tmpdir.join( 'trace.bin' ) )
+  dtype    = NetMsg( 4, 16, 32 )
+
+  with MsgTraceWriter( filename, dtype ) as writer:
+    for msg in msgs:
+      writer.write( msg )
+
+  # Messages are returned as instances of dtype
+
+  trace = MsgTraceReader( filename, dtype )
+  assert len( trace ) == len( msgs )
+  assert list( trace ) == msgs
+  assert trace[-1].payload == msgs[-1].payload
+  assert type( trace[0] ) == type( dtype )
+  assert [ x[0] for x in trace.header['fields'] ] == \
+         [ 'payload', 'opaque', 'src', 'dest' ]
+
+  # Without a dtype, messages are returned as Bits
+
+  trace = MsgTraceReader( filename )
+  assert list( trace ) == msgs
+  assert trace[3].nbits == dtype.nbits
+
+  with pytest.raises( IndexError ):
+    trace[ len( msgs ) ]
+
+  # The message type has to match the header
+
+  with pytest.raises( ValueError ):
+    MsgTraceReader( filename, NetMsg( 4, 16, 16 ) )
+
+  with pytest.raises( ValueError ):
+    MsgTraceReader( filename, 8 )
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness( Model ):
+
+  def __init__( s, dtype, src_msgs, sink_msgs, filename,
+                src_delay=0, sink_delay=0 ):
+
+    s.src  = TestSource      ( dtype, src_msgs,  src_delay  )
+    s.sink = TestSink        ( dtype, sink_msgs, sink_delay )
+    s.rec  = MsgTraceRecorder( dtype, filename )
+
+    s.connect( s.src.out, s.sink.in_ )
+
+    s.connect( s.rec.msg, s.src.out.msg )
+    s.connect( s.rec.val, s.src.out.val )
+    s.connect( s.rec.rdy, s.src.out.rdy )
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace() + " > " + s.sink.line_trace() + \
+           " " + s.rec.line_trace()
+
+def run_test( model, dump_vcd ):
+  model.vcd_file = dump_vcd
+  model.elaborate()
+
+  sim = SimulationTool( model )
+
+  print()
+  sim.reset()
+  while not model.done():
+    sim.print_line_trace()
+    sim.cycle()
+
+  model.rec.close()
+
+#-------------------------------------------------------------------------
+# test_record_replay
+#-------------------------------------------------------------------------
+
+def test_record_replay( tmpdir, dump_vcd ):
+  dtype     = NetMsg( 4, 16, 32 )
+  recorded  = str( tmpdir.join( 'recorded.bin' ) )
+  replayed  = str( tmpdir.join( 'replayed.bin' ) )
+
+  # Record the messages sent from a list
+
+  run_test( TestHarness( dtype, msgs, msgs, recorded, 3, 5 ), dump_vcd )
+  assert list( MsgTraceReader( recorded, dtype ) ) == msgs
+
+  # Replay the recorded trace, streaming both source and sink
+
+  run_test( TestHarness( dtype, MsgTraceReader( recorded, dtype ),
+                         MsgTraceReader( recorded, dtype ), replayed ),
+            dump_vcd )
+
+  assert open( replayed, 'rb' ).read() == open( recorded, 'rb' ).read()
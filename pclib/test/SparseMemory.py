@@ -0,0 +1,191 @@
+#=========================================================================
+# SparseMemory
+#=========================================================================
+# Byte-addressable backing stores for the test memories which behave like
+# a fixed-size bytearray (indexing and slicing with step 1), without
+# allocating the whole address space up front.
+#
+# SparseMemory keeps a dict of fixed-size pages which are only allocated
+# on the first write to the page. Reads from pages which have never been
+# written return zeros. MappedMemory maps a (sparse) file instead, which
+# is useful for huge memory images or to share an image between
+# processes.
+
+import os
+import mmap
+
+from pymtl import bytes_to_uint, uint_to_bytes
+
+#-------------------------------------------------------------------------
+# ByteMemory
+#-------------------------------------------------------------------------
+# Common bytearray-like interface, subclasses implement read, write and
+# single byte accesses.
+
+class ByteMemory( object ):
+
+  def __len__( s ):
+    return s.nbytes
+
+  def __getitem__( s, idx ):
+    if isinstance( idx, slice ):
+      start, stop = s._slice( idx )
+      return s.read( start, stop - start )
+    return s.read_byte( s._index( idx ) )
+
+  def __setitem__( s, idx, value ):
+    if isinstance( idx, slice ):
+      start, stop = s._slice( idx )
+      value = bytearray( value )
+      if len( value ) != stop - start:
+        raise ValueError( "Cannot resize memory, slice has {} bytes but "
+                          "data has {} bytes".format( stop - start, len( value ) ) )
+      s.write( start, value )
+    else:
+      s.write_byte( s._index( idx ), value )
+
+  #-----------------------------------------------------------------------
+  # read_uint/write_uint
+  #-----------------------------------------------------------------------
+  # Read and write nbytes at addr as a little-endian unsigned integer in a
+  # single bulk transfer, rather than one byte (and one Bits slice) at a
+  # time.
+
+  def read_uint( s, addr, nbytes ):
+    nbytes = int( nbytes )
+    addr   = s._index_range( addr, nbytes )
+    return bytes_to_uint( s.read( addr, nbytes ) )
+
+  def write_uint( s, addr, nbytes, value ):
+    nbytes = int( nbytes )
+    addr   = s._index_range( addr, nbytes )
+    if not nbytes:
+      return
+    s.write( addr, uint_to_bytes( value, nbytes ) )
+
+  def _index_range( s, addr, nbytes ):
+    addr = s._index( addr )
+    if addr + nbytes > s.nbytes:
+      raise IndexError( "memory index {} out of range".format( addr + nbytes - 1 ) )
+    return addr
+
+  def _index( s, idx ):
+    idx = int( idx )  # addresses are often Bits
+    if idx < 0:
+      idx += s.nbytes
+    if not 0 <= idx < s.nbytes:
+      raise IndexError( "memory index {} out of range".format( idx ) )
+    return idx
+
+  def _slice( s, idx ):
+    start, stop, step = idx.indices( s.nbytes )
+    if step != 1:
+      raise ValueError( "memory slices must have a step of 1" )
+    return start, max( start, stop )
+
+#-------------------------------------------------------------------------
+# SparseMemory
+#-------------------------------------------------------------------------
+
+class SparseMemory( ByteMemory ):
+
+  def __init__( s, nbytes, page_nbytes=4096 ):
+
+    assert page_nbytes > 0 and page_nbytes & ( page_nbytes - 1 ) == 0, \
+      "page_nbytes must be a power of two"
+
+    s.nbytes      = nbytes
+    s.page_nbytes = page_nbytes
+    s.pages       = {}
+
+    s._shift = page_nbytes.bit_length() - 1
+    s._mask  = page_nbytes - 1
+    s._zeros = bytearray( page_nbytes )
+
+  #-----------------------------------------------------------------------
+  # read_byte/write_byte
+  #-----------------------------------------------------------------------
+
+  def read_byte( s, addr ):
+    page = s.pages.get( addr >> s._shift )
+    if page is None:
+      return 0
+    return page[ addr & s._mask ]
+
+  def write_byte( s, addr, value ):
+    s._page( addr >> s._shift )[ addr & s._mask ] = value
+
+  #-----------------------------------------------------------------------
+  # read
+  #-----------------------------------------------------------------------
+  # Return size bytes starting at addr as a bytearray.
+
+  def read( s, addr, size ):
+    data = bytearray()
+    end  = addr + size
+    while addr < end:
+      offset = addr & s._mask
+      nbytes = min( s.page_nbytes - offset, end - addr )
+      page   = s.pages.get( addr >> s._shift, s._zeros )
+      data  += page[ offset : offset + nbytes ]
+      addr  += nbytes
+    return data
+
+  #-----------------------------------------------------------------------
+  # write
+  #-----------------------------------------------------------------------
+  # Write the bytes in data starting at addr.
+
+  def write( s, addr, data ):
+    pos = 0
+    while pos < len( data ):
+      offset = addr & s._mask
+      nbytes = min( s.page_nbytes - offset, len( data ) - pos )
+      s._page( addr >> s._shift )[ offset : offset + nbytes ] = \
+        data[ pos : pos + nbytes ]
+      addr += nbytes
+      pos  += nbytes
+
+  def _page( s, idx ):
+    page = s.pages.get( idx )
+    if page is None:
+      page = s.pages[ idx ] = bytearray( s.page_nbytes )
+    return page
+
+#-------------------------------------------------------------------------
+# MappedMemory
+#-------------------------------------------------------------------------
+# The file is extended to nbytes if needed. On most filesystems the
+# extension is sparse, so only the pages which are written take up space
+# on disk.
+
+class MappedMemory( ByteMemory ):
+
+  def __init__( s, filename, nbytes ):
+
+    s.nbytes   = nbytes
+    s.filename = filename
+
+    mode = 'r+b' if os.path.exists( filename ) else 'w+b'
+    with open( filename, mode ) as fd:
+      if os.fstat( fd.fileno() ).st_size < nbytes:
+        fd.truncate( nbytes )
+      s._map = mmap.mmap( fd.fileno(), nbytes )
+
+  def read_byte( s, addr ):
+    return ord( s._map[ addr ] )
+
+  def write_byte( s, addr, value ):
+    s._map[ addr ] = chr( value )
+
+  def read( s, addr, size ):
+    return bytearray( s._map[ addr : addr + size ] )
+
+  def write( s, addr, data ):
+    s._map[ addr : addr + len( data ) ] = str( bytearray( data ) )
+
+  def flush( s ):
+    s._map.flush()
+
+  def close( s ):
+    s._map.close()
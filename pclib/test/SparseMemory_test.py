@@ -0,0 +1,117 @@
+#=========================================================================
+# SparseMemory_test.py
+#=========================================================================
+
+import pytest
+
+from pymtl        import Bits
+from SparseMemory import SparseMemory, MappedMemory
+
+#-------------------------------------------------------------------------
+# Fixtures
+#-------------------------------------------------------------------------
+
+@pytest.fixture( params=[ 'sparse', 'mapped' ] )
+def mem( request, tmpdir ):
+  if request.param == 'sparse':
+    return SparseMemory( 2**32, page_nbytes=16 )
+  else:
+    return MappedMemory( str( tmpdir.join( 'mem.bin' ) ), 2**20 )
+
+#-------------------------------------------------------------------------
+# test_zero_fill
+#-------------------------------------------------------------------------
+
+def test_zero_fill( mem ):
+  assert mem[ 0x100 ] == 0
+  assert mem[ 0x100:0x140 ] == bytearray( 0x40 )
+  assert mem[ -1 ] == 0
+
+#-------------------------------------------------------------------------
+# test_read_write
+#-------------------------------------------------------------------------
+
+def test_read_write( mem ):
+  data = bytearray( range( 100 ) )
+
+  # Writes spanning several pages
+
+  mem[ 0x1009 : 0x1009 + 100 ] = data
+  assert mem[ 0x1009 : 0x1009 + 100 ] == data
+  assert mem[ 0x1008 ] == 0
+  assert mem[ 0x1009 + 100 ] == 0
+
+  mem[ 0x1009 ] = 0xff
+  assert mem[ 0x1009 ] == 0xff
+  assert mem[ 0x1009 : 0x100b ] == bytearray( [ 0xff, 1 ] )
+
+  # Strings and lists of ints are accepted like bytearray
+
+  mem[ 0x2000 : 0x2004 ] = '\x01\x02\x03\x04'
+  mem[ 0x2004 : 0x2006 ] = [ 5, 6 ]
+  assert mem[ 0x2000 : 0x2006 ] == bytearray( [ 1, 2, 3, 4, 5, 6 ] )
+
+#-------------------------------------------------------------------------
+# test_errors
+#-------------------------------------------------------------------------
+
+def test_errors( mem ):
+  with pytest.raises( IndexError ):
+    mem[ len( mem ) ]
+  with pytest.raises( IndexError ):
+    mem[ len( mem ) ] = 1
+  with pytest.raises( ValueError ):
+    mem[ 0:4 ] = [ 1, 2 ]
+  with pytest.raises( ValueError ):
+    mem[ 0:4:2 ]
+
+#-------------------------------------------------------------------------
+# test_sparse_pages
+#-------------------------------------------------------------------------
+
+def test_sparse_pages():
+  mem = SparseMemory( 2**48, page_nbytes=4096 )
+  assert len( mem ) == 2**48
+
+  mem[ 2**40 : 2**40 + 8 ] = bytearray( 8 * [ 0xab ] )
+  mem[ 2**47 + 4095 : 2**47 + 4097 ] = bytearray( [ 1, 2 ] )
+  assert mem[ 0x1000 : 0x2000 ] == bytearray( 4096 )
+  assert sorted( mem.pages ) == [ 2**40 >> 12, 2**47 >> 12, ( 2**47 >> 12 ) + 1 ]
+
+#-------------------------------------------------------------------------
+# test_mapped_file
+#-------------------------------------------------------------------------
+
+def test_mapped_file( tmpdir ):
+  filename = str( tmpdir.join( 'mem.bin' ) )
+
+  mem = MappedMemory( filename, 2**20 )
+  mem[ 0x100 : 0x104 ] = bytearray( [ 1, 2, 3, 4 ] )
+  mem.close()
+
+  # Memory images persist in the file
+
+  mem = MappedMemory( filename, 2**20 )
+  assert mem[ 0x100 : 0x104 ] == bytearray( [ 1, 2, 3, 4 ] )
+
+#-------------------------------------------------------------------------
+# test_read_write_uint
+#-------------------------------------------------------------------------
+
+def test_read_write_uint( mem ):
+
+  # Little-endian across a page boundary
+
+  mem.write_uint( 0x100e, 4, 0xdeadbeef )
+  assert mem[ 0x100e : 0x1012 ] == bytearray( [ 0xef, 0xbe, 0xad, 0xde ] )
+  assert mem.read_uint( 0x100e, 4 ) == 0xdeadbeef
+  assert mem.read_uint( 0x100f, 2 ) == 0xadbe
+
+  # Values are truncated to nbytes, and Bits are accepted for both
+
+  mem.write_uint( Bits( 32, 0x2000 ), Bits( 2, 2 ), 0x12345 )
+  assert mem.read_uint( 0x2000, 4 ) == 0x2345
+  assert mem.read_uint( 0x2000, 0 ) == 0
+
+  with pytest.raises( IndexError ):
+    mem.read_uint( len( mem ) - 2, 4 )
@@ -12,6 +12,8 @@ from pclib.ifcs import InValRdyBundle, OutValRdyBundle
 from pclib.cl   import InValRdyRandStallAdapter
 from pclib.cl   import OutValRdyInelasticPipeAdapter
 
+from SparseMemory import SparseMemory, MappedMemory
+
 #-------------------------------------------------------------------------
 # TestMemory
 #-------------------------------------------------------------------------
@@ -19,7 +21,7 @@ from pclib.cl   import OutValRdyInelasticPipeAdapter
 class TestMemory( Model ):
 
   def __init__( s, mem_ifc_dtypes=MemMsg4B(), nports=1,
-                stall_prob=0, latency=0, mem_nbytes=2**20 ):
+                stall_prob=0, latency=0, mem_nbytes=2**20, mem_file=None ):
 
     # Interface
 
@@ -38,13 +40,23 @@ class TestMemory( Model ):
     for req in s.reqs:
       s.reqs_q.append( InValRdyRandStallAdapter( req, stall_prob ) )
 
+    # The latency is either a fixed number of cycles, or a function
+    # returning the latency (at least one cycle) of each request
+
+    s.latency_fn = latency if callable( latency ) else None
+    nstages      = 1       if callable( latency ) else latency
+
     s.resps_q = []
     for resp in s.resps:
-      s.resps_q.append( OutValRdyInelasticPipeAdapter( resp, latency ) )
+      s.resps_q.append( OutValRdyInelasticPipeAdapter( resp, nstages ) )
 
-    # Actual memory
+    # Actual memory, pages are only allocated when they are written. If
+    # mem_file is given the memory is backed by a memory-mapped file.
 
-    s.mem = bytearray( mem_nbytes )
+    if mem_file:
+      s.mem = MappedMemory( mem_file, mem_nbytes )
+    else:
+      s.mem = SparseMemory( mem_nbytes )
 
     # Local constants
 
@@ -77,6 +89,10 @@ class TestMemory( Model ):
 
           memreq = req_q.deq()
 
+          # Latency of this request, None for the fixed latency
+
+          latency = s.latency_fn( memreq ) if s.latency_fn else None
+
           # When len is zero, then we use all of the data
 
           nbytes = memreq.len
@@ -87,29 +103,26 @@ class TestMemory( Model ):
 
           if memreq.type_ == MemReqMsg.TYPE_READ:
 
-            # Copy the bytes from the bytearray into read data bits
+            # Copy the bytes from the memory into read data bits
 
-            read_data = Bits( s.data_nbits )
-            for j in range( nbytes ):
-              read_data[j*8:j*8+8] = s.mem[ memreq.addr + j ]
+            read_data = Bits( s.data_nbits, s.mem.read_uint( memreq.addr, nbytes ) )
 
             # Create and enqueue response message
 
-            resp_q.enq( s.mk_rd_resp( memreq.opaque, memreq.len, read_data ) )
+            resp_q.enq( s.mk_rd_resp( memreq.opaque, memreq.len, read_data ),
+                        latency )
 
           # Handle a write request
 
           elif memreq.type_ == MemReqMsg.TYPE_WRITE:
 
-            # Copy write data bits into bytearray
+            # Copy write data bits into memory
 
-            write_data = memreq.data
-            for j in range( nbytes ):
-              s.mem[ memreq.addr + j ] = write_data[j*8:j*8+8].uint()
+            s.mem.write_uint( memreq.addr, nbytes, memreq.data )
 
             # Create and enqueu response message
 
-            resp_q.enq( s.mk_wr_resp( memreq.opaque, 0 ) )
+            resp_q.enq( s.mk_wr_resp( memreq.opaque, 0 ), latency )
 
           # AMOS
 
@@ -121,25 +134,22 @@ class TestMemory( Model ):
 
             req_data = memreq.data
 
-            # Copy the bytes from the bytearray into read data bits
+            # Copy the bytes from the memory into read data bits
 
-            read_data = Bits( s.data_nbits )
-            for j in range( nbytes ):
-              read_data[j*8:j*8+8] = s.mem[ memreq.addr + j ]
+            read_data = Bits( s.data_nbits, s.mem.read_uint( memreq.addr, nbytes ) )
 
             # compute the data to be written
 
             write_data = AMO_FUNS[ memreq.type_.uint() ]( read_data, req_data )
 
-            # Copy write data bits into bytearray
+            # Copy write data bits into memory
 
-            for j in range( nbytes ):
-              s.mem[ memreq.addr + j ] = write_data[j*8:j*8+8].uint()
+            s.mem.write_uint( memreq.addr, nbytes, write_data )
 
             # Create and enqueue response message
 
             resp_q.enq( s.mk_misc_resp( memreq.type_, memreq.opaque,
-                                        memreq.len, read_data ) )
+                                        memreq.len, read_data ), latency )
 
           # Unknown message type -- throw an exception
 
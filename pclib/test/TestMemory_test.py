@@ -238,6 +238,15 @@ def random_msgs( base_addr ):
 
   return msgs
 
+#-------------------------------------------------------------------------
+# latency_fn
+#-------------------------------------------------------------------------
+# Per-request latency which grows with the opaque field. Since it never
+# decreases across a stream, responses still come back in order.
+
+def latency_fn( memreq ):
+  return 1 + memreq.opaque.uint() / 4
+
 #-------------------------------------------------------------------------
 # Test Case Table
 #-------------------------------------------------------------------------
@@ -255,6 +264,7 @@ test_case_table = mk_test_case_table([
   [ "stream_stall0.0_lat4",      stream_msgs,      0.0,  4,  0,  0    ],
   [ "stream_stall0.5_lat4",      stream_msgs,      0.5,  4,  0,  0    ],
   [ "random_stall0.5_lat4_3x14", random_msgs,      0.5,  4,  3,  14   ],
+  [ "stream_stall0.5_latfn",     stream_msgs,      0.5,  latency_fn,  0,  0 ],
 ])
 
 #-------------------------------------------------------------------------
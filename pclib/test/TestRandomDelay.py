@@ -6,6 +6,7 @@ import random
 
 from pymtl      import *
 from pclib.ifcs import InValRdyBundle, OutValRdyBundle
+from pclib.cl   import mk_delay_schedule
 
 #-----------------------------------------------------------------------
 # TestRandomDelay
@@ -25,6 +26,11 @@ class TestRandomDelay( Model ):
     s.rgen = random.Random()
     s.rgen.seed(seed)
 
+    # Delays are drawn from the generator in batches
+
+    if max_random_delay > 0:
+      s.delays = mk_delay_schedule( s.rgen, 1, max_random_delay )
+
     # If the maximum random delay is set to zero, then the inputs are
     # directly connected to the outputs.
 
@@ -71,7 +77,7 @@ class TestRandomDelay( Model ):
       if in_go:
         s.buf      = s.in_.msg[:]
         s.buf_full = True
-        s.counter  = s.rgen.randint( 1, s.max_random_delay )
+        s.counter  = next( s.delays )
 
       if s.counter > 0:
         s.counter = s.counter - 1
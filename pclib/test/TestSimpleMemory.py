@@ -12,6 +12,8 @@ from pclib.ifcs import InValRdyBundle, OutValRdyBundle
 import pclib.ifcs.valrdy   as valrdy
 import pclib.ifcs.mem_msgs as mem_msgs
 
+from SparseMemory import SparseMemory, MappedMemory
+
 class TestSimpleMemory (Model):
 
   #-----------------------------------------------------------------------
@@ -19,7 +21,7 @@ class TestSimpleMemory (Model):
   #-----------------------------------------------------------------------
 
   def __init__( s, memreq_params, memresp_params, nports,
-                mem_nbytes=2**20 ):
+                mem_nbytes=2**20, mem_file=None ):
 
     # Local constant - store the number of ports
 
@@ -69,8 +71,12 @@ class TestSimpleMemory (Model):
 
     s.memreq_full = [ Wire(1) for _ in range( nports ) ]
 
-    # Actual memory
-    s.mem = bytearray( s.mem_nbytes )
+    # Actual memory, pages are only allocated when they are written. If
+    # mem_file is given the memory is backed by a memory-mapped file.
+    if mem_file:
+      s.mem = MappedMemory( mem_file, s.mem_nbytes )
+    else:
+      s.mem = SparseMemory( s.mem_nbytes )
 
     # Connect memreq_msg port list to Unpack port list
     for i in range( nports ):
@@ -127,11 +133,10 @@ class TestSimpleMemory (Model):
 
           if s.memreq_type[i] == s.memreq_params.type_read:
 
-            # Copy the bytes from the bytearray into read data bits
+            # Copy the bytes from the memory into read data bits
 
-            read_data = Bits( s.memreq_params.data_nbits )
-            for j in range( nbytes ):
-              read_data[j*8:j*8+8] = s.mem[ s.memreq_addr[i] + j ]
+            read_data = Bits( s.memreq_params.data_nbits,
+                              s.mem.read_uint( s.memreq_addr[i], nbytes ) )
 
             # Create the response message
 
@@ -143,11 +148,9 @@ class TestSimpleMemory (Model):
 
           elif s.memreq_type[i] == s.memreq_params.type_write:
 
-            # Copy write data bits into bytearray
+            # Copy write data bits into memory
 
-            write_data = s.memreq_data[i]
-            for j in range( nbytes ):
-              s.mem[ s.memreq_addr[i] + j ] = write_data[j*8:j*8+8].uint()
+            s.mem.write_uint( s.memreq_addr[i], nbytes, s.memreq_data[i] )
 
             # Create the response message
 
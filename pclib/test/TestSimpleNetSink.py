@@ -2,7 +2,7 @@
 # TestSimpleNetSink.py
 #=========================================================================
 
-from copy       import deepcopy
+from collections import Counter
 
 from pymtl      import *
 from pclib.ifcs import InValRdyBundle, OutValRdyBundle
@@ -14,6 +14,11 @@ from pclib.ifcs import InValRdyBundle, OutValRdyBundle
 # compare them to a predefined list of network messages. Each network
 # message has route information, unique sequence number and payload
 # information
+#
+# Messages can arrive in any order, so the expected and received
+# messages are kept as multisets (counts keyed by the integer value of
+# each message), which makes checking each message constant time even
+# for very large tests.
 class TestSimpleNetSink( Model ):
 
   def __init__( s, dtype, msgs ):
@@ -21,11 +26,15 @@ class TestSimpleNetSink( Model ):
     s.in_  = InValRdyBundle( dtype )
     s.done = OutPort       ( 1     )
 
-    s.msgs        = deepcopy( msgs )
-    s.recv        = []
+    s.msgs        = Counter( int( msg ) for msg in msgs )
+    s.recv        = Counter()
     s.idx         = 0
     s.msgs_len    = len( msgs )
 
+    # Keep one copy of each expected message to report unmatched ones
+
+    s.msg_strs    = { int( msg ) : str( msg ) for msg in msgs }
+
     @s.tick
     def tick():
 
@@ -46,9 +55,11 @@ class TestSimpleNetSink( Model ):
 
       if in_go:
 
+        msg = int( s.in_.msg )
+
         # Check if the msg received was valid
-        if s.in_.msg not in s.msgs:
-          if s.in_.msg in s.recv:
+        if not s.msgs[ msg ]:
+          if s.recv[ msg ]:
             raise AssertionError( "Message {} arrived twice!"
                                   .format( s.in_.msg ) )
           else:
@@ -56,8 +67,8 @@ class TestSimpleNetSink( Model ):
                                   .format( s.in_.msg ) )
 
         # Update State
-        s.msgs.remove( s.in_.msg )
-        s.recv.append( s.in_.msg )
+        s.msgs[ msg ] -= 1
+        s.recv[ msg ] += 1
         s.idx = s.idx + 1
 
       # Set the ready and done signals.
@@ -69,6 +80,29 @@ class TestSimpleNetSink( Model ):
         s.in_.rdy.next = False
         s.done.next    = True
 
+  #-----------------------------------------------------------------------
+  # unmatched
+  #-----------------------------------------------------------------------
+  # Return the expected messages which have not been received yet.
+
+  def unmatched( s ):
+    return [ s.msg_strs[ msg ]
+             for msg, count in sorted( s.msgs.items() )
+             for _ in range( count ) ]
+
+  #-----------------------------------------------------------------------
+  # check_done
+  #-----------------------------------------------------------------------
+  # Called at the end of a test (e.g., after a timeout) to report all
+  # missing messages at once.
+
+  def check_done( s ):
+    unmatched = s.unmatched()
+    if unmatched:
+      raise AssertionError( "{} of {} messages never arrived at Test Sink:\n  {}"
+                            .format( len( unmatched ), s.msgs_len,
+                                     "\n  ".join( unmatched ) ) )
+
   #-----------------------------------------------------------------------
   # Line tracing
   #-----------------------------------------------------------------------
@@ -76,4 +110,3 @@ class TestSimpleNetSink( Model ):
   def line_trace( s ):
 
     return "{} ({:2})".format( s.in_ , s.idx )
-
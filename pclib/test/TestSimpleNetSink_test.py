@@ -45,7 +45,7 @@ def mk_msg( src, dest, seqnum, payload ):
 #-------------------------------------------------------------------------
 # TestSimpleNetSink test runner
 #-------------------------------------------------------------------------
-def run_test( dump_vcd, src_msgs, sink_msgs ):
+def run_test( dump_vcd, src_msgs, sink_msgs, max_cycles=100 ):
 
   # Instantiate and elaborate the model
 
@@ -63,10 +63,12 @@ def run_test( dump_vcd, src_msgs, sink_msgs ):
   print()
 
   sim.reset()
-  while not model.done():
+  while not model.done() and sim.ncycles < max_cycles:
     sim.print_line_trace()
     sim.cycle()
 
+  model.sink.check_done()
+
   # Add a couple extra ticks so that the VCD dump is nicer
 
   sim.cycle()
@@ -176,3 +178,27 @@ def test_redundant_msgs( dump_vcd ):
   with pytest.raises( AssertionError ):
     run_test( dump_vcd, src_msgs, sink_msgs )
 
+
+#-------------------------------------------------------------------------
+# TestSimpleNetSink unit test - Missing Messages
+#-------------------------------------------------------------------------
+def test_missing_msgs( dump_vcd ):
+
+  sink_msgs = [
+            # dest src seqnum payload
+      mk_msg( 1,   0,  0,     0x00000100 ),
+      mk_msg( 1,   0,  1,     0x00000101 ),
+      mk_msg( 2,   1,  0,     0x00000210 ),
+      mk_msg( 2,   1,  1,     0x00000211 ),
+  ]
+
+  src_msgs = sink_msgs[2:3]
+
+  with pytest.raises( AssertionError ) as excinfo:
+    run_test( dump_vcd, src_msgs, sink_msgs, max_cycles=20 )
+
+  # All missing messages are reported at once
+
+  assert "3 of 4 messages" in str( excinfo.value )
+  for msg in sink_msgs[:2] + sink_msgs[3:]:
+    assert str( msg ) in str( excinfo.value )
@@ -15,15 +15,29 @@ class TestSinkError( Exception ):
 #-----------------------------------------------------------------------
 
 class TestSimpleSink( Model ):
+  '''Compares messages received on a val/rdy interface against the
+  expected messages in ``msgs``.
+
+  ``msgs`` is either a list of messages, or any other iterable (e.g., a
+  generator of expected values) which is only pulled one message at a
+  time, so that memory use does not grow with the number of messages.
+  '''
 
   def __init__( s, dtype, msgs ):
 
     s.in_  = InValRdyBundle( dtype )
     s.done = OutPort       ( 1     )
 
-    s.msgs = deepcopy( msgs )
+    if isinstance( msgs, list ):
+      msgs = deepcopy( msgs )
+
+    s.msgs = iter( msgs )
     s.idx  = 0
 
+    # Next expected message, None once all messages were received
+
+    s.msg  = next( s.msgs, None )
+
     @s.tick
     def tick():
 
@@ -40,10 +54,10 @@ class TestSimpleSink( Model ):
       in_go = s.in_.val and s.in_.rdy
 
       # If the input transaction occured, verify that it is what we
-      # expected. then increment the index.
+      # expected. then pull the next expected message.
 
       if in_go:
-        if s.in_.msg != s.msgs[s.idx]:
+        if s.in_.msg != s.msg:
 
           error_msg = """
  The test sink received an incorrect message!
@@ -56,15 +70,16 @@ class TestSimpleSink( Model ):
           raise TestSinkError( error_msg.format(
             sink_name    = s.name,
             msg_number   = s.idx,
-            expected_msg = s.msgs[s.idx],
+            expected_msg = s.msg,
             actual_msg   = s.in_.msg,
           ))
 
         s.idx = s.idx + 1
+        s.msg = next( s.msgs, None )
 
       # Set the ready and done signals.
 
-      if ( s.idx < len(s.msgs) ):
+      if s.msg is not None:
         s.in_.rdy.next = True
         s.done   .next = False
       else:
@@ -4,22 +4,27 @@
 
 from __future__ import print_function
 
+import pytest
+
 from pymtl import *
 
 from TestSimpleSource import TestSimpleSource
-from TestSimpleSink   import TestSimpleSink
+from TestSimpleSink   import TestSimpleSink, TestSinkError
 
 #-------------------------------------------------------------------------
 # TestHarness
 #-------------------------------------------------------------------------
 class TestHarness( Model ):
 
-  def __init__( s, dtype, msgs ):
+  def __init__( s, dtype, msgs, sink_msgs=None ):
+
+    if sink_msgs is None:
+      sink_msgs = msgs
 
     # Instantiate models
 
-    s.src  = TestSimpleSource ( dtype, msgs )
-    s.sink = TestSimpleSink   ( dtype, msgs )
+    s.src  = TestSimpleSource ( dtype, msgs      )
+    s.sink = TestSimpleSink   ( dtype, sink_msgs )
 
     # Connect chain
 
@@ -76,3 +81,51 @@ def test_basics( dump_vcd ):
   sim.cycle()
   sim.cycle()
 
+
+#-------------------------------------------------------------------------
+# test_stream
+#-------------------------------------------------------------------------
+# Messages are pulled lazily from generators, one at a time.
+
+def test_stream( dump_vcd ):
+
+  pulled = []
+  def gen_msgs( name, nmsgs ):
+    for i in xrange( nmsgs ):
+      pulled.append( ( name, i ) )
+      yield ( i * 0x0101 ) & 0xffff
+
+  model = TestHarness( 16, gen_msgs( 'src', 1000 ), gen_msgs( 'sink', 1000 ) )
+  model.vcd_file = dump_vcd
+  model.elaborate()
+
+  sim = SimulationTool( model )
+  sim.reset()
+  while not model.done():
+    sim.cycle()
+
+    # Neither side pulls more than one message ahead
+
+    assert len( [ x for x in pulled if x[0] == 'src'  ] ) <= model.src .idx + 1
+    assert len( [ x for x in pulled if x[0] == 'sink' ] ) <= model.sink.idx + 1
+
+  assert model.src .idx == 1000
+  assert model.sink.idx == 1000
+
+#-------------------------------------------------------------------------
+# test_stream_mismatch
+#-------------------------------------------------------------------------
+
+def test_stream_mismatch( dump_vcd ):
+
+  model = TestHarness( 16, iter( [ 1, 2, 3 ] ), ( x for x in [ 1, 2, 4 ] ) )
+  model.vcd_file = dump_vcd
+  model.elaborate()
+
+  sim = SimulationTool( model )
+  sim.reset()
+  with pytest.raises( TestSinkError ) as excinfo:
+    while not model.done():
+      sim.cycle()
+
+  assert "msg number   : 2" in str( excinfo.value )
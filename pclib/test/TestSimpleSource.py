@@ -11,15 +11,31 @@ from pclib.ifcs import OutValRdyBundle
 # TestSimpleSource
 #-----------------------------------------------------------------------
 class TestSimpleSource( Model ):
-  'Outputs data provided in ``msgs`` onto a val/rdy interface.'
+  '''Outputs data provided in ``msgs`` onto a val/rdy interface.
+
+  ``msgs`` is either a list of messages, or any other iterable (e.g., a
+  generator or a message stream read from a file) which is only pulled
+  one message at a time, so that memory use does not grow with the
+  number of messages.
+  '''
 
   def __init__( s, dtype, msgs ):
 
     s.out  = OutValRdyBundle( dtype )
     s.done = OutPort        ( 1     )
 
-    s.msgs = deepcopy( msgs )
-    s.idx  = 0
+    if isinstance( msgs, list ):
+      msgs = deepcopy( msgs )
+
+    s.msgs  = iter( msgs )
+    s.idx   = 0
+
+    # Message currently sent (None once all messages were sent), and the
+    # first message, which is shown on the bundle when there is nothing
+    # to send.
+
+    s.msg   = next( s.msgs, None )
+    s.first = s.msg
 
     @s.tick
     def tick():
@@ -27,17 +43,17 @@ class TestSimpleSource( Model ):
       # Handle reset
 
       if s.reset:
-        if s.msgs:
-          s.out.msg.next = s.msgs[0]
+        if s.first is not None:
+          s.out.msg.next = s.first
         s.out.val  .next = False
         s.done     .next = False
         return
 
       # Check if we have more messages to send.
 
-      if ( s.idx == len(s.msgs) ):
-        if s.msgs:
-          s.out.msg.next = s.msgs[0]
+      if s.msg is None:
+        if s.first is not None:
+          s.out.msg.next = s.first
         s.out.val  .next = False
         s.done     .next = True
         return
@@ -47,20 +63,21 @@ class TestSimpleSource( Model ):
 
       out_go = s.out.val and s.out.rdy
 
-      # If the output transaction occured, then increment the index.
+      # If the output transaction occured, then pull the next message.
 
       if out_go:
         s.idx = s.idx + 1
+        s.msg = next( s.msgs, None )
 
-      # The output message is always the indexed message in the list, or if
-      # we are done then it is the first message again.
+      # The output message is always the current message, or if we are
+      # done then it is the first message again.
 
-      if ( s.idx < len(s.msgs) ):
-        s.out.msg.next = s.msgs[s.idx]
+      if s.msg is not None:
+        s.out.msg.next = s.msg
         s.out.val.next = True
         s.done   .next = False
       else:
-        s.out.msg.next = s.msgs[0]
+        s.out.msg.next = s.first
         s.out.val.next = False
         s.done   .next = True
 
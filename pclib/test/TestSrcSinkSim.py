@@ -16,7 +16,8 @@ class TestSrcSinkSim( object ):
   latency insensitive interface. A user provides the model under test, a
   list of source messages to be fed into the simulation, and a list of
   exptected output messages. The simulator will handle driving the
-  simulation to completion.
+  simulation to completion. Instead of lists, the messages can also be
+  generators (or any other iterables), which are consumed lazily.
   """
 
   #-----------------------------------------------------------------------
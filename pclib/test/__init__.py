@@ -11,9 +11,11 @@ from TestVectorSimulator import TestVectorSimulator
 from TestSrcSinkSim      import TestSrcSinkSim
 
 from TestMemory          import TestMemory
+from SparseMemory        import SparseMemory, MappedMemory
 from SparseMemoryImage   import SparseMemoryImage
+from MsgTrace            import MsgTraceWriter, MsgTraceReader, MsgTraceRecorder
 
 from test_utils import mk_test_case_table
 from test_utils import run_test_vector_sim
 from test_utils import run_sim
-
+from sweep      import run_sweep
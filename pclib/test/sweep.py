@@ -0,0 +1,175 @@
+#=========================================================================
+# sweep
+#=========================================================================
+# Runs a test harness over a grid of parameters on a process pool.
+#
+# Usage:
+#
+#   def mk_harness( nentries, src_delay, sink_delay ):
+#     return TestHarness( ... )
+#
+#   records = run_sweep( mk_harness, {
+#     'nentries'   : [ 1, 2, 4, 8 ],
+#     'src_delay'  : [ 0, 3 ],
+#     'sink_delay' : [ 0, 3 ],
+#   }, structural=[ 'nentries' ], out='sweep.csv' )
+#
+# mk_harness is called with the parameters of each point and returns an
+# un-elaborated harness with a done() method, which is simulated like in
+# run_sim until it is done or times out. It has to be picklable (i.e.,
+# defined at module level) to be sent to the workers.
+#
+# Each point produces a record with its parameters, the number of
+# simulated cycles, whether it passed, the error if it failed, and the
+# wall time. Records are written to out as CSV rows as they arrive (or
+# as a JSON list at the end if the file name ends in .json), and are
+# returned in grid order.
+#
+# Points which share the values of the structural parameters are sent to
+# the same worker as one task, so that everything a worker caches for a
+# given structure (imports, translation and build caches) is only built
+# once per structure, and points with different delays reuse it.
+
+from __future__ import print_function
+
+import os
+import csv
+import json
+import time
+import itertools
+import collections
+import multiprocessing
+
+from pymtl import *
+
+#-------------------------------------------------------------------------
+# mk_sweep_points
+#-------------------------------------------------------------------------
+# Return the list of points (dicts of parameters) of a grid, which is a
+# dict mapping each parameter to a list of values (or a list of points).
+
+def mk_sweep_points( grid ):
+
+  if not isinstance( grid, dict ):
+    return [ dict( x ) for x in grid ]
+
+  names = list( grid.keys() )
+  return [ dict( zip( names, values ) )
+           for values in itertools.product( *[ grid[x] for x in names ] ) ]
+
+#-------------------------------------------------------------------------
+# run_sweep_point
+#-------------------------------------------------------------------------
+
+def run_sweep_point( mk_harness, params, max_cycles=5000 ):
+
+  record = collections.OrderedDict( sorted( params.items() ) )
+  start  = time.time()
+  sim, passed, error = None, False, ''
+
+  try:
+    model = mk_harness( **params )
+    model.elaborate()
+
+    sim = SimulationTool( model )
+    sim.reset()
+    while not model.done() and sim.ncycles < max_cycles:
+      sim.cycle()
+
+    passed = bool( model.done() )
+    if not passed:
+      error = "timed out after {} cycles".format( max_cycles )
+
+  except Exception as e:
+    error = "{}: {}".format( type( e ).__name__, str( e ).strip() )
+
+  record['cycles']  = sim.ncycles if sim else 0
+  record['passed']  = passed
+  record['error']   = error
+  record['seconds'] = time.time() - start
+  return record
+
+#-------------------------------------------------------------------------
+# _run_task
+#-------------------------------------------------------------------------
+# Worker entry point, runs all points of one structure.
+
+def _run_task( task ):
+  mk_harness, points, max_cycles = task
+  return [ ( idx, run_sweep_point( mk_harness, params, max_cycles ) )
+           for idx, params in points ]
+
+#-------------------------------------------------------------------------
+# run_sweep
+#-------------------------------------------------------------------------
+
+def run_sweep( mk_harness, grid, structural=(), jobs=None, out=None,
+               max_cycles=5000 ):
+
+  points = mk_sweep_points( grid )
+
+  # Group points by structure, or run each point as its own task if no
+  # structural parameters are given
+
+  groups = collections.OrderedDict()
+  for idx, params in enumerate( points ):
+    key = tuple( params.get( x ) for x in structural ) if structural else idx
+    groups.setdefault( key, [] ).append( ( idx, params ) )
+
+  tasks = [ ( mk_harness, x, max_cycles ) for x in groups.values() ]
+
+  jobs = jobs or int( os.environ.get( 'PYMTL_SWEEP_JOBS', 0 ) ) \
+              or multiprocessing.cpu_count()
+  jobs = min( jobs, len( tasks ) )
+
+  # Run the tasks, writing the records as they arrive
+
+  records = [ None ] * len( points )
+  writer  = _SweepWriter( out, sorted( set().union( *points ) ) +
+                          [ 'cycles', 'passed', 'error', 'seconds' ] )
+
+  if jobs <= 1:
+    results = itertools.imap( _run_task, tasks )
+  else:
+    pool    = multiprocessing.Pool( jobs )
+    results = pool.imap_unordered( _run_task, tasks )
+
+  try:
+    for result in results:
+      for idx, record in result:
+        records[ idx ] = record
+        writer.write( record )
+  finally:
+    writer.close( records )
+    if jobs > 1:
+      pool.terminate()
+      pool.join()
+
+  return records
+
+#-------------------------------------------------------------------------
+# _SweepWriter
+#-------------------------------------------------------------------------
+
+class _SweepWriter( object ):
+
+  def __init__( s, filename, fields ):
+    s.filename = filename
+    s.o        = open( filename, 'w' ) if filename else None
+    s.csv      = None
+    if s.o and not filename.endswith( '.json' ):
+      s.csv = csv.DictWriter( s.o, fields )
+      s.csv.writeheader()
+
+  def write( s, record ):
+    if not s.csv:
+      return
+    s.csv.writerow( record )
+    s.o.flush()
+
+  def close( s, records ):
+    if not s.o:
+      return
+    if s.filename.endswith( '.json' ):
+      json.dump( [ x for x in records if x ], s.o, indent=2 )
+    s.o.close()
@@ -0,0 +1,118 @@
+#=========================================================================
+# sweep_test.py
+#=========================================================================
+
+import csv
+import json
+
+from pymtl      import *
+from pclib.rtl  import NormalQueue
+from pclib.test import TestSource, TestSink
+
+from sweep      import mk_sweep_points, run_sweep
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness( Model ):
+
+  def __init__( s, nentries, src_msgs, sink_msgs, src_delay, sink_delay ):
+
+    s.src   = TestSource ( 16, src_msgs,  src_delay  )
+    s.queue = NormalQueue( nentries, 16 )
+    s.sink  = TestSink   ( 16, sink_msgs, sink_delay )
+
+    s.connect( s.src.out,   s.queue.enq )
+    s.connect( s.queue.deq, s.sink.in_  )
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace() + " > " + s.sink.line_trace()
+
+def mk_harness( nentries, src_delay, sink_delay, bad=False ):
+  msgs = range( 20 )
+  return TestHarness( nentries, msgs, msgs[::-1] if bad else msgs,
+                      src_delay, sink_delay )
+
+grid = {
+  'nentries'   : [ 2, 4 ],
+  'src_delay'  : [ 0, 3 ],
+  'sink_delay' : [ 0, 5 ],
+}
+
+#-------------------------------------------------------------------------
+# test_mk_sweep_points
+#-------------------------------------------------------------------------
+
+def test_mk_sweep_points():
+  points = mk_sweep_points( grid )
+  assert len( points ) == 8
+  assert { 'nentries' : 4, 'src_delay' : 0, 'sink_delay' : 5 } in points
+  assert mk_sweep_points( points ) == points
+
+#-------------------------------------------------------------------------
+# test_run_sweep
+#-------------------------------------------------------------------------
+
+def test_run_sweep( tmpdir ):
+
+  out     = str( tmpdir.join( 'sweep.csv' ) )
+  serial  = run_sweep( mk_harness, grid, jobs=1 )
+  records = run_sweep( mk_harness, grid, structural=[ 'nentries' ],
+                       jobs=2, out=out )
+
+  # Records are returned in grid order, with the same cycle counts for
+  # any number of workers
+
+  points = mk_sweep_points( grid )
+  assert [ dict( nentries=x['nentries'], src_delay=x['src_delay'],
+                 sink_delay=x['sink_delay'] ) for x in records ] == points
+  assert [ x['cycles'] for x in records ] == [ x['cycles'] for x in serial ]
+  assert all( x['passed'] and not x['error'] for x in records )
+
+  # Slower sources and sinks need more cycles
+
+  by_point = { ( x['nentries'], x['src_delay'], x['sink_delay'] ) : x['cycles']
+               for x in records }
+  assert by_point[ ( 2, 3, 5 ) ] > by_point[ ( 2, 0, 0 ) ]
+
+  # Records are written as CSV
+
+  with open( out ) as fd:
+    rows = list( csv.DictReader( fd ) )
+  assert sorted( int( x['cycles'] ) for x in rows ) == \
+         sorted( x['cycles'] for x in records )
+
+#-------------------------------------------------------------------------
+# test_run_sweep_failures
+#-------------------------------------------------------------------------
+
+def test_run_sweep_failures( tmpdir ):
+
+  out     = str( tmpdir.join( 'sweep.json' ) )
+  csv_out = str( tmpdir.join( 'sweep.csv'  ) )
+  records = run_sweep( mk_harness, [
+    dict( nentries=2, src_delay=0, sink_delay=0 ),
+    dict( nentries=2, src_delay=0, sink_delay=0, bad=True ),
+  ], jobs=2, out=out, max_cycles=1000 )
+
+  assert records[0]['passed']
+  assert not records[1]['passed']
+  assert records[1]['error'].startswith( 'TestSinkError' )
+  assert records[1]['cycles'] > 0
+
+  assert json.load( open( out ) ) == json.loads( json.dumps( records ) )
+
+  # Points with different parameters share one CSV header
+
+  run_sweep( mk_harness, [
+    dict( nentries=2, src_delay=0, sink_delay=0 ),
+    dict( nentries=2, src_delay=0, sink_delay=0, bad=True ),
+  ], jobs=1, out=csv_out, max_cycles=1000 )
+
+  with open( csv_out ) as fd:
+    rows = list( csv.DictReader( fd ) )
+  assert [ x['bad'] for x in rows ] == [ '', 'True' ]
@@ -6,6 +6,9 @@
 from   pymtl       import *
 import collections
 import re
+import ast
+import csv
+import struct
 
 class RunTestVectorSimError( Exception ):
   pass
@@ -76,21 +79,107 @@ def run_sim( model, dump_vcd=None, test_verilog=False, max_cycles=5000 ):
   sim.cycle()
 
 #-------------------------------------------------------------------------
-# run_test_vector_sim
+# load_test_vectors
 #-------------------------------------------------------------------------
+# Return the port names and the rows of a test vector table, which can be
+# a list whose first row contains the port names, or the name of a CSV
+# file whose first line contains the port names. If port_names is given
+# separately, all rows are test vectors, so the table can also be a NumPy
+# array or an .npy file with a 2D integer array (e.g., as written by
+# SimulationMetrics).
 
-def run_test_vector_sim( model, test_vectors, dump_vcd=None, test_verilog=False ):
+def load_test_vectors( test_vectors, port_names=None ):
 
-  # First row in test vectors contains port names
+  if isinstance( test_vectors, str ):
+    if test_vectors.endswith( '.npy' ):
+      test_vectors = _read_npy( test_vectors )
+    else:
+      test_vectors = _read_csv( test_vectors )
+  elif hasattr( test_vectors, 'tolist' ):
+    test_vectors = test_vectors.tolist()
 
-  if isinstance(test_vectors[0],str):
-    port_names = test_vectors[0].split()
-  else:
-    port_names = test_vectors[0]
+  if port_names is None:
+    port_names   = test_vectors[0]
+    test_vectors = test_vectors[1:]
+
+  if isinstance( port_names, str ):
+    port_names = port_names.split()
+
+  return list( port_names ), test_vectors
+
+def _read_csv( filename ):
+
+  def parse( value ):
+    value = value.strip()
+    return value if value == '?' else int( value, 0 )
+
+  with open( filename ) as fd:
+    rows = [ row for row in csv.reader( fd ) if row ]
+
+  if len( rows[0] ) == 1:
+    rows[0] = rows[0][0].split()
+
+  return [ [ x.strip() for x in rows[0] ] ] + \
+         [ map( parse, row ) for row in rows[1:] ]
+
+def _read_npy( filename ):
+
+  with open( filename, 'rb' ) as fd:
+
+    if fd.read( 6 ) != b'\x93NUMPY':
+      raise RunTestVectorSimError( "{} is not a .npy file".format( filename ) )
+
+    major, minor = struct.unpack( '<BB', fd.read( 2 ) )
+    header_fmt   = '<H' if major == 1 else '<I'
+    header_len,  = struct.unpack( header_fmt,
+                                  fd.read( struct.calcsize( header_fmt ) ) )
+    header       = ast.literal_eval( fd.read( header_len ).decode( 'latin1' ) )
+
+    descr = header['descr']
+    shape = header['shape']
+    codes = { 'u1':'B', 'u2':'H', 'u4':'I', 'u8':'Q',
+              'i1':'b', 'i2':'h', 'i4':'i', 'i8':'q' }
+
+    if ( descr[0] not in '<|' or descr[1:] not in codes or
+         header['fortran_order'] or len( shape ) != 2 ):
+      raise RunTestVectorSimError(
+        "{} must hold a 2D little-endian integer array, not {}"
+        .format( filename, header ) )
+
+    nrows, ncols = shape
+    data = struct.unpack( '<{}{}'.format( nrows * ncols, codes[ descr[1:] ] ),
+                          fd.read() )
+
+  return [ list( data[ i : i + ncols ] )
+           for i in xrange( 0, nrows * ncols, ncols ) ]
+
+#-------------------------------------------------------------------------
+# _resolve_port
+#-------------------------------------------------------------------------
+# Return the port of model named port_name, which is either an attribute
+# or an element of a list of ports (e.g., "in_[2]").
+
+def _resolve_port( model, port_name ):
+
+  if '[' in port_name:
+    m = re.match( r'(\w+)\[(\d+)\]', port_name )
+    if not m:
+      raise Exception("Could not parse port name: {}".format(port_name))
+    return getattr( model, m.group(1) )[int(m.group(2))]
+
+  return getattr( model, port_name )
 
-  # Remaining rows contain the actual test vectors
+#-------------------------------------------------------------------------
+# run_test_vector_sim
+#-------------------------------------------------------------------------
 
-  test_vectors = test_vectors[1:]
+def run_test_vector_sim( model, test_vectors, dump_vcd=None, test_verilog=False,
+                         port_names=None, max_errors=10 ):
+
+  # Test vectors are either a table whose first row contains port names,
+  # or a file or array of rows with the port names given separately
+
+  port_names, test_vectors = load_test_vectors( test_vectors, port_names )
 
   # Setup the model
 
@@ -103,30 +192,30 @@ def run_test_vector_sim( model, test_vectors, dump_vcd=None, test_verilog=False
 
   sim = SimulationTool( model )
 
+  # Resolve every column to its port once, rather than parsing the port
+  # names again for every row
+
+  inputs  = [ ( i, _resolve_port( model, x ) )
+              for i, x in enumerate( port_names ) if x[-1] != "*" ]
+  outputs = [ ( i, x, _resolve_port( model, x[0:-1] ) )
+              for i, x in enumerate( port_names ) if x[-1] == "*" ]
+
   # Reset model
 
   sim.reset()
   print ""
 
-  # Run the simulation
+  # Run the simulation, collecting all incorrect outputs
 
+  errors  = []
   row_num = 0
   for row in test_vectors:
     row_num += 1
 
     # Apply test inputs
 
-    for port_name, in_value in zip( port_names, row ):
-      if port_name[-1] != "*":
-
-        # Special case for lists of ports
-        if '[' in port_name:
-          m = re.match( r'(\w+)\[(\d+)\]', port_name )
-          if not m:
-            raise Exception("Could not parse port name: {}".format(port_name))
-          getattr( model, m.group(1) )[int(m.group(2))].value = in_value
-        else:
-          getattr( model, port_name ).value = in_value
+    for i, port in inputs:
+      port.value = row[i]
 
     # Evaluate combinational concurrent blocks
 
@@ -138,33 +227,10 @@ def run_test_vector_sim( model, test_vectors, dump_vcd=None, test_verilog=False
 
     # Check test outputs
 
-    for port_name, ref_value in zip( port_names, row ):
-      if port_name[-1] == "*":
-
-        # Special case for lists of ports
-        if '[' in port_name:
-          m = re.match( r'(\w+)\[(\d+)\]', port_name[0:-1] )
-          if not m:
-            raise Exception("Could not parse port name: {}".format(port_name))
-          out_value = getattr( model, m.group(1) )[int(m.group(2))]
-        else:
-          out_value = getattr( model, port_name[0:-1] )
-
-        if ( ref_value != '?' ) and ( out_value != ref_value ):
-
-          error_msg = """
- run_test_vector_sim received an incorrect value!
-  - row number     : {row_number}
-  - port name      : {port_name}
-  - expected value : {expected_msg}
-  - actual value   : {actual_msg}
-"""
-          raise RunTestVectorSimError( error_msg.format(
-            row_number   = row_num,
-            port_name    = port_name,
-            expected_msg = ref_value,
-            actual_msg   = out_value
-          ))
+    for i, port_name, port in outputs:
+      ref_value = row[i]
+      if ( ref_value != '?' ) and ( port != ref_value ):
+        errors.append( ( row_num, port_name, ref_value, str( port ) ) )
 
     # Tick the simulation
 
@@ -176,3 +242,31 @@ def run_test_vector_sim( model, test_vectors, dump_vcd=None, test_verilog=False
   sim.cycle()
   sim.cycle()
 
+  # Report all incorrect outputs at once
+
+  if errors:
+
+    error_msg = """
+  - row number     : {row_number}
+  - port name      : {port_name}
+  - expected value : {expected_msg}
+  - actual value   : {actual_msg}
+"""
+
+    summary = """
+ run_test_vector_sim received {nerrors} incorrect value(s) in {nrows} of {total} row(s)!
+""".format(
+      nerrors = len( errors ),
+      nrows   = len( set( x[0] for x in errors ) ),
+      total   = row_num,
+    )
+
+    raise RunTestVectorSimError( summary + "".join(
+      error_msg.format(
+        row_number   = row_number,
+        port_name    = port_name,
+        expected_msg = ref_value,
+        actual_msg   = out_value,
+      ) for row_number, port_name, ref_value, out_value in errors[:max_errors]
+    ) + ( "  ... and {} more\n".format( len( errors ) - max_errors )
+          if len( errors ) > max_errors else "" ) )
@@ -0,0 +1,113 @@
+#=========================================================================
+# test_utils_test.py
+#=========================================================================
+
+import struct
+import pytest
+
+from pymtl      import *
+
+from test_utils import run_test_vector_sim, RunTestVectorSimError
+
+#-------------------------------------------------------------------------
+# AccumAdder
+#-------------------------------------------------------------------------
+# Adds two inputs combinationally, and accumulates the sum.
+
+class AccumAdder( Model ):
+
+  def __init__( s, nbits ):
+
+    s.in_ = InPort[2]( nbits )
+    s.sum = OutPort( nbits )
+    s.acc = OutPort( nbits )
+
+    @s.combinational
+    def comb_logic():
+      s.sum.value = s.in_[0] + s.in_[1]
+
+    @s.tick
+    def seq_logic():
+      if s.reset:
+        s.acc.next = 0
+      else:
+        s.acc.next = s.acc + s.sum
+
+  def line_trace( s ):
+    return "{} ({}) {}".format( s.in_[0], s.sum, s.acc )
+
+test_vectors = [
+  ( 'in_[0] in_[1] sum* acc*' ),
+  [  1,     2,     3,   0    ],
+  [  2,     2,     4,   3    ],
+  [  5,     0,     5,   '?'  ],
+  [  0,     0,     0,   12   ],
+]
+
+#-------------------------------------------------------------------------
+# test_list
+#-------------------------------------------------------------------------
+
+def test_list( dump_vcd ):
+  run_test_vector_sim( AccumAdder( 8 ), test_vectors, dump_vcd )
+
+#-------------------------------------------------------------------------
+# test_csv
+#-------------------------------------------------------------------------
+
+def test_csv( dump_vcd, tmpdir ):
+  filename = str( tmpdir.join( 'vectors.csv' ) )
+  with open( filename, 'w' ) as fd:
+    fd.write( 'in_[0],in_[1],sum*,acc*\n' )
+    for row in test_vectors[1:]:
+      fd.write( ','.join( map( str, row ) ) + '\n' )
+
+  run_test_vector_sim( AccumAdder( 8 ), filename, dump_vcd )
+
+#-------------------------------------------------------------------------
+# test_npy
+#-------------------------------------------------------------------------
+# Version 1.0 .npy file with a 2D array of little-endian uint32, with the
+# port names given separately.
+
+def test_npy( dump_vcd, tmpdir ):
+  rows   = [ [ 1, 2, 3, 0 ], [ 2, 2, 4, 3 ], [ 0xff, 2, 1, 7 ] ]
+  header = "{'descr': '<u4', 'fortran_order': False, 'shape': (3, 4), }"
+  header = header.ljust( 128 - 10 - 1 ) + '\n'
+
+  filename = str( tmpdir.join( 'vectors.npy' ) )
+  with open( filename, 'wb' ) as fd:
+    fd.write( b'\x93NUMPY\x01\x00' + struct.pack( '<H', len( header ) ) )
+    fd.write( header )
+    fd.write( struct.pack( '<12I', *sum( rows, [] ) ) )
+
+  run_test_vector_sim( AccumAdder( 8 ), filename, dump_vcd,
+                       port_names='in_[0] in_[1] sum* acc*' )
+
+#-------------------------------------------------------------------------
+# test_errors
+#-------------------------------------------------------------------------
+# All incorrect values are reported at the end of the simulation.
+
+def test_errors( dump_vcd ):
+  with pytest.raises( RunTestVectorSimError ) as excinfo:
+    run_test_vector_sim( AccumAdder( 8 ), [
+      ( 'in_[0] in_[1] sum* acc*' ),
+      [  1,     2,     3,   0    ],
+      [  2,     2,     5,   3    ],
+      [  5,     0,     5,   8    ],
+      [  0,     0,     1,   12   ],
+    ], dump_vcd )
+
+  msg = str( excinfo.value )
+  assert "3 incorrect value(s) in 3 of 4 row(s)" in msg
+  assert msg.count( "row number" ) == 3
+
+  with pytest.raises( RunTestVectorSimError ) as excinfo:
+    run_test_vector_sim( AccumAdder( 8 ), [
+      ( 'in_[0] in_[1] sum*' ),
+    ] + [ [ 1, 1, 3 ] ] * 20, dump_vcd, max_errors=5 )
+
+  msg = str( excinfo.value )
+  assert msg.count( "row number" ) == 5
+  assert "... and 15 more" in msg
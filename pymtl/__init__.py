@@ -20,7 +20,8 @@ from datatypes.Bits        import Bits
 from datatypes.BitStruct   import BitStruct, BitStructDefinition, BitField
 from datatypes.helpers     import (
     get_nbits, clog2, zext, sext, concat,
-    reduce_and, reduce_or, reduce_xor
+    reduce_and, reduce_or, reduce_xor,
+    bytes_to_uint, uint_to_bytes
 )
 from datatypes.SignalValue import CreateWrappedClass
 
@@ -91,6 +92,8 @@ __all__ = [ # Model Construction
             'reduce_and',
             'reduce_or',
             'reduce_xor',
+            'bytes_to_uint',
+            'uint_to_bytes',
             # py.test decorators
             'requires_xcc',
             'requires_vmh',
@@ -4,6 +4,7 @@
 'Collection of built-in helpers functions for the PyMTL framework.'
 
 import math
+import binascii
 import operator
 
 # NOTE: circular imports between Bits and helpers, using 'import'
@@ -83,3 +84,26 @@ def reduce_xor( signal ):
   return reduce( operator.xor,
                  (signal[x] for x in reversed( xrange( signal.nbits ) ))
                )
+
+#-----------------------------------------------------------------------
+# bytes_to_uint
+#-----------------------------------------------------------------------
+# Python 2 has no int.from_bytes/int.to_bytes, so we convert through hex,
+# which is much faster than shifting in one byte at a time.
+def bytes_to_uint( data ):
+  'Return the little-endian bytes in "data" as an unsigned integer.'
+  data = bytearray( data )
+  data.reverse()
+  return int( binascii.hexlify( data ), 16 ) if data else 0
+
+#-----------------------------------------------------------------------
+# uint_to_bytes
+#-----------------------------------------------------------------------
+def uint_to_bytes( value, nbytes ):
+  'Return the low "nbytes" bytes of "value" as a little-endian bytearray.'
+  if not nbytes:
+    return bytearray()
+  value = int( value ) & ( ( 1 << ( 8 * nbytes ) ) - 1 )
+  data  = bytearray( binascii.unhexlify( '%0*x' % ( 2 * nbytes, value ) ) )
+  data.reverse()
+  return data
@@ -147,3 +147,23 @@ def test_reduce_xor():
   assert reduce_xor( Bits(3,0b101) ) == 0
   assert reduce_xor( Bits(3,0b110) ) == 0
   assert reduce_xor( Bits(3,0b000) ) == 0
+
+def test_bytes_to_uint():
+
+  assert bytes_to_uint( bytearray() )                    == 0
+  assert bytes_to_uint( bytearray( [ 0x01 ] ) )          == 0x01
+  assert bytes_to_uint( bytearray( [ 0x01, 0x02 ] ) )    == 0x0201
+  assert bytes_to_uint( '\x78\x56\x34\x12' )             == 0x12345678
+  assert bytes_to_uint( bytearray( [ 0xff ] * 9 ) )      == 2**72 - 1
+
+def test_uint_to_bytes():
+
+  assert uint_to_bytes( 0,          0 ) == bytearray()
+  assert uint_to_bytes( 0x0201,     2 ) == bytearray( [ 0x01, 0x02 ] )
+  assert uint_to_bytes( 0x0201,     4 ) == bytearray( [ 0x01, 0x02, 0, 0 ] )
+  assert uint_to_bytes( 0x12345678, 2 ) == bytearray( [ 0x78, 0x56 ] )
+  assert uint_to_bytes( -1,         3 ) == bytearray( [ 0xff ] * 3 )
+  assert uint_to_bytes( Bits( 16, 0xbeef ), 2 ) == bytearray( [ 0xef, 0xbe ] )
+
+  for value in [ 0, 1, 0xdeadbeef, 2**100 - 3 ]:
+    assert bytes_to_uint( uint_to_bytes( value, 13 ) ) == value
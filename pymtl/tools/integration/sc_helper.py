@@ -5,7 +5,12 @@
 import os
 import sys
 import shutil
-from subprocess import check_output, STDOUT, CalledProcessError
+import hashlib
+import multiprocessing
+from subprocess           import check_output, STDOUT, CalledProcessError
+from multiprocessing.pool import ThreadPool
+
+from ..translation.build_timer import BuildTimer
 
 class SystemCEnvError( Exception ): pass
 class SystemCCompileError   ( Exception ): pass
@@ -61,39 +66,127 @@ Try running the following command on your own to debug the issue.
 #-----------------------------------------------------------------------
 # compile_object
 #-----------------------------------------------------------------------
-# Compile {src_name} to {obj_name}.o
+# Compile {src_name} to {obj_name}.o. If a precompiled header is given it
+# is included before the source.
+
+sc_flags = ( '-DSYSTEMC_SIM -fPIC -shared -O1 -fstrict-aliasing '
+             '-Wall -Wno-long-long -Werror' )
 
-def compile_object( obj_name, src_name, include_dirs ):
+def compile_object( obj_name, src_name, include_dirs, pch=None ):
   
   sc_include = get_sc_dir( "SYSTEMC_INCLUDE", "includedir" )
   
   # Generate the full include folder
   include = " ".join( [ "-I. -I.. -I" + sc_include ] +
                       [ "-I" + x for x in include_dirs ] )
+
+  if pch:
+    include += " -include " + pch
   
-  compile_cmd = ( 'g++ -o {obj_name}.o -DSYSTEMC_SIM '
-                  '-fPIC -shared -O1 -fstrict-aliasing '
-                  '-Wall -Wno-long-long -Werror '
-                  ' {include} -c {src_name} '  ).format( **vars() )
+  compile_cmd = ( 'g++ -o {obj_name}.o {sc_flags} '
+                  ' {include} -c {src_name} '  ).format( sc_flags=sc_flags,
+                                                         **vars() )
   try:
     result = check_output( compile_cmd, stderr=STDOUT, shell=True )
   except CalledProcessError as e:
     raise SystemCCompileError( "\n-\n-   " + 
                                   "\n-   ".join( e.output.splitlines() ) )
 
+#-----------------------------------------------------------------------
+# compile_objects
+#-----------------------------------------------------------------------
+# Compile each source in the {obj_name: src_name} dict to {obj_name}.o.
+# Each g++ runs in a separate process, so a thread pool is enough to keep
+# all the cores busy. The number of jobs defaults to the number of CPUs
+# and can be set with the PYMTL_SYSTEMC_JOBS environment variable.
+
+def compile_objects( objs, include_dirs, jobs=None, pch=None ):
+
+  if not objs:
+    return
+
+  jobs = jobs or int( os.environ.get( 'PYMTL_SYSTEMC_JOBS', 0 ) ) \
+              or multiprocessing.cpu_count()
+  jobs = min( jobs, len( objs ) )
+
+  def compile_one( obj_src ):
+    compile_object( obj_src[0], obj_src[1], include_dirs, pch )
+
+  if jobs <= 1:
+    map( compile_one, objs.items() )
+  else:
+    pool = ThreadPool( jobs )
+    try:
+      pool.map( compile_one, objs.items() )
+    finally:
+      pool.close()
+      pool.join()
+
+#-----------------------------------------------------------------------
+# create_pch
+#-----------------------------------------------------------------------
+# Precompile systemc.h into {obj_dir}/systemc_pch_{hash}.h.gch with the
+# same flags used for the objects, and return the header to pass to
+# compile_object. A precompiled header can only be used with the flags
+# and include directories it was compiled with, so these are hashed into
+# its name and each combination gets its own header. The header is only
+# precompiled again when systemc.h changes. If the precompiled header
+# turns out to be unusable, g++ falls back on the plain header which just
+# includes systemc.h.
+
+def create_pch( obj_dir, include_dirs ):
+
+  sc_include = get_sc_dir( "SYSTEMC_INCLUDE", "includedir" )
+  sc_header  = os.path.join( sc_include, "systemc.h" )
+
+  include = " ".join( [ "-I. -I.. -I" + sc_include ] +
+                      [ "-I" + x for x in include_dirs ] )
+
+  key = hashlib.sha1( "\n".join( [ sc_flags, include, os.getcwd() ] ) )
+  key = key.hexdigest()[:16]
+  pch = os.path.join( obj_dir, "systemc_pch_{}.h".format( key ) )
+  gch = pch + ".gch"
+
+  if not os.path.exists( pch ):
+    with open( pch, "w" ) as f:
+      f.write( "#include <systemc.h>\n" )
+
+  if ( os.path.exists( gch ) and
+       os.path.getmtime( gch ) >= os.path.getmtime( sc_header ) ):
+    return pch
+
+  compile_cmd = ( 'g++ -o {gch}.tmp -x c++-header {sc_flags} '
+                  ' {include} -c {pch} ' ).format( sc_flags=sc_flags,
+                                                   **vars() )
+  try:
+    check_output( compile_cmd, stderr=STDOUT, shell=True )
+  except CalledProcessError as e:
+    raise SystemCCompileError( "\n-\n-   " + 
+                                  "\n-   ".join( e.output.splitlines() ) )
+
+  os.rename( gch + ".tmp", gch )
+  return pch
+
 #-----------------------------------------------------------------------
 # systemc_to_pymtl
 #-----------------------------------------------------------------------
-# Create a PyMTL compatible interface for SystemC.
+# Create a PyMTL compatible interface for SystemC. If a BuildTimer is
+# given, the time spent in each step is recorded in it.
 
 def systemc_to_pymtl( model, obj_dir, include_dirs, sc_module_name, 
-                      objs, c_wrapper_file, lib_file, py_wrapper_file ):
+                      objs, c_wrapper_file, lib_file, py_wrapper_file,
+                      timer=None ):
   
-  cdef = create_c_wrapper( model, sc_module_name, c_wrapper_file )  
+  timer = timer or BuildTimer()
+
+  with timer.phase( 'c wrapper' ):
+    cdef = create_c_wrapper( model, sc_module_name, c_wrapper_file )  
   
-  create_shared_lib( lib_file, c_wrapper_file, objs, include_dirs, obj_dir )
+  with timer.phase( 'g++' ):
+    create_shared_lib( lib_file, c_wrapper_file, objs, include_dirs, obj_dir )
   
-  create_py_wrapper( model, py_wrapper_file, cdef )
+  with timer.phase( 'py wrapper' ):
+    create_py_wrapper( model, py_wrapper_file, cdef )
 
 #-----------------------------------------------------------------------
 # gen_sc_datatype
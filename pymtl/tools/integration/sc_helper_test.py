@@ -0,0 +1,77 @@
+#=======================================================================
+# sc_helper_test.py
+#=======================================================================
+
+import os
+import pytest
+
+from sc_helper import compile_objects, create_pch, SystemCCompileError
+
+#-----------------------------------------------------------------------
+# Fixtures
+#-----------------------------------------------------------------------
+# A stand-in systemc.h is enough to check how objects are compiled.
+
+@pytest.fixture
+def sc_dir( tmpdir, monkeypatch ):
+  include = tmpdir.mkdir( 'include' )
+  include.join( 'systemc.h' ).write(
+    '#ifndef SYSTEMC_H\n#define SYSTEMC_H\nint sc_version();\n#endif\n' )
+  monkeypatch.setenv( 'SYSTEMC_INCLUDE', str( include ) )
+  monkeypatch.chdir( tmpdir )
+  return tmpdir
+
+def write_sources( tmpdir, n, src ):
+  objs = {}
+  for i in range( n ):
+    tmpdir.join( 'f{}.cc'.format( i ) ).write( src.format( i ) )
+    objs[ str( tmpdir.join( 'f{}'.format( i ) ) ) ] = \
+      str( tmpdir.join( 'f{}.cc'.format( i ) ) )
+  return objs
+
+#-----------------------------------------------------------------------
+# test_compile_objects
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'jobs', [ 1, 4 ] )
+def test_compile_objects( sc_dir, jobs ):
+  objs = write_sources( sc_dir, 4, 'int f{0}() {{ return {0}; }}\n' )
+  compile_objects( objs, [], jobs=jobs )
+  for obj in objs:
+    assert os.path.exists( obj + '.o' )
+
+#-----------------------------------------------------------------------
+# test_compile_objects_pch
+#-----------------------------------------------------------------------
+def test_compile_objects_pch( sc_dir ):
+  obj_dir = sc_dir.mkdir( 'obj_dir' )
+  pch     = create_pch( str( obj_dir ), [] )
+  assert os.path.exists( pch + '.gch' )
+
+  # The sources rely on the precompiled header declaring sc_version
+
+  objs = write_sources( sc_dir, 2, 'int f{0}() {{ return sc_version(); }}\n' )
+  compile_objects( objs, [], jobs=2, pch=pch )
+  for obj in objs:
+    assert os.path.exists( obj + '.o' )
+
+  # An up to date precompiled header is reused
+
+  mtime = os.path.getmtime( pch + '.gch' )
+  assert create_pch( str( obj_dir ), [] ) == pch
+  assert os.path.getmtime( pch + '.gch' ) == mtime
+
+  # Different include directories need a different precompiled header,
+  # and do not replace the existing one
+
+  pch2 = create_pch( str( obj_dir ), [ str( sc_dir.mkdir( 'inc2' ) ) ] )
+  assert pch2 != pch
+  assert os.path.exists( pch2 + '.gch' )
+  assert os.path.getmtime( pch + '.gch' ) == mtime
+
+#-----------------------------------------------------------------------
+# test_compile_objects_error
+#-----------------------------------------------------------------------
+def test_compile_objects_error( sc_dir ):
+  objs = write_sources( sc_dir, 2, 'int f{0}() {{ return }}\n' )
+  with pytest.raises( SystemCCompileError ):
+    compile_objects( objs, [], jobs=2 )
@@ -11,6 +11,7 @@ import json
 import hashlib
 import inspect
 import filecmp
+import tempfile
 import collections
 from copy import deepcopy
 from os.path import exists, basename
@@ -18,6 +19,7 @@ from shutil  import copyfile
 from sc_helper import *
 
 from ...model.metaclasses import MetaCollectArgs
+from ..translation.build_timer import BuildTimer, timing_enabled
 
 from pymtl import *
 
@@ -55,6 +57,7 @@ class SomeMeta( MetaCollectArgs ):
     
     sc_module_name  = inst.__class__.__name__  
     model_name      = inst.class_name
+    timer           = BuildTimer( model_name )
     c_wrapper_file  = model_name + '_sc.cpp'
     py_wrapper_file = model_name + '_sc.py'
     lib_file        = 'lib{}_sc.so'.format( model_name )
@@ -177,18 +180,32 @@ class SomeMeta( MetaCollectArgs ):
     else:
       # print( "Not Cached", uncached )
       
-      # Dump new hashdict
-      with open( hashfile, "w" ) as f:
-        json.dump( hashdict, f )
+      # Compile all uncached modules to .o object file in parallel,
+      # optionally including a precompiled systemc.h
+      with timer.phase( 'g++ objects' ):
+        pch = create_pch( obj_dir, include_dirs ) if inst.scpch else None
+        compile_objects( { obj: src + src_ext[obj]
+                           for obj, src in uncached.items() },
+                         include_dirs, pch=pch )
       
-      # Compile all uncached modules to .o object file
-      for obj, src in uncached.items():
-        compile_object( obj, src + src_ext[obj], include_dirs )
+      # Dump new hashdict only once the objects have been compiled, and
+      # replace the old one atomically so that an interrupted or failed
+      # build never records hashes for stale objects
+      with tempfile.NamedTemporaryFile( "w", dir=obj_dir,
+                                        delete=False ) as f:
+        json.dump( hashdict, f )
+      os.rename( f.name, hashfile )
+
+    for obj in src_ext:
+      timer.add_cache( obj + '.o', obj not in uncached )
     
     # Regenerate the shared library .so file if individual modules are 
     # updated or the .so file is missing.
     
-    if uncached or not exists( lib_file ):
+    rebuild = uncached or not exists( lib_file )
+    timer.add_cache( 'library', not rebuild )
+
+    if rebuild:
       
       # Use list for tmp_objs and all_objs to keep dependecies 
       # O(n^2) but maybe we could refine it later when we need to deal 
@@ -202,22 +219,29 @@ class SomeMeta( MetaCollectArgs ):
       systemc_to_pymtl( inst, # model instance
                         obj_dir, include_dirs, sc_module_name,
                         all_objs, c_wrapper_file, lib_file, # c wrapper
-                        py_wrapper_file # py wrapper
+                        py_wrapper_file, # py wrapper
+                        timer
                       )
     
     # Follows are the same as Translation Tool
     
     # Use some trickery to import the compiled version of the model
-    sys.path.append( os.getcwd() )
-    __import__( py_wrapper_file[:-3] )
-    imported_module = sys.modules[ py_wrapper_file[:-3] ]
+    with timer.phase( 'import' ):
+      sys.path.append( os.getcwd() )
+      __import__( py_wrapper_file[:-3] )
+      imported_module = sys.modules[ py_wrapper_file[:-3] ]
 
-    # Get the model class from the module, instantiate and elaborate it
-    model_class = imported_module.__dict__[ model_name ]
-    
-    new_inst  = model_class()
+      # Get the model class from the module, instantiate and elaborate it
+      model_class = imported_module.__dict__[ model_name ]
+      
+      new_inst  = model_class()
     new_inst.vcd_file = None
 
+    if timing_enabled():
+      timer.add_artifacts( obj_dir, lib_file, py_wrapper_file )
+      timer.print_report()
+      new_inst.build_timing = timer.as_dict()
+
     new_inst.__class__.__name__  = inst.__class__.__name__
     new_inst.__class__.__bases__ = (SystemCModel,)
     new_inst._args        = inst._args
@@ -260,6 +284,8 @@ class SystemCModel( Model ):
     modulename   Name of the Verilog module to import.
     sourcefile   List of C++ source files to be compiled
     sourcefolder List of folders which contain source files
+    scpch        Compile the sources with a precompiled systemc.h. Only
+                 use this if every source file includes systemc.h.
     
   """
   __metaclass__ = SomeMeta
@@ -268,6 +294,7 @@ class SystemCModel( Model ):
   sourcefile   = None
   sourcefolder = None
   sclinetrace  = False
+  scpch        = False
 
   _param_dict  = None
   _port_dict   = None
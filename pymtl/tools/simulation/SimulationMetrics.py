@@ -4,7 +4,30 @@
 
 from __future__ import print_function
 
+import collections
+import json
+import os
 import pickle
+import signal
+import struct
+import sys
+import threading
+import time
+
+from array import array
+
+# Use the highest resolution wall clock available for profiling.
+
+try:
+  from time   import perf_counter  as _timer
+except ImportError:
+  from timeit import default_timer as _timer
+
+# User and system CPU time of the process, as counted by ITIMER_PROF.
+
+def _cpu_time():
+  times = os.times()
+  return times[0] + times[1]
 
 #-------------------------------------------------------------------------
 # SimulationMetrics
@@ -12,12 +35,38 @@ import pickle
 # Utility class for storing various SimulationTool metrics. Useful for
 # gaining insight into simulator performace and determining the simulation
 # efficiency of hardware model implementations.
+#
+# Event and eval counts are collected per cycle and optionally summed over
+# windows of several cycles. By default all windows are kept in memory in
+# compact arrays (one entry per window in each *_per_cycle attribute). For
+# long simulations, pass a stream filename ending in .csv or .npy to write
+# windows to disk in chunks of chunk_size rows instead:
+#
+#   metrics = SimulationMetrics( stream='metrics.csv', window=10000 )
+#   sim     = SimulationTool( model, collect_metrics=metrics )
+#   ...
+#   metrics.close()
+#
+# Each streamed row contains the columns listed in FIELDS.
+#
+# Windows are only recorded once all of their cycles are complete, so
+# with window=1 the *_per_cycle attributes have one entry per completed
+# cycle (sim.ncycles entries). Events and evals after the last completed
+# cycle (e.g., from a final eval_combinational()) are recorded by close(),
+# either as part of the last partial window or as one extra entry whose
+# streamed ncycles column is zero.
 class SimulationMetrics( object ):
 
+  FIELDS = [ 'cycle', 'ncycles',
+             'input_add_events', 'clock_add_events',
+             'input_add_callbk', 'clock_add_callbk',
+             'input_comb_evals', 'clock_comb_evals',
+             'slice_comb_evals', 'redun_comb_evals' ]
+
   #-----------------------------------------------------------------------
   # __init__
   #-----------------------------------------------------------------------
-  def __init__( self ):
+  def __init__( self, stream = None, window = 1, chunk_size = 4096 ):
     self._ncycles                                = 0
     self._pre_tick                               = True
     self.num_modules                             = 0
@@ -25,16 +74,34 @@ class SimulationMetrics( object ):
     self.num_posedge_clk_blocks                  = 0
     self.num_combinational_blocks                = 0
     self.num_slice_blocks                        = 0
-    self.input_add_events_per_cycle              = [ 0 ]
-    self.clock_add_events_per_cycle              = [ 0 ]
-    self.input_add_callbk_per_cycle              = [ 0 ]
-    self.clock_add_callbk_per_cycle              = [ 0 ]
-    self.input_comb_evals_per_cycle              = [ 0 ]
-    self.clock_comb_evals_per_cycle              = [ 0 ]
-    self.slice_comb_evals_per_cycle              = [ 0 ]
-    self.redun_comb_evals_per_cycle              = [ 0 ]
+    self.window                                  = window
+    self.input_add_events_per_cycle              = array( _TYPECODE )
+    self.clock_add_events_per_cycle              = array( _TYPECODE )
+    self.input_add_callbk_per_cycle              = array( _TYPECODE )
+    self.clock_add_callbk_per_cycle              = array( _TYPECODE )
+    self.input_comb_evals_per_cycle              = array( _TYPECODE )
+    self.clock_comb_evals_per_cycle              = array( _TYPECODE )
+    self.slice_comb_evals_per_cycle              = array( _TYPECODE )
+    self.redun_comb_evals_per_cycle              = array( _TYPECODE )
+    self.totals                                  = [ 0 ] * _NCOUNTS
     self.is_slice                                = dict()
-    self.has_run                                 = dict()
+    self.last_run                                = dict()
+
+    # Counts for the current cycle and the current window, indexed by
+    # the _INPUT_* / _CLOCK_* / _SLICE / _REDUN constants below.
+
+    self._counts                                 = [ 0 ] * _NCOUNTS
+    self._window_counts                          = [ 0 ] * _NCOUNTS
+    self._window_start                           = 0
+
+    # Streaming output goes through a fixed size row buffer
+
+    self._sink                                   = None
+    if stream:
+      ncols            = len( self.FIELDS )
+      self._sink       = _open_sink( stream, ncols )
+      self._buffer     = array( _TYPECODE, [ 0 ] ) * ( chunk_size * ncols )
+      self._buffer_pos = 0
 
   #-----------------------------------------------------------------------
   # comb_evals_per_cycle
@@ -67,29 +134,45 @@ class SimulationMetrics( object ):
   #-----------------------------------------------------------------------
   # Register an eval block in the design.
   def reg_eval( self, eval, is_slice = False ):
-    self.has_run [ eval ] = False
+    self.last_run[ eval ] = -1
     self.is_slice[ eval ] = is_slice
     if is_slice:
       self.num_slice_blocks += 1
 
+  #-----------------------------------------------------------------------
+  # reg_tick
+  #-----------------------------------------------------------------------
+  # Register a sequential block in the design. Sequential blocks are
+  # already counted by reg_model().
+  def reg_tick( self, tick, model ):
+    pass
+
+  #-----------------------------------------------------------------------
+  # wrap_slice
+  #-----------------------------------------------------------------------
+  # Return the callback to register for immediate slice updates. Counting
+  # metrics do not need to intercept these.
+  def wrap_slice( self, slice_cb ):
+    return slice_cb
+
   #-----------------------------------------------------------------------
   # incr_metrics_cycle
   #-----------------------------------------------------------------------
-  # Should be called at the end of each simulation cycle. Initializes data
-  # structure storage to collect data for the next simulation cycle.
+  # Should be called at the end of each simulation cycle. Adds the counts
+  # for this cycle to the current window, and records the window once it
+  # is complete.
   def incr_metrics_cycle( self ):
-    self._pre_tick                   = True
-    self._ncycles                   += 1
-    self.input_add_events_per_cycle += [ 0 ]
-    self.clock_add_events_per_cycle += [ 0 ]
-    self.input_add_callbk_per_cycle += [ 0 ]
-    self.clock_add_callbk_per_cycle += [ 0 ]
-    self.input_comb_evals_per_cycle += [ 0 ]
-    self.clock_comb_evals_per_cycle += [ 0 ]
-    self.slice_comb_evals_per_cycle += [ 0 ]
-    self.redun_comb_evals_per_cycle += [ 0 ]
-    for key in self.has_run:
-      self.has_run[ key ] = False
+    self._pre_tick  = True
+    self._ncycles  += 1
+
+    counts         = self._counts
+    window_counts  = self._window_counts
+    for i in range( _NCOUNTS ):
+      window_counts[ i ] += counts[ i ]
+      counts       [ i ]  = 0
+
+    if self._ncycles - self._window_start >= self.window:
+      self._end_window()
 
   #-----------------------------------------------------------------------
   # start_tick
@@ -103,45 +186,66 @@ class SimulationMetrics( object ):
   # incr_add_events
   #-----------------------------------------------------------------------
   # Increment the number of times add_event() was called.
-  def incr_add_events( self ):
+  def incr_add_events( self, signal_value ):
     if self._pre_tick:
-      self.input_add_events_per_cycle[ self._ncycles ] += 1
+      self._counts[ _INPUT_ADD_EVENTS ] += 1
     else:
-      self.clock_add_events_per_cycle[ self._ncycles ] += 1
+      self._counts[ _CLOCK_ADD_EVENTS ] += 1
 
   #-----------------------------------------------------------------------
-  # incr_add_events
+  # incr_add_callbk
   #-----------------------------------------------------------------------
   # Increment the number of callbacks we attempted to place on the event
   # queue.
-  def incr_add_callbk( self ):
+  def incr_add_callbk( self, func ):
     if self._pre_tick:
-      self.input_add_callbk_per_cycle[ self._ncycles ] += 1
+      self._counts[ _INPUT_ADD_CALLBK ] += 1
     else:
-      self.clock_add_callbk_per_cycle[ self._ncycles ] += 1
+      self._counts[ _CLOCK_ADD_CALLBK ] += 1
 
   #-----------------------------------------------------------------------
   # incr_comb_evals
   #-----------------------------------------------------------------------
   # Increment the number of evals we actually executed.
   def incr_comb_evals( self, eval ):
+    counts = self._counts
+
     if self._pre_tick:
-      self.input_comb_evals_per_cycle[ self._ncycles ] += 1
+      counts[ _INPUT_COMB_EVALS ] += 1
     else:
-      self.clock_comb_evals_per_cycle[ self._ncycles ] += 1
+      counts[ _CLOCK_COMB_EVALS ] += 1
 
-    if   self.has_run[ eval ]:
-      self.redun_comb_evals_per_cycle[ self._ncycles ] += 1
+    if   self.last_run[ eval ] == self._ncycles:
+      counts[ _REDUN_COMB_EVALS ] += 1
     else:
-      self.has_run[ eval ] = True
+      self.last_run[ eval ] = self._ncycles
 
     if   self.is_slice[ eval ]:
-      self.slice_comb_evals_per_cycle[ self._ncycles ] += 1
+      counts[ _SLICE_COMB_EVALS ] += 1
+
+  #-----------------------------------------------------------------------
+  # close
+  #-----------------------------------------------------------------------
+  # Record any partially complete window, including the counts of the
+  # current incomplete cycle, and flush and close the stream file if
+  # streaming.
+  def close( self ):
+    partial = any( self._counts )
+    for i in range( _NCOUNTS ):
+      self._window_counts[ i ] += self._counts[ i ]
+      self._counts       [ i ]  = 0
+    if partial or self._ncycles > self._window_start:
+      self._end_window()
+    if self._sink:
+      self._flush()
+      self._sink.close()
+      self._sink = None
 
   #-----------------------------------------------------------------------
   # print_metrics
   #-----------------------------------------------------------------------
-  # Print metrics to the commandline.
+  # Print metrics to the commandline. Per-cycle (or per-window) metrics
+  # are only available when not streaming.
   def print_metrics( self, detailed = True ):
     print("-"*72)
     print("Simulation Metrics")
@@ -160,17 +264,26 @@ class SimulationMetrics( object ):
     print("          pre-tick          post-tick         other       ")
     print("cycle     adde  clbk  eval  adde  clbk  eval  slice  redun")
     print("--------  ----  ----  ----  ----  ----  ----  -----  -----")
-    for i in range( self._ncycles ):
-      print("{:8}  {:4}  {:4}  {:4}  {:4}  {:4}  {:4}  {:5}  {:5}".format(
-                   i, self.input_add_events_per_cycle[ i ],
-                      self.input_add_callbk_per_cycle[ i ],
-                      self.input_comb_evals_per_cycle[ i ],
-                      self.clock_add_events_per_cycle[ i ],
-                      self.clock_add_callbk_per_cycle[ i ],
-                      self.clock_comb_evals_per_cycle[ i ],
-                      self.slice_comb_evals_per_cycle[ i ],
-                      self.redun_comb_evals_per_cycle[ i ],
-                   ))
+    if not self._sink:
+      for i in range( len( self.input_add_events_per_cycle ) ):
+        print("{:8}  {:4}  {:4}  {:4}  {:4}  {:4}  {:4}  {:5}  {:5}".format(
+                     i*self.window,
+                        self.input_add_events_per_cycle[ i ],
+                        self.input_add_callbk_per_cycle[ i ],
+                        self.input_comb_evals_per_cycle[ i ],
+                        self.clock_add_events_per_cycle[ i ],
+                        self.clock_add_callbk_per_cycle[ i ],
+                        self.clock_comb_evals_per_cycle[ i ],
+                        self.slice_comb_evals_per_cycle[ i ],
+                        self.redun_comb_evals_per_cycle[ i ],
+                     ))
+      print("--------  ----  ----  ----  ----  ----  ----  -----  -----")
+    t = self.totals
+    print("   total  {:4}  {:4}  {:4}  {:4}  {:4}  {:4}  {:5}  {:5}".format(
+            t[ _INPUT_ADD_EVENTS ], t[ _INPUT_ADD_CALLBK ],
+            t[ _INPUT_COMB_EVALS ], t[ _CLOCK_ADD_EVENTS ],
+            t[ _CLOCK_ADD_CALLBK ], t[ _CLOCK_COMB_EVALS ],
+            t[ _SLICE_COMB_EVALS ], t[ _REDUN_COMB_EVALS ] ))
     print("-"*72)
 
   #-----------------------------------------------------------------------
@@ -179,9 +292,578 @@ class SimulationMetrics( object ):
   # Pickle metrics to a file.  Useful for loading in Python later for
   # for creating matplotlib plots.
   def pickle_metrics( self, filename ):
-    del self.is_slice
-    del self.has_run
-    pickle.dump( self, open( filename, 'wb' ) )
+    with open( filename, 'wb' ) as f:
+      pickle.dump( self, f )
+
+  #-----------------------------------------------------------------------
+  # __getstate__
+  #-----------------------------------------------------------------------
+  # Drop simulator references and stream state when pickling.
+  def __getstate__( self ):
+    state = self.__dict__.copy()
+    for key in [ 'is_slice', 'last_run', '_sink', '_buffer' ]:
+      state.pop( key, None )
+    return state
+
+  #-----------------------------------------------------------------------
+  # _end_window
+  #-----------------------------------------------------------------------
+  # Record the counts for the current window, either in memory or in the
+  # stream buffer.
+  def _end_window( self ):
+    counts = self._window_counts
+
+    for i in range( _NCOUNTS ):
+      self.totals[ i ] += counts[ i ]
+
+    if self._sink:
+      pos = self._buffer_pos
+      self._buffer[ pos   ] = self._window_start
+      self._buffer[ pos+1 ] = self._ncycles - self._window_start
+      self._buffer[ pos+2 : pos+2+_NCOUNTS ] = array( _TYPECODE, counts )
+      self._buffer_pos = pos + len( self.FIELDS )
+      if self._buffer_pos == len( self._buffer ):
+        self._flush()
+    else:
+      self.input_add_events_per_cycle.append( counts[ _INPUT_ADD_EVENTS ] )
+      self.clock_add_events_per_cycle.append( counts[ _CLOCK_ADD_EVENTS ] )
+      self.input_add_callbk_per_cycle.append( counts[ _INPUT_ADD_CALLBK ] )
+      self.clock_add_callbk_per_cycle.append( counts[ _CLOCK_ADD_CALLBK ] )
+      self.input_comb_evals_per_cycle.append( counts[ _INPUT_COMB_EVALS ] )
+      self.clock_comb_evals_per_cycle.append( counts[ _CLOCK_COMB_EVALS ] )
+      self.slice_comb_evals_per_cycle.append( counts[ _SLICE_COMB_EVALS ] )
+      self.redun_comb_evals_per_cycle.append( counts[ _REDUN_COMB_EVALS ] )
+
+    self._window_counts = [ 0 ] * _NCOUNTS
+    self._window_start  = self._ncycles
+
+  #-----------------------------------------------------------------------
+  # _flush
+  #-----------------------------------------------------------------------
+  # Write the buffered rows to the stream.
+  def _flush( self ):
+    self._sink.write( self._buffer[ :self._buffer_pos ] )
+    self._buffer_pos = 0
+
+# Indices into the per-cycle and per-window counts
+
+_NCOUNTS          = 8
+_INPUT_ADD_EVENTS = 0
+_CLOCK_ADD_EVENTS = 1
+_INPUT_ADD_CALLBK = 2
+_CLOCK_ADD_CALLBK = 3
+_INPUT_COMB_EVALS = 4
+_CLOCK_COMB_EVALS = 5
+_SLICE_COMB_EVALS = 6
+_REDUN_COMB_EVALS = 7
+
+# Unsigned type used for metrics arrays
+
+_TYPECODE = 'L'
+
+#-------------------------------------------------------------------------
+# _open_sink
+#-------------------------------------------------------------------------
+# Select a stream writer based on the file extension.
+def _open_sink( filename, ncols ):
+  if   filename.endswith( '.csv' ):
+    return _CSVSink( filename, SimulationMetrics.FIELDS )
+  elif filename.endswith( '.npy' ):
+    return _NPYSink( filename, ncols )
+  else:
+    raise ValueError( "Metrics stream '{}' must be a .csv or .npy file!"
+                      .format( filename ) )
+
+#-------------------------------------------------------------------------
+# _CSVSink
+#-------------------------------------------------------------------------
+# Writes metrics rows as comma separated values with a header row.
+class _CSVSink( object ):
+
+  def __init__( self, filename, fields ):
+    self.ncols = len( fields )
+    self.o     = open( filename, 'w' )
+    print( ','.join( fields ), file=self.o )
+
+  def write( self, data ):
+    n     = self.ncols
+    lines = [ ','.join( map( str, data[ i:i+n ] ) )
+              for i in range( 0, len( data ), n ) ]
+    if lines:
+      print( '\n'.join( lines ), file=self.o )
+
+  def close( self ):
+    self.o.close()
+
+#-------------------------------------------------------------------------
+# _NPYSink
+#-------------------------------------------------------------------------
+# Writes metrics rows as a 2D unsigned integer array in the NumPy .npy
+# format (version 1.0), so the file can be loaded with numpy.load(). The
+# header is padded to a fixed size and rewritten with the final number of
+# rows on close.
+class _NPYSink( object ):
+
+  HEADER_SIZE = 128
+
+  def __init__( self, filename, ncols ):
+    self.ncols = ncols
+    self.nrows = 0
+    self.o     = open( filename, 'wb' )
+    self._write_header()
+
+  def write( self, data ):
+    if sys.byteorder != 'little':
+      data = array( data.typecode, data )
+      data.byteswap()
+    data.tofile( self.o )
+    self.nrows += len( data ) // self.ncols
+
+  def close( self ):
+    self.o.seek( 0 )
+    self._write_header()
+    self.o.close()
+
+  def _write_header( self ):
+    header = ( "{{'descr': '<u{}', 'fortran_order': False, "
+               "'shape': ({}, {}), }}" ).format( array( _TYPECODE ).itemsize,
+                                                 self.nrows, self.ncols )
+    header = header.ljust( self.HEADER_SIZE - 10 - 1 ) + '\n'
+    self.o.write( b'\x93NUMPY\x01\x00' )
+    self.o.write( struct.pack( '<H', len( header ) ) )
+    self.o.write( header )
+
+#-------------------------------------------------------------------------
+# ProfileMetrics
+#-------------------------------------------------------------------------
+# Utility class for profiling the wall clock time spent in each @tick,
+# @combinational and slice block of a design. Enabled with
+# SimulationTool( model, collect_metrics='profile' ), which switches the
+# simulator to cycle/eval implementations that bracket every block with
+# start_block()/end_block(). Time is tracked both inclusive (total) and
+# exclusive (self) of nested blocks, since slice callbacks execute
+# immediately inside the block writing their source signal.
+#
+# Results can be aggregated by block, by model instance and by model
+# class, and exported as a text report, JSON, or collapsed stacks for use
+# with flamegraph.pl.
+class ProfileMetrics( object ):
+
+  _count_name = 'ncalls'
+
+  #-----------------------------------------------------------------------
+  # __init__
+  #-----------------------------------------------------------------------
+  def __init__( self ):
+    self._ncycles = 0
+    self._models  = []
+    self._blocks  = collections.OrderedDict()
+    self._stack   = []
+    self._stats   = collections.defaultdict( lambda: [ 0, 0.0, 0.0 ] )
+
+  #-----------------------------------------------------------------------
+  # reg_model
+  #-----------------------------------------------------------------------
+  # Register a model in the design.
+  def reg_model( self, model ):
+    self._models.append( model )
+
+  #-----------------------------------------------------------------------
+  # reg_eval
+  #-----------------------------------------------------------------------
+  # Register an eval block in the design.
+  def reg_eval( self, eval, is_slice = False ):
+    if is_slice:
+      self._reg_block( eval, eval._model, eval._slice_str, 'slice' )
+    else:
+      self._reg_block( eval, eval._model, eval.__name__, 'comb' )
+
+  #-----------------------------------------------------------------------
+  # reg_tick
+  #-----------------------------------------------------------------------
+  # Register a sequential block in the design.
+  def reg_tick( self, tick, model ):
+    self._reg_block( tick, model, tick.__name__, 'tick' )
+
+  #-----------------------------------------------------------------------
+  # wrap_slice
+  #-----------------------------------------------------------------------
+  # Slice callbacks run immediately when their source is written rather
+  # than through the event queue, so wrap them in a timing closure.
+  def wrap_slice( self, slice_cb ):
+    start_block = self.start_block
+    end_block   = self.end_block
+    def profiled_slice_cb():
+      start_block()
+      try:
+        slice_cb()
+      finally:
+        end_block( slice_cb )
+    return profiled_slice_cb
+
+  #-----------------------------------------------------------------------
+  # start_block
+  #-----------------------------------------------------------------------
+  # Should be called immediately before executing a block. Pushes the
+  # start time and an accumulator for the time spent in nested blocks.
+  def start_block( self ):
+    self._stack.append( [ _timer(), 0.0 ] )
+
+  #-----------------------------------------------------------------------
+  # end_block
+  #-----------------------------------------------------------------------
+  # Should be called immediately after executing a block.
+  def end_block( self, block ):
+    stop          = _timer()
+    start, nested = self._stack.pop()
+    elapsed       = stop - start
+    stats         = self._stats[ block ]
+    stats[0]     += 1
+    stats[1]     += elapsed
+    stats[2]     += elapsed - nested
+    if self._stack:
+      self._stack[-1][1] += elapsed
+
+  #-----------------------------------------------------------------------
+  # incr_metrics_cycle
+  #-----------------------------------------------------------------------
+  def incr_metrics_cycle( self ):
+    self._ncycles += 1
+
+  def start_tick( self ): pass
+  def incr_add_events( self, signal_value ): pass
+  def incr_add_callbk( self, func ): pass
+  def incr_comb_evals( self, eval ): pass
+
+  #-----------------------------------------------------------------------
+  # get_block_profile
+  #-----------------------------------------------------------------------
+  # Return a list of per-block records sorted by decreasing self time.
+  def get_block_profile( self ):
+    count   = self._count_name
+    records = []
+    for block, stats in self._stats.items():
+      model, name, kind = self._blocks.get( block,
+                                            ( None, _name( block ), '?' ) )
+      ncalls, total, self_time = stats
+      records.append({
+        'block'     : '{}.{}'.format( _model_path( model ), name ),
+        'name'      : name,
+        'kind'      : kind,
+        'model'     : _model_path( model ),
+        'class'     : _class_name( model ),
+        count       : ncalls,
+        'total_time': total,
+        'self_time' : self_time,
+      })
+    return sorted( records, key = lambda x: x['self_time'], reverse = True )
+
+  #-----------------------------------------------------------------------
+  # get_model_profile
+  #-----------------------------------------------------------------------
+  # Return a list of per-model-instance records sorted by decreasing self
+  # time. The hier_time field includes time spent in all submodels.
+  def get_model_profile( self ):
+    count     = self._count_name
+    self_time = collections.defaultdict( float )
+    ncalls    = collections.defaultdict( int   )
+    for record in self.get_block_profile():
+      self_time[ record['model'] ] += record['self_time']
+      ncalls   [ record['model'] ] += record[ count ]
+
+    records = []
+    for model in self._models:
+      path = _model_path( model )
+      hier = sum( t for p, t in self_time.items()
+                  if p == path or p.startswith( path + '.' ) )
+      records.append({
+        'model'     : path,
+        'class'     : _class_name( model ),
+        count       : ncalls[ path ],
+        'self_time' : self_time[ path ],
+        'hier_time' : hier,
+      })
+    return sorted( records, key = lambda x: x['self_time'], reverse = True )
+
+  #-----------------------------------------------------------------------
+  # get_class_profile
+  #-----------------------------------------------------------------------
+  # Return a list of per-model-class records sorted by decreasing self
+  # time, summed over all instances of each class.
+  def get_class_profile( self ):
+    count   = self._count_name
+    classes = collections.OrderedDict()
+    for record in self.get_model_profile():
+      entry = classes.setdefault( record['class'], {
+        'class'     : record['class'],
+        'instances' : 0,
+        count       : 0,
+        'self_time' : 0.0,
+      })
+      entry['instances'] += 1
+      entry[ count     ] += record[ count ]
+      entry['self_time'] += record['self_time']
+    return sorted( classes.values(), key = lambda x: x['self_time'],
+                   reverse = True )
+
+  #-----------------------------------------------------------------------
+  # print_metrics
+  #-----------------------------------------------------------------------
+  # Print a profile report sorted by self time. At most limit rows are
+  # printed per table unless limit is None.
+  def print_metrics( self, detailed = True, limit = 20, o = None ):
+    o      = o or sys.stdout
+    count  = self._count_name
+    blocks = self.get_block_profile()
+    total  = sum( x['self_time'] for x in blocks ) or 1.0
+    rows   = lambda x: x if limit is None else x[:limit]
+
+    print("-"*72, file=o)
+    print("Simulation Profile", file=o)
+    print("-"*72, file=o)
+    print(file=o)
+    print("ncycles:               {:4}".format( self._ncycles ), file=o)
+    print("modules:               {:4}".format( len( self._models ) ), file=o)
+    print("blocks:                {:4}".format( len( self._blocks ) ), file=o)
+    print("profiled time (s):     {:.6f}".format( total ), file=o)
+    self._print_summary( o )
+    print("-"*72, file=o)
+    if not detailed:
+      return
+
+    print(file=o)
+    print("   self%    self(s)   total(s)  {:>9}  kind   block".format( count ), file=o)
+    print("--------  ---------  ---------  ---------  -----  -----", file=o)
+    for x in rows( blocks ):
+      print("{:7.2f}%  {:9.6f}  {:9.6f}  {:9}  {:5}  {}".format(
+              100*x['self_time']/total, x['self_time'], x['total_time'],
+              x[ count ], x['kind'], x['block'] ), file=o)
+
+    print(file=o)
+    print("   self%    self(s)    hier(s)  {:>9}  model (class)".format( count ), file=o)
+    print("--------  ---------  ---------  ---------  -------------", file=o)
+    for x in rows( self.get_model_profile() ):
+      print("{:7.2f}%  {:9.6f}  {:9.6f}  {:9}  {} ({})".format(
+              100*x['self_time']/total, x['self_time'], x['hier_time'],
+              x[ count ], x['model'], x['class'] ), file=o)
+
+    print(file=o)
+    print("   self%    self(s)  instances  {:>9}  class".format( count ), file=o)
+    print("--------  ---------  ---------  ---------  -----", file=o)
+    for x in rows( self.get_class_profile() ):
+      print("{:7.2f}%  {:9.6f}  {:9}  {:9}  {}".format(
+              100*x['self_time']/total, x['self_time'], x['instances'],
+              x[ count ], x['class'] ), file=o)
+    print("-"*72, file=o)
+
+  #-----------------------------------------------------------------------
+  # dump_json
+  #-----------------------------------------------------------------------
+  # Write the block, model and class profiles to a JSON file.
+  def dump_json( self, filename ):
+    with open( filename, 'w' ) as o:
+      json.dump({
+        'ncycles' : self._ncycles,
+        'blocks'  : self.get_block_profile(),
+        'models'  : self.get_model_profile(),
+        'classes' : self.get_class_profile(),
+      }, o, indent = 2 )
+
+  #-----------------------------------------------------------------------
+  # dump_collapsed
+  #-----------------------------------------------------------------------
+  # Write the profile in the collapsed stack format consumed by
+  # flamegraph.pl. Each line is the semicolon separated model hierarchy
+  # followed by the block name and its self time in microseconds.
+  def dump_collapsed( self, filename ):
+    with open( filename, 'w' ) as o:
+      for x in self.get_block_profile():
+        usecs = int( round( x['self_time'] * 1e6 ) )
+        if usecs:
+          stack = x['model'].replace( '.', ';' ) + ';' + x['name']
+          print( "{} {}".format( stack, usecs ), file=o )
+
+  #-----------------------------------------------------------------------
+  # _reg_block
+  #-----------------------------------------------------------------------
+  def _reg_block( self, block, model, name, kind ):
+    self._blocks[ block ] = ( model, name, kind )
+
+  #-----------------------------------------------------------------------
+  # _print_summary
+  #-----------------------------------------------------------------------
+  # Hook for subclasses to print additional summary lines.
+  def _print_summary( self, o ):
+    pass
+
+#-------------------------------------------------------------------------
+# SampleMetrics
+#-------------------------------------------------------------------------
+# Low-overhead statistical profiler. Enabled with
+# SimulationTool( model, collect_metrics='sample' ). Rather than timing
+# every block, the simulator only records which block is executing
+# (sim._current_func for combinational and slice blocks, sim._current_tick
+# for the index of the sequential block), and this class periodically
+# samples that state, either from a SIGPROF interval timer or from a
+# background thread. Each sample is charged the wall time elapsed since
+# the previous sample.
+#
+# Sampling only runs between start() and stop(), usually within a
+# sim.sampling() block. stop() restores the SIGPROF handler and interval
+# timer which were installed before start(), with the CPU time spent in
+# between taken off the remaining time of the timer so that an outer
+# profiler keeps its schedule. Reports, JSON and collapsed stack exports
+# are shared with ProfileMetrics, but count samples instead of calls.
+class SampleMetrics( ProfileMetrics ):
+
+  _count_name = 'samples'
+
+  #-----------------------------------------------------------------------
+  # __init__
+  #-----------------------------------------------------------------------
+  def __init__( self, sim ):
+    super( SampleMetrics, self ).__init__()
+    self._sim           = sim
+    self._idle_samples  = 0
+    self._last          = None
+    self._method        = None
+    self._prev_handler  = None
+    self._prev_timer    = None
+    self._start_cpu     = None
+    self._thread        = None
+    self._stop_event    = None
+    self.interval       = None
+
+  #-----------------------------------------------------------------------
+  # start
+  #-----------------------------------------------------------------------
+  # Start sampling every interval seconds. The method is either 'signal'
+  # (a SIGPROF interval timer, sampling CPU time) or 'thread' (a daemon
+  # thread, sampling wall time). By default the signal method is used
+  # when possible, since signals can only be handled in the main thread.
+  def start( self, interval = 0.001, method = None ):
+
+    if self._method:
+      self.stop()
+
+    if method is None:
+      has_timer = hasattr( signal, 'setitimer' )
+      is_main   = isinstance( threading.current_thread(), threading._MainThread )
+      method    = 'signal' if has_timer and is_main else 'thread'
+
+    self.interval = interval
+    self._last    = _timer()
+
+    if   method == 'signal':
+      self._prev_handler = signal.signal( signal.SIGPROF, self._on_signal )
+      signal.siginterrupt( signal.SIGPROF, False )
+      self._prev_timer   = signal.setitimer( signal.ITIMER_PROF,
+                                             interval, interval )
+      self._start_cpu    = _cpu_time()
+    elif method == 'thread':
+      self._stop_event    = threading.Event()
+      self._thread        = threading.Thread( target = self._sample_loop )
+      self._thread.daemon = True
+      self._thread.start()
+    else:
+      raise ValueError( "Unknown sampling method '{}'!".format( method ) )
+
+    self._method = method
+
+  #-----------------------------------------------------------------------
+  # stop
+  #-----------------------------------------------------------------------
+  # Stop sampling and restore the previous SIGPROF handler and timer.
+  # ITIMER_PROF counts CPU time, so the CPU time used since start() is
+  # taken off the remaining time of the previous timer, keeping at least
+  # one sampling interval so that the timer is not disarmed. Safe to call
+  # more than once.
+  def stop( self ):
+    if   self._method == 'signal':
+      delay, interval = self._prev_timer
+      if delay:
+        elapsed = _cpu_time() - self._start_cpu
+        delay   = max( delay - elapsed, self.interval )
+      signal.setitimer( signal.ITIMER_PROF, delay, interval )
+      signal.signal( signal.SIGPROF, self._prev_handler or signal.SIG_DFL )
+      self._prev_handler = None
+      self._prev_timer   = None
+      self._start_cpu    = None
+    elif self._method == 'thread':
+      self._stop_event.set()
+      self._thread.join()
+      self._thread = None
+    self._method = None
+
+  #-----------------------------------------------------------------------
+  # sample
+  #-----------------------------------------------------------------------
+  # Record which block the simulator is currently executing.
+  def sample( self ):
+    now        = _timer()
+    elapsed    = now - self._last
+    self._last = now
+
+    sim   = self._sim
+    block = sim._current_func
+    if block is None:
+      tick = sim._current_tick
+      if tick is not None:
+        block = sim._sequential_blocks[ tick ]
+
+    if block is None:
+      self._idle_samples += 1
+    else:
+      stats     = self._stats[ block ]
+      stats[0] += 1
+      stats[1] += elapsed
+      stats[2] += elapsed
+
+  #-----------------------------------------------------------------------
+  # _on_signal
+  #-----------------------------------------------------------------------
+  def _on_signal( self, signum, frame ):
+    self.sample()
+
+  #-----------------------------------------------------------------------
+  # _sample_loop
+  #-----------------------------------------------------------------------
+  def _sample_loop( self ):
+    while not self._stop_event.is_set():
+      time.sleep( self.interval )
+      self.sample()
+
+  #-----------------------------------------------------------------------
+  # _print_summary
+  #-----------------------------------------------------------------------
+  def _print_summary( self, o ):
+    nsamples = sum( x[0] for x in self._stats.values() )
+    print("samples in blocks:     {:4}".format( nsamples ), file=o)
+    print("samples outside:       {:4}".format( self._idle_samples ), file=o)
+
+#-------------------------------------------------------------------------
+# _model_path
+#-------------------------------------------------------------------------
+# Utility function returning the hierarchical instance name of a model,
+# e.g. 'top.router[0].queue'.
+def _model_path( model ):
+  names = []
+  while model is not None:
+    names.append( model.name )
+    model = model.parent
+  return '.'.join( reversed( names ) ) or '?'
+
+#-------------------------------------------------------------------------
+# _class_name
+#-------------------------------------------------------------------------
+def _class_name( model ):
+  return model.__class__.__name__ if model is not None else '?'
+
+#-------------------------------------------------------------------------
+# _name
+#-------------------------------------------------------------------------
+def _name( block ):
+  return getattr( block, '__name__', repr( block ) )
 
 #-------------------------------------------------------------------------
 # DummyMetrics
@@ -195,8 +877,10 @@ class DummyMetrics( object ):
 
   def reg_model( self, model ): pass
   def reg_eval( self, eval, is_slice = False ): pass
+  def reg_tick( self, tick, model ): pass
+  def wrap_slice( self, slice_cb ): return slice_cb
   def incr_metrics_cycle( self ): pass
   def start_tick( self ): pass
-  def incr_add_events( self ): pass
-  def incr_add_callbk( self ): pass
+  def incr_add_events( self, signal_value ): pass
+  def incr_add_callbk( self, func ): pass
   def incr_comb_evals( self, eval ): pass
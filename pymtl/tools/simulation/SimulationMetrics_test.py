@@ -0,0 +1,318 @@
+#=======================================================================
+# SimulationMetrics_test.py
+#=======================================================================
+# Tests for the SimulationTool metrics and profiling collectors.
+
+import ast
+import json
+import signal
+import struct
+import time
+import pytest
+
+from pymtl import *
+
+from SimulationMetrics import SimulationMetrics
+
+#-----------------------------------------------------------------------
+# Models
+#-----------------------------------------------------------------------
+
+class Incr( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+
+    @s.tick
+    def logic():
+      s.out.next = s.in_ + 1
+
+class IncrPair( Model ):
+  def __init__( s ):
+    s.in_  = InPort ( 8 )
+    s.out  = OutPort( 8 )
+    s.low  = OutPort( 4 )
+    s.incr = Incr[2]()
+
+    s.connect( s.in_,         s.incr[0].in_      )
+    s.connect( s.incr[1].out, s.out              )
+    s.connect( s.low,         s.incr[1].out[0:4] )
+
+    @s.combinational
+    def comb_logic():
+      s.incr[1].in_.value = s.incr[0].out
+
+class Raiser( Model ):
+  def __init__( s, raise_in ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+
+    @s.combinational
+    def comb_logic():
+      if raise_in == 'comb' and s.in_ == 3:
+        raise ValueError( 'comb' )
+      s.out.value = s.in_
+
+    @s.tick
+    def tick_logic():
+      if raise_in == 'tick' and s.in_ == 3:
+        raise ValueError( 'tick' )
+
+def run( model, collect_metrics, ncycles = 10 ):
+  model.elaborate()
+  sim = SimulationTool( model, collect_metrics = collect_metrics )
+  sim.reset()
+  for i in range( ncycles ):
+    model.in_.value = i
+    sim.cycle()
+  return sim
+
+#-----------------------------------------------------------------------
+# test_metrics
+#-----------------------------------------------------------------------
+def test_metrics():
+  sim = run( IncrPair(), True )
+  m   = sim.metrics
+  assert m.num_modules              == 3
+  assert m.num_tick_blocks          == 2
+  assert m.num_combinational_blocks == 1
+  assert m.num_slice_blocks         == 1
+  assert len( m.comb_evals_per_cycle ) == sim.ncycles
+  assert sum( m.comb_evals_per_cycle ) > 0
+
+#-----------------------------------------------------------------------
+# test_metrics_close
+#-----------------------------------------------------------------------
+# Counts after the last completed cycle are recorded by close() as one
+# more entry, or as part of the last partial window.
+@pytest.mark.parametrize( 'window,nentries', [ ( 1, 13 ), ( 5, 3 ) ] )
+def test_metrics_close( window, nentries ):
+  evals   = sum( run( IncrPair(), True ).metrics.comb_evals_per_cycle )
+
+  model   = IncrPair()
+  metrics = SimulationMetrics( window = window )
+  sim     = run( model, metrics )
+
+  model.incr[0].out.value = 42
+  sim.eval_combinational()
+  metrics.close()
+
+  assert len( metrics.comb_evals_per_cycle ) == nentries
+  assert sum( metrics.comb_evals_per_cycle ) == evals + 1
+  totals = dict( zip( SimulationMetrics.FIELDS[2:], metrics.totals ) )
+  assert totals['input_comb_evals'] + totals['clock_comb_evals'] == evals + 1
+
+#-----------------------------------------------------------------------
+# test_metrics_window
+#-----------------------------------------------------------------------
+def test_metrics_window():
+  per_cycle = run( IncrPair(), True, ncycles = 18 ).metrics
+  windowed  = run( IncrPair(), SimulationMetrics( window = 4 ),
+                   ncycles = 18 ).metrics
+  windowed.close()
+
+  assert len( windowed.comb_evals_per_cycle ) == 5
+  assert sum( windowed.comb_evals_per_cycle ) == \
+         sum( per_cycle.comb_evals_per_cycle )
+  assert list( windowed.redun_comb_evals_per_cycle[:1] ) == \
+         [ sum( per_cycle.redun_comb_evals_per_cycle[:4] ) ]
+  assert windowed.totals == per_cycle.totals
+
+#-----------------------------------------------------------------------
+# test_metrics_stream_csv
+#-----------------------------------------------------------------------
+def test_metrics_stream_csv( tmpdir ):
+  filename  = str( tmpdir.join( 'metrics.csv' ) )
+  per_cycle = run( IncrPair(), True, ncycles = 17 ).metrics
+  metrics   = SimulationMetrics( stream = filename, window = 4,
+                                 chunk_size = 2 )
+  run( IncrPair(), metrics, ncycles = 17 )
+  metrics.close()
+
+  lines = tmpdir.join( 'metrics.csv' ).read().splitlines()
+  assert lines[0].split( ',' ) == SimulationMetrics.FIELDS
+  rows  = [ dict( zip( SimulationMetrics.FIELDS, map( int, x.split( ',' ) ) ) )
+            for x in lines[1:] ]
+  assert [ x['cycle']   for x in rows ] == [ 0, 4, 8, 12, 16 ]
+  assert [ x['ncycles'] for x in rows ] == [ 4, 4, 4,  4,  3 ]
+  assert sum( x['input_comb_evals'] + x['clock_comb_evals'] for x in rows ) \
+         == sum( per_cycle.comb_evals_per_cycle )
+  assert len( metrics.comb_evals_per_cycle ) == 0
+
+#-----------------------------------------------------------------------
+# test_metrics_stream_npy
+#-----------------------------------------------------------------------
+def test_metrics_stream_npy( tmpdir ):
+  filename = str( tmpdir.join( 'metrics.npy' ) )
+  metrics  = SimulationMetrics( stream = filename, chunk_size = 3 )
+  sim      = run( IncrPair(), metrics )
+  metrics.close()
+
+  data = open( filename, 'rb' ).read()
+  assert data[:8] == b'\x93NUMPY\x01\x00'
+  hlen   = struct.unpack( '<H', data[8:10] )[0]
+  header = ast.literal_eval( data[10:10+hlen] )
+  nrows, ncols = header['shape']
+  assert nrows == sim.ncycles
+  assert ncols == len( SimulationMetrics.FIELDS )
+
+  itemsize = int( header['descr'][2:] )
+  body     = data[10+hlen:]
+  assert len( body ) == nrows * ncols * itemsize
+  fmt      = '<{}{}'.format( nrows * ncols, { 4 : 'I', 8 : 'Q' }[ itemsize ] )
+  values   = struct.unpack( fmt, body )
+  assert values[ 0*ncols ] == 0
+  assert values[ 5*ncols ] == 5
+
+#-----------------------------------------------------------------------
+# test_profile
+#-----------------------------------------------------------------------
+def test_profile():
+  model = IncrPair()
+  sim   = run( model, 'profile' )
+  assert model.out == 10
+  assert model.low == 10
+
+  blocks = { x['block'] : x for x in sim.metrics.get_block_profile() }
+  assert blocks['top.incr[0].logic']['kind']   == 'tick'
+  assert blocks['top.incr[0].logic']['ncalls'] == sim.ncycles
+  assert blocks['top.incr[1].logic']['ncalls'] == sim.ncycles
+  assert blocks['top.comb_logic']['kind']      == 'comb'
+  assert blocks['top.incr[1].out[0:4] -> low']['kind'] == 'slice'
+  for x in blocks.values():
+    assert 0 <= x['self_time'] <= x['total_time']
+
+  models = { x['model'] : x for x in sim.metrics.get_model_profile() }
+  assert set( models ) == { 'top', 'top.incr[0]', 'top.incr[1]' }
+  assert models['top']['hier_time'] >= models['top.incr[0]']['hier_time']
+
+  classes = { x['class'] : x for x in sim.metrics.get_class_profile() }
+  assert classes['Incr']['instances']     == 2
+  assert classes['IncrPair']['instances'] == 1
+
+#-----------------------------------------------------------------------
+# test_profile_exception
+#-----------------------------------------------------------------------
+# A block which raises still ends its timing, so blocks run afterwards
+# are not attributed to it.
+@pytest.mark.parametrize( 'raise_in', [ 'comb', 'tick' ] )
+def test_profile_exception( raise_in ):
+  model = Raiser( raise_in )
+  model.elaborate()
+  sim   = SimulationTool( model, collect_metrics = 'profile' )
+  sim.reset()
+
+  model.in_.value = 3
+  with pytest.raises( ValueError ):
+    sim.cycle()
+  assert sim.metrics._stack == []
+
+#-----------------------------------------------------------------------
+# test_profile_export
+#-----------------------------------------------------------------------
+def test_profile_export( tmpdir ):
+  sim = run( IncrPair(), 'profile' )
+
+  report = tmpdir.join( 'profile.txt' )
+  with open( str( report ), 'w' ) as o:
+    sim.metrics.print_metrics( o = o )
+  assert 'top.comb_logic' in report.read()
+
+  sim.metrics.dump_json( str( tmpdir.join( 'profile.json' ) ) )
+  data = json.loads( tmpdir.join( 'profile.json' ).read() )
+  assert data['ncycles'] == sim.ncycles
+  assert len( data['blocks'] ) == 4
+
+  sim.metrics.dump_collapsed( str( tmpdir.join( 'profile.folded' ) ) )
+  for line in tmpdir.join( 'profile.folded' ).read().splitlines():
+    stack, usecs = line.rsplit( ' ', 1 )
+    assert stack.startswith( 'top;' )
+    assert int( usecs ) > 0
+
+#-----------------------------------------------------------------------
+# test_sample
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'method', [ 'signal', 'thread' ] )
+def test_sample( method ):
+  model = IncrPair()
+  model.elaborate()
+  sim = SimulationTool( model, collect_metrics = 'sample' )
+
+  # Simulate for long enough to collect a few hundred samples
+
+  with sim.sampling( interval = 0.0005, method = method ):
+    start = time.time()
+    while time.time() - start < 0.2:
+      model.in_.value = sim.ncycles % 256
+      sim.cycle()
+
+  blocks = sim.metrics.get_block_profile()
+  assert sum( x['samples'] for x in blocks ) > 0
+  for x in blocks:
+    assert x['model'].startswith( 'top' )
+    assert x['kind'] in ( 'tick', 'comb', 'slice' )
+
+#-----------------------------------------------------------------------
+# test_sample_restores_timer
+#-----------------------------------------------------------------------
+# Sampling only runs inside sim.sampling(), and restores the SIGPROF
+# handler and timer which were installed before.
+def burn_cpu( seconds ):
+  start = time.clock()
+  while time.clock() - start < seconds:
+    pass
+
+def test_sample_restores_timer():
+  model = IncrPair()
+  model.elaborate()
+
+  def handler( signum, frame ):
+    pass
+
+  prev_handler = signal.signal( signal.SIGPROF, handler )
+  prev_timer   = signal.setitimer( signal.ITIMER_PROF, 100, 100 )
+  try:
+    sim = SimulationTool( model, collect_metrics = 'sample' )
+    assert signal.getsignal( signal.SIGPROF ) is handler
+
+    with sim.sampling( interval = 0.0005, method = 'signal' ):
+      assert signal.getsignal( signal.SIGPROF ) is not handler
+      assert signal.getitimer( signal.ITIMER_PROF )[1] == 0.0005
+      for i in range( 100 ):
+        sim.cycle()
+
+    assert signal.getsignal( signal.SIGPROF ) is handler
+    delay, interval = signal.getitimer( signal.ITIMER_PROF )
+    assert interval == 100
+    assert 99 < delay < 101
+
+    # The CPU time spent sampling counts towards the previous timer
+
+    with sim.sampling( method = 'signal' ):
+      burn_cpu( 0.3 )
+    delay, interval = signal.getitimer( signal.ITIMER_PROF )
+    assert interval == 100
+    assert 99 < delay < 99.8
+
+    # ... but a timer which would have expired is not disarmed
+
+    signal.setitimer( signal.ITIMER_PROF, 0.1, 0.5 )
+    with sim.sampling( method = 'signal' ):
+      burn_cpu( 0.3 )
+    delay, interval = signal.getitimer( signal.ITIMER_PROF )
+    assert interval == 0.5
+    assert 0 < delay <= 0.5
+    signal.setitimer( signal.ITIMER_PROF, 100, 100 )
+
+    # Samplers of several simulators nest
+
+    sim2 = SimulationTool( model, collect_metrics = 'sample' )
+    with sim.sampling( method = 'signal' ):
+      with sim2.sampling( method = 'signal' ):
+        sim2.cycle()
+      assert signal.getitimer( signal.ITIMER_PROF )[1] == 0.001
+    assert signal.getsignal( signal.SIGPROF ) is handler
+
+  finally:
+    signal.setitimer( signal.ITIMER_PROF, *prev_timer )
+    signal.signal( signal.SIGPROF, prev_handler )
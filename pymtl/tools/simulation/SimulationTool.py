@@ -10,12 +10,14 @@ from __future__ import print_function
 
 import pprint
 import collections
+import contextlib
 import inspect
 import warnings
 import sim_utils as sim
 
 from sys               import flags
-from SimulationMetrics import SimulationMetrics, DummyMetrics
+from SimulationMetrics import SimulationMetrics, ProfileMetrics, SampleMetrics
+from SimulationMetrics import DummyMetrics
 
 #-----------------------------------------------------------------------
 # SimulationTool
@@ -30,6 +32,13 @@ class SimulationTool( object ):
   # __init__
   #---------------------------------------------------------------------
   # Construct a simulator based on the provided model.
+  #
+  # collect_metrics can be False (no metrics), True (per-cycle event and
+  # eval counts, see SimulationMetrics), 'profile' (per-block wall clock
+  # profiling, see ProfileMetrics) or 'sample' (low-overhead statistical
+  # profiling within a sampling() block, see SampleMetrics). A collector
+  # instance implementing the SimulationMetrics interface (e.g., an
+  # EventTraceRecorder) can also be passed directly.
   def __init__( self, model, collect_metrics = False ):
 
     # Check that the model has been elaborated
@@ -45,6 +54,7 @@ class SimulationTool( object ):
     self._sequential_blocks   = []
     self._register_queue      = []
     self._current_func        = None
+    self._current_tick        = None
 
     self._nets                = None # TODO: remove me
 
@@ -54,15 +64,30 @@ class SimulationTool( object ):
     # Only collect metrics if they are enabled, otherwise replace
     # with a dummy collection class.
 
-    if collect_metrics:
+    if   collect_metrics == 'profile':
+      self.metrics            = ProfileMetrics()
+    elif collect_metrics == 'sample':
+      self.metrics            = SampleMetrics( self )
+    elif hasattr( collect_metrics, 'incr_comb_evals' ):
+      self.metrics            = collect_metrics
+    elif collect_metrics:
       self.metrics            = SimulationMetrics()
     else:
       self.metrics            = DummyMetrics()
 
-    # If the -O flag was passed to Python, use the perf implementation
-    # of cycle, otherwise use the dev version.
-
-    if flags.optimize:
+    # If profiling, use the profiling or sampling implementation of
+    # cycle. Otherwise if the -O flag was passed to Python and no metrics
+    # are collected, use the perf implementation of cycle, otherwise use
+    # the dev version (the perf version never calls the metrics hooks, so
+    # e.g. an EventTraceRecorder would silently record nothing).
+
+    if   collect_metrics == 'profile':
+      self.cycle              = self._prof_cycle
+      self.eval_combinational = self._prof_eval
+    elif collect_metrics == 'sample':
+      self.cycle              = self._samp_cycle
+      self.eval_combinational = self._perf_eval
+    elif flags.optimize and not collect_metrics:
       self.cycle              = self._perf_cycle
       self.eval_combinational = self._perf_eval
     else:
@@ -72,14 +97,15 @@ class SimulationTool( object ):
 
     # Construct a simulator for the provided model.
 
-    signals                 = sim.collect_signals( model )
+    signals                 = sim.collect_signals( model, self.metrics )
     nets, slice_connections = sim.signals_to_nets( signals )
-    sequential_blocks       = sim.register_seq_blocks( model )
+    sequential_blocks       = sim.register_seq_blocks( model, self.metrics )
 
     sim.insert_signal_values( self, nets )
 
-    sim.register_comb_blocks  ( model, self._event_queue )
-    sim.create_slice_callbacks( slice_connections, self._event_queue )
+    sim.register_comb_blocks  ( model, self._event_queue, self.metrics )
+    sim.create_slice_callbacks( slice_connections, self._event_queue,
+                                self.metrics )
     sim.register_cffi_updates ( model )
 
     self._nets              = nets
@@ -91,6 +117,27 @@ class SimulationTool( object ):
       from vcd import VCDUtil
       VCDUtil( self, model.vcd_file )
 
+  #---------------------------------------------------------------------
+  # sampling
+  #---------------------------------------------------------------------
+  # Context manager which runs the SampleMetrics profiler for the
+  # duration of the block, e.g.
+  #
+  #   sim = SimulationTool( model, collect_metrics='sample' )
+  #   with sim.sampling():
+  #     while not model.done():
+  #       sim.cycle()
+  #
+  @contextlib.contextmanager
+  def sampling( self, interval = 0.001, method = None ):
+    if not isinstance( self.metrics, SampleMetrics ):
+      raise Exception( "sampling requires collect_metrics='sample'!" )
+    self.metrics.start( interval, method )
+    try:
+      yield self.metrics
+    finally:
+      self.metrics.stop()
+
   #---------------------------------------------------------------------
   # reset
   #---------------------------------------------------------------------
@@ -179,6 +226,79 @@ class SimulationTool( object ):
     # Increment the simulator cycle count
     self.ncycles += 1
 
+  #---------------------------------------------------------------------
+  # _prof_cycle
+  #---------------------------------------------------------------------
+  # Implementation of cycle() for use when profiling models, times each
+  # sequential block with the ProfileMetrics collector.
+  def _prof_cycle( self ):
+
+    metrics = self.metrics
+
+    # Call all events generated by input changes
+    self.eval_combinational()
+
+    # Clock generation needed by VCD tracing
+    self.model.clk.value = 0
+    self.model.clk.value = 1
+
+    # Call all rising edge triggered functions
+    for func in self._sequential_blocks:
+      metrics.start_block()
+      try:
+        func()
+      finally:
+        metrics.end_block( func )
+
+    # Then flop the shadow state on all registers
+    while self._register_queue:
+      reg = self._register_queue.pop()
+      reg.flop()
+
+    # Call all events generated by synchronous logic
+    self.eval_combinational()
+
+    # Increment the simulator cycle count
+    self.ncycles += 1
+
+    # Tell the metrics module to prepare for the next cycle
+    metrics.incr_metrics_cycle()
+
+  #---------------------------------------------------------------------
+  # _samp_cycle
+  #---------------------------------------------------------------------
+  # Implementation of cycle() for use with the SampleMetrics profiler,
+  # records the index of the executing sequential block so it can be
+  # sampled asynchronously.
+  def _samp_cycle( self ):
+
+    # Call all events generated by input changes
+    self.eval_combinational()
+
+    # Clock generation needed by VCD tracing
+    self.model.clk.value = 0
+    self.model.clk.value = 1
+
+    # Call all rising edge triggered functions
+    for i, func in enumerate( self._sequential_blocks ):
+      self._current_tick = i
+      func()
+    self._current_tick = None
+
+    # Then flop the shadow state on all registers
+    while self._register_queue:
+      reg = self._register_queue.pop()
+      reg.flop()
+
+    # Call all events generated by synchronous logic
+    self.eval_combinational()
+
+    # Increment the simulator cycle count
+    self.ncycles += 1
+
+    # Tell the metrics module to prepare for the next cycle
+    self.metrics.incr_metrics_cycle()
+
   #---------------------------------------------------------------------
   # eval_combinational
   #---------------------------------------------------------------------
@@ -209,6 +329,23 @@ class SimulationTool( object ):
       func()
       self._current_func = None
 
+  #---------------------------------------------------------------------
+  # _prof_eval
+  #---------------------------------------------------------------------
+  # Implementation of eval_combinational() for use when profiling
+  # models, times each combinational block with the ProfileMetrics
+  # collector.
+  def _prof_eval( self ):
+    metrics = self.metrics
+    while self._event_queue.len():
+      self._current_func = func = self._event_queue.deq()
+      metrics.start_block()
+      try:
+        func()
+      finally:
+        metrics.end_block( func )
+      self._current_func = None
+
   #---------------------------------------------------------------------
   # add_event
   #---------------------------------------------------------------------
@@ -224,12 +361,12 @@ class SimulationTool( object ):
     #print([x.fullname for x in signal_value._DEBUG_signal_names], end='')
     #print(self._DEBUG_signal_cbs[signal_value])
 
-    self.metrics.incr_add_events()
+    self.metrics.incr_add_events( signal_value )
 
     # Place all other callbacks in the event queue for execution later
 
     for func in signal_value._callbacks:
-      self.metrics.incr_add_callbk()
+      self.metrics.incr_add_callbk( func )
       if func != self._current_func:
         self._event_queue.enq( func.cb, func.id )
 
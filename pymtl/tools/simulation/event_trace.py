@@ -0,0 +1,351 @@
+#=======================================================================
+# event_trace.py
+#=======================================================================
+# Binary event tracing support for SimulationTool.
+#
+# The EventTraceRecorder is a metrics collector which records the
+# scheduling decisions made by the simulator: which nets changed (and
+# which block wrote them), which blocks each change tried to place on the
+# event queue, and the order in which blocks were evaluated. Records are
+# written to a memory-mapped ring file so that traces of long simulations
+# use a fixed amount of disk space and keep the most recent events.
+#
+#   recorder = EventTraceRecorder( 'model.evt' )
+#   sim      = SimulationTool( model, collect_metrics=recorder )
+#   ...
+#   recorder.close()
+#
+# The trace can then be analyzed with analyze_event_trace() or from the
+# command line:
+#
+#   python -m pymtl.tools.simulation.event_trace model.evt
+#
+# File format (all fields little endian):
+#
+#   header:  8s magic, I version, I record size, Q capacity, Q count
+#   records: I cycle, i net id, i block id, B kind, 3x padding
+#
+# Records are stored at index (n % capacity) after the header, where n is
+# the sequence number of the record. Block ids are the simulator event
+# queue ids. Net and block names are stored in a JSON file alongside the
+# trace (<filename>.json).
+
+from __future__ import print_function
+
+import collections
+import json
+import mmap
+import struct
+import sys
+
+from SimulationMetrics import _model_path
+
+#-----------------------------------------------------------------------
+# Record kinds
+#-----------------------------------------------------------------------
+
+CYCLE  = 0  # end of a simulation cycle
+TICK   = 1  # start of the sequential (clock edge) phase of a cycle
+CHANGE = 2  # net changed value, block is the writer (-1 if not a block)
+ENQ    = 3  # net change placed block on the event queue
+SKIP   = 4  # net change did not requeue the currently executing block
+EVAL   = 5  # block was evaluated
+
+KIND_NAMES = [ 'cycle', 'tick', 'change', 'enq', 'skip', 'eval' ]
+
+_MAGIC   = 'PYMTLEVT'
+_VERSION = 1
+_HEADER  = struct.Struct( '<8sIIQQ' )
+_RECORD  = struct.Struct( '<IiiB3x' )
+
+#-----------------------------------------------------------------------
+# EventTraceRecorder
+#-----------------------------------------------------------------------
+# Metrics collector which writes binary event records to a ring file
+# holding the most recent capacity records.
+class EventTraceRecorder( object ):
+
+  def __init__( self, filename, capacity = 1 << 20 ):
+
+    self.filename   = filename
+    self.capacity   = capacity
+
+    self._ncycles   = 0
+    self._count     = 0
+    self._current   = -1
+    self._net       = -1
+    self._models    = []
+    self._blocks    = {}
+    self._net_ids   = {}
+
+    # Size the file and map it into memory
+
+    size = _HEADER.size + capacity * _RECORD.size
+    self._file = open( filename, 'w+b' )
+    self._file.truncate( size )
+    self._mm   = mmap.mmap( self._file.fileno(), size )
+    self._write_header()
+
+  #---------------------------------------------------------------------
+  # Registration hooks
+  #---------------------------------------------------------------------
+
+  def reg_model( self, model ):
+    self._models.append( model )
+
+  def reg_eval( self, eval, is_slice = False ):
+    name = eval._slice_str if is_slice else eval.__name__
+    self._blocks[ eval.id ] = '{}.{}'.format( _model_path( eval._model ), name )
+
+  def reg_tick( self, tick, model ):
+    pass
+
+  def wrap_slice( self, slice_cb ):
+    return slice_cb
+
+  #---------------------------------------------------------------------
+  # Recording hooks
+  #---------------------------------------------------------------------
+
+  def incr_metrics_cycle( self ):
+    self._record( CYCLE, -1, -1 )
+    self._current  = -1
+    self._ncycles += 1
+    self._write_header()
+
+  def start_tick( self ):
+    self._record( TICK, -1, -1 )
+    self._current = -1
+
+  # Nets are keyed by identity since BitStructs hash by value.
+  def incr_add_events( self, signal_value ):
+    key = id( signal_value )
+    try:
+      net = self._net_ids[ key ]
+    except KeyError:
+      net = self._net_ids[ key ] = len( self._net_ids )
+    self._net = net
+    self._record( CHANGE, net, self._current )
+
+  def incr_add_callbk( self, func ):
+    kind = SKIP if func.id == self._current else ENQ
+    self._record( kind, self._net, func.id )
+
+  def incr_comb_evals( self, eval ):
+    self._current = eval.id
+    self._record( EVAL, -1, eval.id )
+
+  #---------------------------------------------------------------------
+  # close
+  #---------------------------------------------------------------------
+  # Flush the trace and write the net/block name table. Must be called
+  # once the simulation is complete.
+  def close( self ):
+    self._write_header()
+    self._mm.flush()
+    self._mm.close()
+    self._file.close()
+
+    # Name each net after the signals it contains
+
+    nets = collections.defaultdict( list )
+    for model in self._models:
+      for signal in model.get_ports() + model.get_wires():
+        net = self._net_ids.get( id( signal._signalvalue ) )
+        if net is not None:
+          nets[ net ].append( '{}.{}'.format( _model_path( model ),
+                                              signal.name ) )
+
+    with open( self.filename + '.json', 'w' ) as o:
+      json.dump({
+        'nets'   : { i : sorted( x ) for i, x in nets.items() },
+        'blocks' : self._blocks,
+      }, o, indent = 2 )
+
+  #---------------------------------------------------------------------
+  # _record
+  #---------------------------------------------------------------------
+  def _record( self, kind, net, block ):
+    offset = _HEADER.size + ( self._count % self.capacity ) * _RECORD.size
+    _RECORD.pack_into( self._mm, offset, self._ncycles, net, block, kind )
+    self._count += 1
+
+  #---------------------------------------------------------------------
+  # _write_header
+  #---------------------------------------------------------------------
+  def _write_header( self ):
+    _HEADER.pack_into( self._mm, 0, _MAGIC, _VERSION, _RECORD.size,
+                       self.capacity, self._count )
+
+#-----------------------------------------------------------------------
+# read_event_trace
+#-----------------------------------------------------------------------
+# Generator returning ( cycle, net, block, kind ) tuples for all records
+# remaining in the ring file, oldest first.
+def read_event_trace( filename ):
+
+  with open( filename, 'rb' ) as f:
+    mm = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+
+  try:
+    magic, version, rsize, capacity, count = _HEADER.unpack_from( mm, 0 )
+    if magic != _MAGIC or version != _VERSION or rsize != _RECORD.size:
+      raise ValueError( "'{}' is not a PyMTL event trace!".format( filename ) )
+
+    for n in xrange( max( 0, count - capacity ), count ):
+      offset = _HEADER.size + ( n % capacity ) * rsize
+      yield _RECORD.unpack_from( mm, offset )
+  finally:
+    mm.close()
+
+#-----------------------------------------------------------------------
+# analyze_event_trace
+#-----------------------------------------------------------------------
+# Analyze an event trace and return a dictionary containing:
+#
+# - delta_chains: the deepest chains of evaluations in a single cycle,
+#   where each block in the chain was enqueued by a net written by the
+#   previous block.
+# - oscillating:  blocks evaluated more than once per cycle phase.
+# - fanout:       per net change counts and the number of blocks each
+#   change tried to enqueue.
+#
+# At most limit entries are returned for each category.
+def analyze_event_trace( filename, limit = 10 ):
+
+  names       = _read_names( filename )
+  block_name  = lambda x: names['blocks'].get( str( x ), 'block{}'.format( x ) )
+  net_name    = lambda x: names['nets'  ].get( str( x ), [ 'net{}'.format( x ) ] )[0]
+
+  chains      = []              # ( depth, cycle, node ) for each cycle
+  evals       = collections.Counter()
+  redundant   = collections.Counter()
+  max_evals   = collections.Counter()
+  changes     = collections.Counter()
+  enqueues    = collections.Counter()
+
+  # Per-phase state. Nodes are ( block, depth, parent ) tuples.
+
+  pending     = {}
+  phase_evals = collections.Counter()
+  current     = None
+  cause       = None
+  deepest     = None
+  ncycles     = 0
+
+  # Blocks still pending at the end of a phase were never evaluated for
+  # those enqueues (e.g., a block which tried to requeue itself), so they
+  # must not become the parent of a later evaluation.
+
+  def end_phase():
+    for block, n in phase_evals.items():
+      max_evals[ block ] = max( max_evals[ block ], n )
+      if n > 1:
+        redundant[ block ] += n - 1
+    phase_evals.clear()
+    pending.clear()
+
+  for cycle, net, block, kind in read_event_trace( filename ):
+
+    if   kind == CHANGE:
+      changes[ net ] += 1
+      cause = current if block != -1 else None
+
+    elif kind == ENQ:
+      enqueues[ net ] += 1
+      if block not in pending:
+        pending[ block ] = cause
+
+    elif kind == EVAL:
+      parent  = pending.pop( block, None )
+      current = ( block, parent[1] + 1 if parent else 1, parent )
+      evals      [ block ] += 1
+      phase_evals[ block ] += 1
+      if deepest is None or current[1] > deepest[1]:
+        deepest = current
+
+    elif kind in ( TICK, CYCLE ):
+      end_phase()
+      current = None
+      if kind == CYCLE:
+        if deepest:
+          chains.append( ( deepest[1], cycle, deepest ) )
+        deepest  = None
+        ncycles += 1
+
+  end_phase()
+
+  # Reconstruct the deepest chains
+
+  def unwind( node ):
+    path = []
+    while node:
+      path.append( block_name( node[0] ) )
+      node = node[2]
+    return list( reversed( path ) )
+
+  chains.sort( key = lambda x: x[0], reverse = True )
+
+  return {
+    'ncycles'      : ncycles,
+    'delta_chains' : [ { 'cycle' : c, 'depth' : d, 'chain' : unwind( n ) }
+                       for d, c, n in chains[:limit] ],
+    'oscillating'  : [ { 'block'     : block_name( b ),
+                         'redundant' : n,
+                         'evals'     : evals[ b ],
+                         'max_evals' : max_evals[ b ] }
+                       for b, n in redundant.most_common( limit ) ],
+    'fanout'       : [ { 'net'      : net_name( x ),
+                         'changes'  : changes[ x ],
+                         'enqueues' : n }
+                       for x, n in enqueues.most_common( limit ) ],
+  }
+
+#-----------------------------------------------------------------------
+# print_event_trace_report
+#-----------------------------------------------------------------------
+def print_event_trace_report( filename, limit = 10, o = None ):
+
+  o = o or sys.stdout
+  r = analyze_event_trace( filename, limit )
+
+  print( "-"*72, file=o )
+  print( "Event Trace: {} ({} cycles)".format( filename, r['ncycles'] ), file=o )
+  print( "-"*72, file=o )
+  print( file=o )
+  print( "Deepest delta chains", file=o )
+  for x in r['delta_chains']:
+    print( "  cycle {:8}  depth {:4}  {}".format(
+             x['cycle'], x['depth'], ' -> '.join( x['chain'] ) ), file=o )
+  print( file=o )
+  print( "Oscillating blocks (evaluated more than once per phase)", file=o )
+  for x in r['oscillating']:
+    print( "  redundant {:8}  evals {:8}  max/phase {:4}  {}".format(
+             x['redundant'], x['evals'], x['max_evals'], x['block'] ), file=o )
+  print( file=o )
+  print( "Net fan-out cost", file=o )
+  for x in r['fanout']:
+    print( "  enqueues {:8}  changes {:8}  {}".format(
+             x['enqueues'], x['changes'], x['net'] ), file=o )
+  print( "-"*72, file=o )
+
+#-----------------------------------------------------------------------
+# _read_names
+#-----------------------------------------------------------------------
+def _read_names( filename ):
+  try:
+    with open( filename + '.json' ) as f:
+      return json.load( f )
+  except IOError:
+    return { 'nets' : {}, 'blocks' : {} }
+
+#-----------------------------------------------------------------------
+# __main__
+#-----------------------------------------------------------------------
+if __name__ == '__main__':
+  import argparse
+  p = argparse.ArgumentParser( description = 'Analyze a PyMTL event trace.' )
+  p.add_argument( 'filename' )
+  p.add_argument( '--limit', type = int, default = 10 )
+  opts = p.parse_args()
+  print_event_trace_report( opts.filename, opts.limit )
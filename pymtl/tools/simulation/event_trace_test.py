@@ -0,0 +1,157 @@
+#=======================================================================
+# event_trace_test.py
+#=======================================================================
+
+import sys
+import collections
+
+from pymtl import *
+
+from event_trace import (
+  EventTraceRecorder, read_event_trace, analyze_event_trace,
+  print_event_trace_report, EVAL, CYCLE
+)
+
+#-----------------------------------------------------------------------
+# ChainModel
+#-----------------------------------------------------------------------
+# A chain of four combinational blocks, plus a block sensitive to both
+# the start and the end of the chain which is evaluated twice whenever
+# the input changes.
+class ChainModel( Model ):
+  def __init__( s ):
+    s.in_  = InPort ( 8 )
+    s.out  = OutPort( 8 )
+    s.late = OutPort( 8 )
+    s.w0, s.w1, s.w2, s.w3 = Wire( 8 ), Wire( 8 ), Wire( 8 ), Wire( 8 )
+
+    @s.combinational
+    def b0():
+      s.w0.value = s.in_ + 1
+    @s.combinational
+    def b1():
+      s.w1.value = s.w0 + 1
+    @s.combinational
+    def b2():
+      s.w2.value = s.w1 + 1
+    @s.combinational
+    def b3():
+      s.w3.value = s.w2 + 1
+    @s.combinational
+    def b_late():
+      s.late.value = s.w0 + s.w3
+
+    s.connect( s.out, s.w3 )
+
+def run( filename, capacity = 1 << 16, ncycles = 10 ):
+  model    = ChainModel()
+  model.elaborate()
+  recorder = EventTraceRecorder( filename, capacity )
+  sim      = SimulationTool( model, collect_metrics = recorder )
+  sim.reset()
+  for i in range( ncycles ):
+    model.in_.value = i
+    sim.cycle()
+  recorder.close()
+  assert model.out == ncycles - 1 + 4
+  return sim
+
+#-----------------------------------------------------------------------
+# test_record
+#-----------------------------------------------------------------------
+def test_record( tmpdir ):
+  filename = str( tmpdir.join( 'chain.evt' ) )
+  sim      = run( filename )
+
+  records = list( read_event_trace( filename ) )
+  assert len( [ x for x in records if x[3] == CYCLE ] ) == sim.ncycles
+  assert len( [ x for x in records if x[3] == EVAL  ] ) > 0
+
+#-----------------------------------------------------------------------
+# test_record_optimize
+#-----------------------------------------------------------------------
+# The perf implementation of cycle used under python -O does not call
+# the metrics hooks, so the simulator has to fall back to the dev
+# implementation when a recorder is attached.
+def test_record_optimize( tmpdir, monkeypatch ):
+  Flags = collections.namedtuple( 'Flags', 'optimize' )
+  monkeypatch.setattr( sys.modules[ SimulationTool.__module__ ], 'flags',
+                       Flags( optimize = 1 ) )
+
+  filename = str( tmpdir.join( 'chain.evt' ) )
+  sim      = run( filename )
+
+  records = list( read_event_trace( filename ) )
+  assert len( [ x for x in records if x[3] == CYCLE ] ) == sim.ncycles
+  assert len( [ x for x in records if x[3] == EVAL  ] ) > 0
+
+#-----------------------------------------------------------------------
+# test_ring
+#-----------------------------------------------------------------------
+def test_ring( tmpdir ):
+  filename = str( tmpdir.join( 'chain.evt' ) )
+  sim      = run( filename, capacity = 32 )
+
+  records = list( read_event_trace( filename ) )
+  assert len( records ) == 32
+  assert records[-1][0] == sim.ncycles - 1
+  assert records[-1][3] == CYCLE
+
+#-----------------------------------------------------------------------
+# test_analyze
+#-----------------------------------------------------------------------
+def test_analyze( tmpdir ):
+  filename = str( tmpdir.join( 'chain.evt' ) )
+  sim      = run( filename )
+
+  r = analyze_event_trace( filename )
+  assert r['ncycles'] == sim.ncycles
+
+  deepest = r['delta_chains'][0]
+  assert deepest['depth'] == 5
+  assert deepest['chain'] == [ 'top.b0', 'top.b1', 'top.b2', 'top.b3',
+                               'top.b_late' ]
+
+  # b_late runs twice every time the input changes, other blocks only
+  # when the event queue is first primed
+
+  assert r['oscillating'][0]['block']     == 'top.b_late'
+  assert r['oscillating'][0]['redundant'] >= 10
+  assert r['oscillating'][0]['max_evals'] >= 2
+
+  fanout = { x['net'] : x for x in r['fanout'] }
+  assert fanout['top.w0']['enqueues'] == 2 * fanout['top.w0']['changes']
+  assert fanout['top.w1']['enqueues'] == 1 * fanout['top.w1']['changes']
+
+  report = tmpdir.join( 'report.txt' )
+  with open( str( report ), 'w' ) as o:
+    print_event_trace_report( filename, o = o )
+  assert 'top.b0 -> top.b1 -> top.b2 -> top.b3' in report.read()
+
+#-----------------------------------------------------------------------
+# test_analyze_stale_enqueue
+#-----------------------------------------------------------------------
+# A block enqueued in one cycle but not evaluated until a later one must
+# not be chained to the block which enqueued it.
+class Block( object ):
+  def __init__( s, id ):
+    s.id = id
+
+def test_analyze_stale_enqueue( tmpdir ):
+  filename = str( tmpdir.join( 'stale.evt' ) )
+  recorder = EventTraceRecorder( filename, 64 )
+  b0, b1   = Block( 0 ), Block( 1 )
+
+  recorder.incr_comb_evals( b0 )
+  recorder.incr_add_events( 'net0' )
+  recorder.incr_add_callbk( b1 )
+  recorder.incr_metrics_cycle()
+
+  recorder.incr_add_events( 'net1' )
+  recorder.incr_add_callbk( b1 )
+  recorder.incr_comb_evals( b1 )
+  recorder.incr_metrics_cycle()
+  recorder.close()
+
+  r = analyze_event_trace( filename )
+  assert [ x['depth'] for x in r['delta_chains'] ] == [ 1, 1 ]
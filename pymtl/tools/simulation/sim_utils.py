@@ -19,12 +19,13 @@ from ast_visitor import (
 # collect_signals
 #-----------------------------------------------------------------------
 # Utility function to collect all the Signal type objects (ports,
-# wires, constants) in the model.
-def collect_signals( model ):
-  #self.metrics.reg_model( model )
+# wires, constants) in the model. Each visited model is also registered
+# with the (optional) simulator metrics collector.
+def collect_signals( model, metrics = None ):
+  if metrics: metrics.reg_model( model )
   signals = set( model.get_ports() + model.get_wires() )
   for m in model.get_submodules():
-    signals.update( collect_signals( m ) )
+    signals.update( collect_signals( m, metrics ) )
   return signals
 
 #-----------------------------------------------------------------------
@@ -164,7 +165,7 @@ def insert_signal_values( sim, nets ):
 #---------------------------------------------------------------------
 # Register all decorated @tick and  @posedge_clk functions.
 # Sequential logic blocks get executed any time cycle() is called.
-def register_seq_blocks( model ):
+def register_seq_blocks( model, metrics = None ):
 
   all_models = []
   def create_model_list( current ):
@@ -189,6 +190,8 @@ def register_seq_blocks( model ):
       if 'tick_fl' in DetectDecorators().enter( tree ):
         func = _pausable_tick( func )
 
+      if metrics: metrics.reg_tick( func, i )
+
       sequential_blocks.append( func )
 
     for func in i.get_combinational_blocks():
@@ -205,7 +208,7 @@ def register_seq_blocks( model ):
 # Register all decorated @combinational functions with the simulator.
 # Combinational logic blocks are registered with SignalValue objects
 # and get added to the event queue when values are updated.
-def register_comb_blocks( model, event_queue ):
+def register_comb_blocks( model, event_queue, metrics = None ):
 
   # Get the sensitivity list of each event driven (combinational) block
   # TODO: do before or after we swap value nodes?
@@ -227,7 +230,7 @@ def register_comb_blocks( model, event_queue ):
   for func_ptr, sensitivity_list in model._newsenses.items():
     func_ptr.id = event_queue.get_id()
     func_ptr.cb = func_ptr
-    #self.metrics.reg_eval( func_ptr.cb )
+    if metrics: metrics.reg_eval( func_ptr.cb )
     for signal_value in sensitivity_list:
 
       # Only add "notify_sim" funcs if @comb blocks are sensitive to us
@@ -243,7 +246,7 @@ def register_comb_blocks( model, event_queue ):
 
   # Recursively perform for submodules
   for m in model.get_submodules():
-    register_comb_blocks( m, event_queue )
+    register_comb_blocks( m, event_queue, metrics )
 
 #-----------------------------------------------------------------------
 # _add_senses
@@ -315,7 +318,7 @@ def _attr_name_to_object( model, name ):
 # All ConnectionEdges that contain bit slicing need to be turned into
 # combinational blocks.  This significantly simplifies the connection
 # graph update logic.
-def create_slice_callbacks( slice_connects, event_queue ):
+def create_slice_callbacks( slice_connects, event_queue, metrics = None ):
 
   for c in slice_connects:
     src = c.src_node._signalvalue
@@ -330,11 +333,14 @@ def create_slice_callbacks( slice_connects, event_queue ):
     else:
       func_ptr     = _create_slice_cb_closure( c )
       signal_value = c.src_node._signalvalue
-      signal_value.register_slice( func_ptr )
       func_ptr.id = event_queue.get_id()
       func_ptr.cb = func_ptr
       event_queue.enq( func_ptr.cb, func_ptr.id )
-      #self.metrics.reg_eval( func_ptr.cb, is_slice = True )
+      if metrics:
+        metrics.reg_eval( func_ptr.cb, is_slice = True )
+        signal_value.register_slice( metrics.wrap_slice( func_ptr ) )
+      else:
+        signal_value.register_slice( func_ptr )
       #self._DEBUG_signal_cbs[ signal_value ].append( func_ptr )
 
 #-----------------------------------------------------------------------
@@ -351,8 +357,52 @@ def _create_slice_cb_closure( c ):
     # to a BitSlice will updates the Bits it was sliced from, but
     # not vice versa.
     dest_bits.v = src[ src_addr ]
+  # Record the model owning the connection and a readable name for the
+  # callback (used by ProfileMetrics).
+  owner               = _common_parent( c.src_node.parent, c.dest_node.parent )
+  slice_cb._model     = owner
+  slice_cb._slice_str = '{}{} -> {}{}'.format(
+    _relative_name( c.src_node,  owner ), _slice_str( c.src_slice  ),
+    _relative_name( c.dest_node, owner ), _slice_str( c.dest_slice ),
+  )
   return slice_cb
 
+#-----------------------------------------------------------------------
+# _relative_name
+#-----------------------------------------------------------------------
+# Utility function returning the name of a signal relative to the given
+# ancestor model, e.g. 'queue.enq_val'.
+def _relative_name( signal, ancestor ):
+  names = [ signal.name ]
+  model = signal.parent
+  while model is not None and model is not ancestor:
+    names.append( model.name )
+    model = model.parent
+  return '.'.join( reversed( names ) )
+
+#-----------------------------------------------------------------------
+# _slice_str
+#-----------------------------------------------------------------------
+# Utility function to format a connection slice address for display.
+def _slice_str( addr ):
+  if   addr is None:              return ''
+  elif isinstance( addr, slice ): return '[{}:{}]'.format( addr.start, addr.stop )
+  else:                           return '[{}]'.format( addr )
+
+#-----------------------------------------------------------------------
+# _common_parent
+#-----------------------------------------------------------------------
+# Utility function to find the innermost model containing both models,
+# used to decide which model owns a slice connection.
+def _common_parent( a, b ):
+  ancestors = set()
+  while a is not None:
+    ancestors.add( a )
+    a = a.parent
+  while b is not None and b not in ancestors:
+    b = b.parent
+  return b
+
 
 #---------------------------------------------------------------------
 # _pausable_tick
@@ -389,6 +439,9 @@ def _pausable_tick( func ):
   def outer_wrapper():
     func._pausable_tick.switch()
 
+  outer_wrapper.__name__ = func.__name__
+  outer_wrapper._model   = func._model
+
   return outer_wrapper
 
 #-----------------------------------------------------------------------
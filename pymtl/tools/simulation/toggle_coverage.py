@@ -0,0 +1,204 @@
+#=======================================================================
+# toggle_coverage.py
+#=======================================================================
+# Toggle coverage and switching activity collection for SimulationTool.
+#
+# Usage:
+#
+#   sim = SimulationTool( model )
+#   cov = ToggleCoverage( sim )
+#   ...
+#   cov.print_report()
+#
+# Every net in the design keeps its value at the previous clock edge and
+# two bitmaps (Python ints) recording which bits have risen (0 -> 1) and
+# fallen (1 -> 0). Rather than running a closure on every value change,
+# each net registers a C-level functools.partial which adds the net index
+# to a dirty set. On each rising clock edge only the dirty nets are
+# compared against their previous value with a single XOR. A bit is
+# covered once it has both risen and fallen. Glitches between clock edges
+# are not counted.
+#
+# Like VCD tracing, sampling relies on the clock toggle performed by the
+# development cycle() implementation, so coverage is not collected when
+# Python is run with -O.
+
+from __future__ import print_function
+
+import functools
+import json
+import sys
+
+from SimulationMetrics import _model_path
+
+#-----------------------------------------------------------------------
+# ToggleCoverage
+#-----------------------------------------------------------------------
+class ToggleCoverage( object ):
+
+  def __init__( self, simulator ):
+
+    self.sim      = simulator
+    self.ncycles  = 0
+
+    self._nets    = []
+    self._prev    = []
+    self._rise    = []
+    self._fall    = []
+    self._toggles = []
+    self._index   = {}
+    self._dirty   = set()
+
+    clk = simulator.model.clk
+
+    # Register a dirty callback for every non-constant Bits net. Nets are
+    # identified by index since BitStructs hash by value.
+
+    for group in simulator._nets:
+      svalue = next( iter( group ) )._signalvalue
+      if svalue is clk or svalue.constant or not hasattr( svalue, '_uint' ):
+        continue
+      i = len( self._nets )
+      self._index[ id( svalue ) ] = i
+      self._nets   .append( svalue )
+      self._prev   .append( svalue._uint )
+      self._rise   .append( 0 )
+      self._fall   .append( 0 )
+      self._toggles.append( 0 )
+      svalue.register_slice( functools.partial( self._dirty.add, i ) )
+
+    # Sample on each rising clock edge
+
+    def sample_on_posedge():
+      if clk._uint:
+        self.sample()
+
+    clk.register_slice( sample_on_posedge )
+
+  #---------------------------------------------------------------------
+  # sample
+  #---------------------------------------------------------------------
+  # Update the toggle bitmaps of all nets written since the last sample.
+  def sample( self ):
+    nets, prev, rise, fall = self._nets, self._prev, self._rise, self._fall
+    for i in self._dirty:
+      cur     = nets[ i ]._uint
+      changed = prev[ i ] ^ cur
+      if changed:
+        rise[ i ] |= changed & cur
+        fall[ i ] |= changed & prev[ i ]
+        self._toggles[ i ] += bin( changed ).count( '1' )
+        prev[ i ]  = cur
+    self._dirty.clear()
+    self.ncycles += 1
+
+  #---------------------------------------------------------------------
+  # clear
+  #---------------------------------------------------------------------
+  # Discard coverage collected so far (e.g., during reset), using the
+  # current net values as the new baseline.
+  def clear( self ):
+    for i, net in enumerate( self._nets ):
+      self._prev   [ i ] = net._uint
+      self._rise   [ i ] = 0
+      self._fall   [ i ] = 0
+      self._toggles[ i ] = 0
+    self._dirty.clear()
+    self.ncycles = 0
+
+  #---------------------------------------------------------------------
+  # get_coverage
+  #---------------------------------------------------------------------
+  # Return a list of per-model records in hierarchical order. Each record
+  # contains coverage for the model's own signals, totals including all
+  # submodels (hier_*), and the list of per-signal records.
+  def get_coverage( self ):
+
+    records = []
+    ncycles = max( self.ncycles, 1 )
+
+    def visit( model ):
+      record = {
+        'model'       : _model_path( model ),
+        'class'       : model.__class__.__name__,
+        'nbits'       : 0,
+        'covered'     : 0,
+        'signals'     : [],
+      }
+      records.append( record )
+
+      for signal in model.get_ports() + model.get_wires():
+        i = self._index.get( id( signal._signalvalue ) )
+        if i is None:
+          continue
+        covered = self._rise[ i ] & self._fall[ i ]
+        record['signals'].append({
+          'signal'   : signal.name,
+          'nbits'    : signal.nbits,
+          'rise'     : self._rise[ i ],
+          'fall'     : self._fall[ i ],
+          'covered'  : _popcount( covered ),
+          'toggles'  : self._toggles[ i ],
+          'activity' : self._toggles[ i ] / float( signal.nbits * ncycles ),
+        })
+        record['nbits'  ] += signal.nbits
+        record['covered'] += _popcount( covered )
+
+      hier_nbits   = record['nbits'  ]
+      hier_covered = record['covered']
+      for submodel in model.get_submodules():
+        child         = visit( submodel )
+        hier_nbits   += child['hier_nbits'  ]
+        hier_covered += child['hier_covered']
+
+      record['hier_nbits'  ] = hier_nbits
+      record['hier_covered'] = hier_covered
+      return record
+
+    visit( self.sim.model )
+    return records
+
+  #---------------------------------------------------------------------
+  # print_report
+  #---------------------------------------------------------------------
+  # Print toggle coverage grouped by model hierarchy. If detailed, also
+  # list each signal which is not fully covered.
+  def print_report( self, detailed = False, o = None ):
+    o   = o or sys.stdout
+    pct = lambda x, n: 100.0 * x / n if n else 100.0
+
+    print( "-"*72, file=o )
+    print( "Toggle Coverage ({} cycles)".format( self.ncycles ), file=o )
+    print( "-"*72, file=o )
+    print( "    hier%     own%  covered/bits  model (class)", file=o )
+    for x in self.get_coverage():
+      print( "  {:6.2f}%  {:6.2f}%  {:>12}  {} ({})".format(
+               pct( x['hier_covered'], x['hier_nbits'] ),
+               pct( x['covered'], x['nbits'] ),
+               '{}/{}'.format( x['hier_covered'], x['hier_nbits'] ),
+               x['model'], x['class'] ), file=o )
+      if not detailed:
+        continue
+      for s in x['signals']:
+        if s['covered'] < s['nbits']:
+          print( "      {:>3}/{:<3} bits  activity {:.3f}  {}  "
+                 "rise {:0{w}b} fall {:0{w}b}".format(
+                   s['covered'], s['nbits'], s['activity'], s['signal'],
+                   s['rise'], s['fall'], w = s['nbits'] ), file=o )
+    print( "-"*72, file=o )
+
+  #---------------------------------------------------------------------
+  # dump_json
+  #---------------------------------------------------------------------
+  def dump_json( self, filename ):
+    with open( filename, 'w' ) as o:
+      json.dump({
+        'ncycles' : self.ncycles,
+        'models'  : self.get_coverage(),
+      }, o, indent = 2 )
+
+#-----------------------------------------------------------------------
+# _popcount
+#-----------------------------------------------------------------------
+def _popcount( x ):
+  return bin( x ).count( '1' )
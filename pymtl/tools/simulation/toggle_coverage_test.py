@@ -0,0 +1,111 @@
+#=======================================================================
+# toggle_coverage_test.py
+#=======================================================================
+
+import json
+
+from pymtl import *
+
+from toggle_coverage import ToggleCoverage
+
+#-----------------------------------------------------------------------
+# Models
+#-----------------------------------------------------------------------
+
+class Counter( Model ):
+  def __init__( s ):
+    s.en    = InPort ( 1 )
+    s.count = OutPort( 4 )
+
+    @s.tick
+    def logic():
+      if s.reset:
+        s.count.next = 0
+      elif s.en:
+        s.count.next = s.count + 1
+
+class CounterPair( Model ):
+  def __init__( s ):
+    s.en    = InPort ( 1 )
+    s.fast  = OutPort( 4 )
+    s.slow  = OutPort( 4 )
+    s.ctr   = Counter[2]()
+
+    s.connect( s.en,   s.ctr[0].en    )
+    s.connect( s.fast, s.ctr[0].count )
+    s.connect( s.slow, s.ctr[1].count )
+
+    @s.combinational
+    def comb_logic():
+      s.ctr[1].en.value = s.ctr[0].count == 15
+
+def run( ncycles ):
+  model = CounterPair()
+  model.elaborate()
+  sim   = SimulationTool( model )
+  cov   = ToggleCoverage( sim )
+  sim.reset()
+  cov.clear()
+  model.en.value = 1
+  for i in range( ncycles ):
+    sim.cycle()
+  return model, sim, cov
+
+#-----------------------------------------------------------------------
+# test_toggle_coverage
+#-----------------------------------------------------------------------
+def test_toggle_coverage():
+  model, sim, cov = run( 20 )
+  assert cov.ncycles == 20
+
+  records = { x['model'] : x for x in cov.get_coverage() }
+  assert set( records ) == { 'top', 'top.ctr[0]', 'top.ctr[1]' }
+
+  # The fast counter has wrapped around, the slow counter has only
+  # incremented once.
+
+  signals = { s['signal'] : s for s in records['top.ctr[0]']['signals'] }
+  assert signals['count']['covered'] == 4
+  assert signals['count']['rise']    == 0b1111
+  assert signals['count']['fall']    == 0b1111
+
+  signals = { s['signal'] : s for s in records['top.ctr[1]']['signals'] }
+  assert signals['count']['covered'] == 0
+  assert signals['count']['rise']    == 0b0001
+  assert signals['count']['fall']    == 0b0000
+
+  top = records['top']
+  assert top['hier_nbits'] == top['nbits'] + records['top.ctr[0]']['hier_nbits'] \
+                                           + records['top.ctr[1]']['hier_nbits']
+  assert 0 < top['hier_covered'] < top['hier_nbits']
+
+#-----------------------------------------------------------------------
+# test_toggle_activity
+#-----------------------------------------------------------------------
+def test_toggle_activity():
+  model, sim, cov = run( 32 )
+
+  # A free running 4 bit counter toggles 16+8+4+2 bits every 16 cycles.
+  # Each clock edge samples the value from the previous cycle, so 32
+  # cycles observe 31 increments, missing the final 15 -> 0 transition.
+
+  records = { x['model'] : x for x in cov.get_coverage() }
+  signals = { s['signal'] : s for s in records['top.ctr[0]']['signals'] }
+  assert signals['count']['toggles']  == 2 * 30 - 4
+  assert signals['count']['activity'] == 56 / float( 4 * 32 )
+
+#-----------------------------------------------------------------------
+# test_toggle_report
+#-----------------------------------------------------------------------
+def test_toggle_report( tmpdir ):
+  model, sim, cov = run( 20 )
+
+  report = tmpdir.join( 'coverage.txt' )
+  with open( str( report ), 'w' ) as o:
+    cov.print_report( detailed = True, o = o )
+  assert 'top.ctr[1] (Counter)' in report.read()
+
+  cov.dump_json( str( tmpdir.join( 'coverage.json' ) ) )
+  data = json.loads( tmpdir.join( 'coverage.json' ).read() )
+  assert data['ncycles'] == 20
+  assert data['models'][0]['model'] == 'top'
@@ -0,0 +1,282 @@
+#=======================================================================
+# build_cache.py
+#=======================================================================
+# A content-addressed cache for build artifacts shared between processes
+# and working directories.
+#
+# Each entry is a directory named after a hash of everything which went
+# into the build (source code, tool versions, flags, templates). Builds
+# are serialized per key with a lock file so concurrent processes (e.g.,
+# pytest-xdist workers) build each artifact only once, and entries are
+# evicted least recently used first once the cache grows beyond its size
+# limit.
+#
+# The cache directory defaults to $XDG_CACHE_HOME/pymtl (~/.cache/pymtl)
+# and can be changed with the PYMTL_CACHE_DIR environment variable.
+# Setting PYMTL_CACHE_DIR to an empty string disables the cache. The size
+# limit in megabytes can be set with PYMTL_CACHE_SIZE_MB.
+
+import os
+import errno
+import fcntl
+import shutil
+import filecmp
+import hashlib
+import tempfile
+import contextlib
+
+DEFAULT_SIZE_MB = 1024
+
+#-----------------------------------------------------------------------
+# get_cache_dir
+#-----------------------------------------------------------------------
+# Return the cache directory, or None if caching has been disabled.
+
+def get_cache_dir():
+
+  cache_dir = os.environ.get( 'PYMTL_CACHE_DIR' )
+  if cache_dir is None:
+    xdg_dir   = os.environ.get( 'XDG_CACHE_HOME',
+                                os.path.join( '~', '.cache' ) )
+    cache_dir = os.path.join( xdg_dir, 'pymtl' )
+
+  return os.path.expanduser( cache_dir ) if cache_dir else None
+
+#-----------------------------------------------------------------------
+# cache_key
+#-----------------------------------------------------------------------
+# Hash a list of strings into a cache key. Each part is length-prefixed
+# so that different splits of the same text give different keys.
+
+def cache_key( *parts ):
+  h = hashlib.sha1()
+  for part in parts:
+    part = str( part )
+    h.update( '{}:'.format( len( part ) ) )
+    h.update( part )
+  return h.hexdigest()
+
+#-----------------------------------------------------------------------
+# BuildCache
+#-----------------------------------------------------------------------
+
+class BuildCache( object ):
+
+  def __init__( s, cache_dir=None, max_size=None ):
+
+    if cache_dir is None:
+      cache_dir = get_cache_dir()
+
+    if max_size is None:
+      size_mb  = os.environ.get( 'PYMTL_CACHE_SIZE_MB', DEFAULT_SIZE_MB )
+      max_size = int( size_mb ) * 1024 * 1024
+
+    s.cache_dir = cache_dir
+    s.max_size  = max_size
+    s.enabled   = bool( cache_dir )
+
+    if s.enabled:
+      _makedirs( cache_dir )
+
+  #---------------------------------------------------------------------
+  # lock
+  #---------------------------------------------------------------------
+  # Context manager holding an exclusive lock on the given key. evict()
+  # removes the lock file along with its entry, so once we hold the lock
+  # we retry if the file we locked is no longer the one in the cache.
+
+  @contextlib.contextmanager
+  def lock( s, key ):
+    while True:
+      fd = open( s._lock_file( key ), 'a' )
+      fcntl.flock( fd, fcntl.LOCK_EX )
+      if _is_linked( fd, s._lock_file( key ) ):
+        break
+      fd.close()
+
+    try:
+      yield
+    finally:
+      fcntl.flock( fd, fcntl.LOCK_UN )
+      fd.close()
+
+  #---------------------------------------------------------------------
+  # fetch
+  #---------------------------------------------------------------------
+  # Copy the cached files for key into dest_dir. Returns False if there
+  # is no complete entry for key. Files which are already up to date are
+  # not touched, and others are replaced by renaming so that a shared
+  # library which is already loaded is never modified in place.
+
+  def fetch( s, key, filenames, dest_dir='.' ):
+
+    entry = s._entry_dir( key )
+    srcs  = [ os.path.join( entry, f ) for f in filenames ]
+    if not all( os.path.exists( x ) for x in srcs ):
+      return False
+
+    try:
+      for src, filename in zip( srcs, filenames ):
+        dest = os.path.join( dest_dir, filename )
+        if os.path.exists( dest ) and filecmp.cmp( src, dest, shallow=False ):
+          continue
+        _atomic_copy( src, dest )
+    except ( IOError, OSError ):
+      return False
+
+    # Mark the entry as recently used
+
+    os.utime( entry, None )
+    return True
+
+  #---------------------------------------------------------------------
+  # store
+  #---------------------------------------------------------------------
+  # Add the given files from src_dir to the cache under key, then evict
+  # old entries if the cache is over its size limit.
+
+  def store( s, key, filenames, src_dir='.' ):
+
+    entry   = s._entry_dir( key )
+    tmp_dir = tempfile.mkdtemp( prefix='.tmp-', dir=s.cache_dir )
+
+    try:
+      for filename in filenames:
+        shutil.copy2( os.path.join( src_dir, filename ),
+                      os.path.join( tmp_dir, filename ) )
+      if os.path.exists( entry ):
+        shutil.rmtree( entry )
+      os.rename( tmp_dir, entry )
+    except:
+      shutil.rmtree( tmp_dir, ignore_errors=True )
+      raise
+
+    s.evict( keep=key )
+
+  #---------------------------------------------------------------------
+  # load
+  #---------------------------------------------------------------------
+  # Return the contents of a single cached file for key, or None if
+  # there is no entry for key.
+
+  def load( s, key, filename ):
+
+    entry = s._entry_dir( key )
+    try:
+      with open( os.path.join( entry, filename ) ) as fd:
+        data = fd.read()
+      os.utime( entry, None )
+    except ( IOError, OSError ):
+      return None
+
+    return data
+
+  #---------------------------------------------------------------------
+  # save
+  #---------------------------------------------------------------------
+  # Add a single file with the given contents to the cache under key.
+  # Entries are written atomically, so concurrent writers of the same
+  # key do not need to hold its lock. Small entries are saved frequently,
+  # so eviction is left to the next call to store().
+
+  def save( s, key, filename, data ):
+
+    entry   = s._entry_dir( key )
+    tmp_dir = tempfile.mkdtemp( prefix='.tmp-', dir=s.cache_dir )
+
+    with open( os.path.join( tmp_dir, filename ), 'w' ) as fd:
+      fd.write( data )
+
+    try:
+      os.rename( tmp_dir, entry )
+    except OSError:
+      shutil.rmtree( tmp_dir, ignore_errors=True )
+
+  #---------------------------------------------------------------------
+  # evict
+  #---------------------------------------------------------------------
+  # Remove least recently used entries until the cache is within its size
+  # limit. Entries which are currently locked are skipped, as are entries
+  # which another process removes or replaces while we scan them. The
+  # lock file of an evicted entry is removed with it.
+
+  def evict( s, keep=None ):
+
+    entries = []
+    total   = 0
+    for key in os.listdir( s.cache_dir ):
+      entry = s._entry_dir( key )
+      if key.startswith( '.' ) or not os.path.isdir( entry ):
+        continue
+      try:
+        size = sum( os.path.getsize( os.path.join( entry, f ) )
+                    for f in os.listdir( entry ) )
+        entries.append( ( os.path.getmtime( entry ), size, key ) )
+      except OSError:
+        continue
+      total += size
+
+    for mtime, size, key in sorted( entries ):
+      if total <= s.max_size:
+        break
+      if key == keep:
+        continue
+      with open( s._lock_file( key ), 'a' ) as fd:
+        try:
+          fcntl.flock( fd, fcntl.LOCK_EX | fcntl.LOCK_NB )
+        except IOError:
+          continue
+        if _is_linked( fd, s._lock_file( key ) ):
+          shutil.rmtree( s._entry_dir( key ), ignore_errors=True )
+          os.remove( s._lock_file( key ) )
+        fcntl.flock( fd, fcntl.LOCK_UN )
+      total -= size
+
+  #---------------------------------------------------------------------
+  # Helpers
+  #---------------------------------------------------------------------
+
+  def _entry_dir( s, key ):
+    return os.path.join( s.cache_dir, key )
+
+  def _lock_file( s, key ):
+    return os.path.join( s.cache_dir, '.' + key + '.lock' )
+
+#-----------------------------------------------------------------------
+# _atomic_copy
+#-----------------------------------------------------------------------
+
+def _atomic_copy( src, dest ):
+  dest_dir = os.path.dirname( os.path.abspath( dest ) )
+  fd, tmp  = tempfile.mkstemp( prefix='.tmp-', dir=dest_dir )
+  os.close( fd )
+  try:
+    shutil.copy2( src, tmp )
+    os.rename( tmp, dest )
+  except:
+    os.remove( tmp )
+    raise
+
+#-----------------------------------------------------------------------
+# _is_linked
+#-----------------------------------------------------------------------
+# Return True if the open file fd is still the file at path.
+
+def _is_linked( fd, path ):
+  try:
+    st = os.stat( path )
+  except OSError:
+    return False
+  fst = os.fstat( fd.fileno() )
+  return ( st.st_dev, st.st_ino ) == ( fst.st_dev, fst.st_ino )
+
+#-----------------------------------------------------------------------
+# _makedirs
+#-----------------------------------------------------------------------
+
+def _makedirs( path ):
+  try:
+    os.makedirs( path )
+  except OSError as e:
+    if e.errno != errno.EEXIST:
+      raise
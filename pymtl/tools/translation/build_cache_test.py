@@ -0,0 +1,161 @@
+#=======================================================================
+# build_cache_test.py
+#=======================================================================
+
+import os
+import threading
+
+from build_cache import BuildCache, cache_key, get_cache_dir
+
+#-----------------------------------------------------------------------
+# test_cache_key
+#-----------------------------------------------------------------------
+def test_cache_key():
+  assert cache_key( 'a', 'bc' ) == cache_key( 'a', 'bc' )
+  assert cache_key( 'a', 'bc' ) != cache_key( 'ab', 'c' )
+  assert cache_key( True, 'zeros' ) != cache_key( False, 'zeros' )
+
+#-----------------------------------------------------------------------
+# test_get_cache_dir
+#-----------------------------------------------------------------------
+def test_get_cache_dir( monkeypatch ):
+  monkeypatch.delenv( 'PYMTL_CACHE_DIR', raising=False )
+  monkeypatch.setenv( 'XDG_CACHE_HOME', '/tmp/xdg' )
+  assert get_cache_dir() == '/tmp/xdg/pymtl'
+
+  monkeypatch.setenv( 'PYMTL_CACHE_DIR', '/tmp/pymtl-cache' )
+  assert get_cache_dir() == '/tmp/pymtl-cache'
+
+  monkeypatch.setenv( 'PYMTL_CACHE_DIR', '' )
+  assert get_cache_dir() is None
+  assert not BuildCache().enabled
+
+#-----------------------------------------------------------------------
+# test_fetch_store
+#-----------------------------------------------------------------------
+def test_fetch_store( tmpdir ):
+  cache = BuildCache( str( tmpdir.join( 'cache' ) ) )
+  src   = tmpdir.mkdir( 'src' )
+  dest  = tmpdir.mkdir( 'dest' )
+  src.join( 'libfoo.so' ).write( 'lib' )
+  src.join( 'foo_v.py'  ).write( 'wrapper' )
+
+  files = [ 'libfoo.so', 'foo_v.py' ]
+  assert not cache.fetch( 'key', files, str( dest ) )
+  cache.store( 'key', files, str( src ) )
+  assert cache.fetch( 'key', files, str( dest ) )
+  assert dest.join( 'libfoo.so' ).read() == 'lib'
+  assert dest.join( 'foo_v.py'  ).read() == 'wrapper'
+
+  # Up to date files are left alone
+
+  inode = dest.join( 'libfoo.so' ).stat().ino
+  assert cache.fetch( 'key', files, str( dest ) )
+  assert dest.join( 'libfoo.so' ).stat().ino == inode
+
+  # Stale files are replaced with a new file rather than overwritten
+
+  dest.join( 'libfoo.so' ).write( 'old' )
+  assert cache.fetch( 'key', files, str( dest ) )
+  assert dest.join( 'libfoo.so' ).read() == 'lib'
+
+#-----------------------------------------------------------------------
+# test_evict
+#-----------------------------------------------------------------------
+def test_evict( tmpdir ):
+  cache = BuildCache( str( tmpdir.join( 'cache' ) ), max_size=250 )
+  src   = tmpdir.mkdir( 'src' )
+  src.join( 'lib.so' ).write( 'x' * 100 )
+
+  cache.store( 'a', [ 'lib.so' ], str( src ) )
+  cache.store( 'b', [ 'lib.so' ], str( src ) )
+  for key in [ 'a', 'b' ]:
+    with cache.lock( key ):
+      pass
+
+  # Touch a so that b is the least recently used entry
+
+  entry_a = tmpdir.join( 'cache', 'a' )
+  entry_b = tmpdir.join( 'cache', 'b' )
+  os.utime( str( entry_b ), ( 1, 1 ) )
+  assert cache.fetch( 'a', [ 'lib.so' ], str( src ) )
+
+  cache.store( 'c', [ 'lib.so' ], str( src ) )
+  assert     entry_a.check()
+  assert not entry_b.check()
+  assert     tmpdir.join( 'cache', 'c' ).check()
+
+  # The lock file is removed along with the entry
+
+  assert     tmpdir.join( 'cache', '.a.lock' ).check()
+  assert not tmpdir.join( 'cache', '.b.lock' ).check()
+
+#-----------------------------------------------------------------------
+# test_evict_concurrent_removal
+#-----------------------------------------------------------------------
+# Entries removed by another process while evict() scans them are
+# skipped instead of failing the store.
+def test_evict_concurrent_removal( tmpdir, monkeypatch ):
+  cache = BuildCache( str( tmpdir.join( 'cache' ) ), max_size=250 )
+  src   = tmpdir.mkdir( 'src' )
+  src.join( 'lib.so' ).write( 'x' * 100 )
+
+  cache.store( 'a', [ 'lib.so' ], str( src ) )
+  cache.store( 'b', [ 'lib.so' ], str( src ) )
+  cache.max_size = 150
+
+  getsize = os.path.getsize
+  def racy_getsize( path ):
+    if os.path.basename( os.path.dirname( path ) ) == 'a':
+      raise OSError( 2, 'No such file or directory', path )
+    return getsize( path )
+  monkeypatch.setattr( os.path, 'getsize', racy_getsize )
+
+  cache.store( 'c', [ 'lib.so' ], str( src ) )
+  assert     tmpdir.join( 'cache', 'a' ).check()
+  assert not tmpdir.join( 'cache', 'b' ).check()
+  assert     tmpdir.join( 'cache', 'c' ).check()
+
+#-----------------------------------------------------------------------
+# test_lock_after_evict
+#-----------------------------------------------------------------------
+# A process waiting on the lock of an entry which is being evicted must
+# not end up holding a lock on the removed lock file.
+def test_lock_after_evict( tmpdir ):
+  cache = BuildCache( str( tmpdir.join( 'cache' ) ), max_size=0 )
+  src   = tmpdir.mkdir( 'src' )
+  src.join( 'lib.so' ).write( 'lib' )
+  cache.store( 'a', [ 'lib.so' ], str( src ) )
+
+  lock_file = tmpdir.join( 'cache', '.a.lock' )
+  stale     = open( str( lock_file ), 'a' )
+  cache.evict()
+  assert not lock_file.check()
+
+  with cache.lock( 'a' ):
+    assert lock_file.check()
+    assert os.fstat( stale.fileno() ).st_ino != lock_file.stat().ino
+  stale.close()
+
+#-----------------------------------------------------------------------
+# test_lock
+#-----------------------------------------------------------------------
+def test_lock( tmpdir ):
+  cache  = BuildCache( str( tmpdir.join( 'cache' ) ) )
+  src    = tmpdir.mkdir( 'src' )
+  builds = []
+
+  def build( i ):
+    dest = tmpdir.mkdir( 'dest{}'.format( i ) )
+    with cache.lock( 'key' ):
+      if not cache.fetch( 'key', [ 'lib.so' ], str( dest ) ):
+        builds.append( i )
+        src.join( 'lib.so' ).write( 'lib' )
+        cache.store( 'key', [ 'lib.so' ], str( src ) )
+        cache.fetch( 'key', [ 'lib.so' ], str( dest ) )
+    assert dest.join( 'lib.so' ).read() == 'lib'
+
+  threads = [ threading.Thread( target=build, args=(i,) ) for i in range( 4 ) ]
+  for t in threads: t.start()
+  for t in threads: t.join()
+  assert len( builds ) == 1
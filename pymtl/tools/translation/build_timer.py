@@ -0,0 +1,138 @@
+#=======================================================================
+# build_timer.py
+#=======================================================================
+# Collects a timing breakdown of building a Python-wrapped model.
+#
+# Usage:
+#
+#   model = TranslationTool( model, timing=True )
+#   model.build_timing['phases']['verilator']
+#
+# The report records the wall time of each build phase (translation,
+# verilator, g++, import), the translation time of each module, whether
+# each cached step was a hit or a miss, and the size of each generated
+# artifact. Phases which run more than once are accumulated. Setting the
+# PYMTL_BUILD_TIMING environment variable enables the report for every
+# build without changing any code.
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import contextlib
+import collections
+
+#-----------------------------------------------------------------------
+# timing_enabled
+#-----------------------------------------------------------------------
+# Return True if build timing was requested either explicitly or through
+# the PYMTL_BUILD_TIMING environment variable.
+
+def timing_enabled( timing=False ):
+  return bool( timing or os.environ.get( 'PYMTL_BUILD_TIMING' ) )
+
+#-----------------------------------------------------------------------
+# BuildTimer
+#-----------------------------------------------------------------------
+
+class BuildTimer( object ):
+
+  def __init__( s, name='' ):
+    s.name      = name
+    s.phases    = collections.OrderedDict()
+    s.modules   = collections.OrderedDict()
+    s.cache     = collections.OrderedDict()
+    s.artifacts = collections.OrderedDict()
+
+  #---------------------------------------------------------------------
+  # phase
+  #---------------------------------------------------------------------
+  # Context manager adding the wall time of its body to the given phase.
+
+  @contextlib.contextmanager
+  def phase( s, name ):
+    start = time.time()
+    try:
+      yield
+    finally:
+      s.phases[ name ] = s.phases.get( name, 0.0 ) + time.time() - start
+
+  #---------------------------------------------------------------------
+  # add_module
+  #---------------------------------------------------------------------
+
+  def add_module( s, name, seconds, cached=False ):
+    s.modules[ name ] = { 'seconds' : seconds, 'cached' : cached }
+
+  #---------------------------------------------------------------------
+  # add_cache
+  #---------------------------------------------------------------------
+
+  def add_cache( s, name, hit ):
+    s.cache[ name ] = 'hit' if hit else 'miss'
+
+  #---------------------------------------------------------------------
+  # add_artifacts
+  #---------------------------------------------------------------------
+  # Record the size in bytes of each file, or the total size of all files
+  # in each directory. Missing artifacts are skipped.
+
+  def add_artifacts( s, *paths ):
+    for path in paths:
+      if os.path.isdir( path ):
+        s.artifacts[ path ] = sum(
+          os.path.getsize( os.path.join( root, f ) )
+          for root, dirs, files in os.walk( path ) for f in files
+        )
+      elif os.path.exists( path ):
+        s.artifacts[ path ] = os.path.getsize( path )
+
+  #---------------------------------------------------------------------
+  # as_dict
+  #---------------------------------------------------------------------
+
+  def as_dict( s ):
+    return {
+      'name'      : s.name,
+      'total'     : sum( s.phases.values() ),
+      'phases'    : dict( s.phases    ),
+      'modules'   : dict( s.modules   ),
+      'cache'     : dict( s.cache     ),
+      'artifacts' : dict( s.artifacts ),
+    }
+
+  #---------------------------------------------------------------------
+  # print_report
+  #---------------------------------------------------------------------
+
+  def print_report( s, o=None ):
+    o     = o or sys.stdout
+    total = sum( s.phases.values() )
+    pct   = lambda x: 100.0 * x / total if total else 0.0
+
+    print( "-"*72, file=o )
+    print( "Build Timing: {} ({:.3f}s)".format( s.name, total ), file=o )
+    print( "-"*72, file=o )
+    for name, seconds in s.phases.items():
+      print( "  {:<24} {:9.3f}s  {:6.2f}%".format(
+               name, seconds, pct( seconds ) ), file=o )
+
+    if s.modules:
+      print( "  modules:", file=o )
+      for name, x in sorted( s.modules.items(),
+                             key=lambda x: -x[1]['seconds'] ):
+        print( "    {:9.3f}s  {:<6} {}".format(
+                 x['seconds'], 'cached' if x['cached'] else '', name ),
+               file=o )
+
+    if s.cache:
+      print( "  cache:", file=o )
+      for name, status in s.cache.items():
+        print( "    {:<6} {}".format( status, name ), file=o )
+
+    if s.artifacts:
+      print( "  artifacts:", file=o )
+      for path, size in s.artifacts.items():
+        print( "    {:>12,} bytes  {}".format( size, path ), file=o )
+    print( "-"*72, file=o )
@@ -0,0 +1,79 @@
+#=======================================================================
+# build_timer_test.py
+#=======================================================================
+
+import StringIO
+
+from pymtl       import *
+from build_timer import BuildTimer, timing_enabled
+
+import verilog
+
+#-----------------------------------------------------------------------
+# test_build_timer
+#-----------------------------------------------------------------------
+def test_build_timer( tmpdir ):
+  timer = BuildTimer( 'Foo' )
+
+  for i in range( 2 ):
+    with timer.phase( 'g++' ):
+      pass
+  with timer.phase( 'import' ):
+    pass
+
+  lib = tmpdir.join( 'libFoo_v.so' )
+  lib.write( 'x' * 10 )
+  obj_dir = tmpdir.mkdir( 'obj_dir_Foo' )
+  obj_dir.join( 'a.o' ).write( 'x' * 3 )
+  obj_dir.join( 'b.o' ).write( 'x' * 4 )
+  timer.add_artifacts( str( lib ), str( obj_dir ), str( tmpdir.join( 'missing' ) ) )
+  timer.add_cache( 'library', False )
+
+  data = timer.as_dict()
+  assert list( timer.phases ) == [ 'g++', 'import' ]
+  assert data['total'] == sum( data['phases'].values() )
+  assert data['cache'] == { 'library' : 'miss' }
+  assert data['artifacts'] == { str( lib ) : 10, str( obj_dir ) : 7 }
+
+  o = StringIO.StringIO()
+  timer.print_report( o )
+  assert 'Build Timing: Foo' in o.getvalue()
+
+#-----------------------------------------------------------------------
+# test_timing_enabled
+#-----------------------------------------------------------------------
+def test_timing_enabled( monkeypatch ):
+  monkeypatch.delenv( 'PYMTL_BUILD_TIMING', raising=False )
+  assert not timing_enabled()
+  assert     timing_enabled( True )
+
+  monkeypatch.setenv( 'PYMTL_BUILD_TIMING', '1' )
+  assert     timing_enabled()
+
+#-----------------------------------------------------------------------
+# test_translate_modules
+#-----------------------------------------------------------------------
+class Inner( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 4 )
+    s.out = OutPort( 4 )
+    s.connect( s.in_, s.out )
+
+class Outer( Model ):
+  def __init__( s ):
+    s.in_   = InPort ( 4 )
+    s.out   = OutPort( 4 )
+    s.inner = Inner()
+    s.connect( s.in_, s.inner.in_ )
+    s.connect( s.out, s.inner.out )
+
+def test_translate_modules( monkeypatch ):
+  monkeypatch.setenv( 'PYMTL_CACHE_DIR', '' )
+
+  model = Outer()
+  model.elaborate()
+  timer = BuildTimer()
+  verilog.translate( model, StringIO.StringIO(), timer=timer )
+
+  assert set( timer.modules ) == { model.class_name, model.inner.class_name }
+  assert not any( x['cached'] for x in timer.modules.values() )
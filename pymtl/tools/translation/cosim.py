@@ -0,0 +1,204 @@
+#=======================================================================
+# cosim.py
+#=======================================================================
+# Lockstep differential co-simulation of a PyMTL model against its
+# translated version.
+#
+# Usage:
+#
+#   cosim = CoSimulationTool( MyModel() )
+#   cosim.reset()
+#   cosim.model.in_.value = 3    # inputs are set on the Python model
+#   cosim.cycle()                # raises CoSimulationError on mismatch
+#   ...
+#   cosim.run( 100000 )          # random inputs
+#
+# Both models are simulated side by side. Before every evaluation the
+# inputs of the Python model are copied to the translated model, and
+# afterwards the outputs of both models are compared as tuples of plain
+# integers, which is a single C-level comparison when they match. Only
+# the raw port values of the last few cycles are kept, and they are only
+# formatted into a trace window (together with the line traces of both
+# models) when the models diverge.
+
+from __future__ import print_function
+
+import random
+import operator
+import collections
+
+from ..simulation.SimulationTool import SimulationTool
+from exceptions                  import CoSimulationError
+from verilator_sim               import TranslationTool
+
+#-----------------------------------------------------------------------
+# CoSimulationTool
+#-----------------------------------------------------------------------
+
+class CoSimulationTool( object ):
+
+  def __init__( s, model, dut=None, window=8, **kwargs ):
+    """Co-simulate model against dut.
+
+    model:   an un-elaborated Model instance
+    dut:     an un-elaborated model to compare against, by default the
+             model translated with TranslationTool( model, **kwargs )
+    window:  number of cycles shown in the trace on a mismatch
+    """
+
+    # TranslationTool elaborates the model itself
+
+    if dut is None:
+      dut = TranslationTool( model, **kwargs )
+    else:
+      model.elaborate()
+    dut.elaborate()
+
+    s.model     = model
+    s.dut       = dut
+    s.model_sim = SimulationTool( model )
+    s.dut_sim   = SimulationTool( dut   )
+    s.ncycles   = 0
+
+    # Pair up the ports of both models by name
+
+    model_ports = { x.name : x for x in model.get_ports() }
+    dut_ports   = { x.name : x for x in dut  .get_ports() }
+
+    if set( model_ports ) != set( dut_ports ):
+      raise CoSimulationError( "Models have different ports: {}".format(
+        sorted( set( model_ports ) ^ set( dut_ports ) ) ) )
+
+    in_names  = sorted( x.name for x in model.get_inports()
+                        if x.name != 'clk' )
+    out_names = sorted( x.name for x in model.get_outports() )
+
+    s._in_names   = in_names
+    s._out_names  = out_names
+    s._model_ins  = [ model_ports[ x ]._signalvalue for x in in_names  ]
+    s._dut_ins    = [ dut_ports  [ x ]._signalvalue for x in in_names  ]
+    s._model_outs = [ model_ports[ x ]._signalvalue for x in out_names ]
+    s._dut_outs   = [ dut_ports  [ x ]._signalvalue for x in out_names ]
+
+    s._get_uint   = operator.attrgetter( '_uint' )
+    s._last_ins   = None
+    s._history    = collections.deque( maxlen=window )
+
+  #---------------------------------------------------------------------
+  # reset
+  #---------------------------------------------------------------------
+
+  def reset( s ):
+    s.model.reset.value = 1
+    s.cycle()
+    s.cycle()
+    s.model.reset.value = 0
+
+  #---------------------------------------------------------------------
+  # eval_combinational
+  #---------------------------------------------------------------------
+
+  def eval_combinational( s ):
+    ins = s._copy_inputs()
+    s.model_sim.eval_combinational()
+    s.dut_sim  .eval_combinational()
+    s._compare( ins, 'eval_combinational' )
+
+  #---------------------------------------------------------------------
+  # cycle
+  #---------------------------------------------------------------------
+
+  def cycle( s ):
+    ins = s._copy_inputs()
+    s.model_sim.cycle()
+    s.dut_sim  .cycle()
+    s.ncycles += 1
+    s._compare( ins, 'cycle' )
+
+  #---------------------------------------------------------------------
+  # run
+  #---------------------------------------------------------------------
+  # Simulate ncycles cycles after reset. Before each cycle stimulus is
+  # called with the cycle number and the Python model to set its inputs.
+  # By default all inputs except reset are randomized.
+
+  def run( s, ncycles, stimulus=None, seed=None ):
+
+    if stimulus is None:
+      rng    = random.Random( seed )
+      inputs = [ ( x._signalvalue, x.nbits ) for x in s.model.get_inports()
+                 if x.name not in ( 'clk', 'reset' ) ]
+      def stimulus( cycle, model ):
+        for port, nbits in inputs:
+          port.value = rng.getrandbits( nbits )
+
+    s.reset()
+    for i in xrange( ncycles ):
+      stimulus( i, s.model )
+      s.cycle()
+
+  #---------------------------------------------------------------------
+  # _copy_inputs
+  #---------------------------------------------------------------------
+  # Copy all inputs which changed since the last evaluation from the
+  # Python model to the translated model, and return their values.
+
+  def _copy_inputs( s ):
+    ins = tuple( map( s._get_uint, s._model_ins ) )
+    if ins != s._last_ins:
+      last = s._last_ins or [ None ] * len( ins )
+      for port, value, prev in zip( s._dut_ins, ins, last ):
+        if value != prev:
+          port.value = value
+      s._last_ins = ins
+    return ins
+
+  #---------------------------------------------------------------------
+  # _compare
+  #---------------------------------------------------------------------
+
+  def _compare( s, ins, step ):
+    model_outs = tuple( map( s._get_uint, s._model_outs ) )
+    dut_outs   = tuple( map( s._get_uint, s._dut_outs   ) )
+    s._history.append( ( s.ncycles, step, ins, model_outs, dut_outs ) )
+    if model_outs != dut_outs:
+      raise CoSimulationError( s._trace_window(), cycle=s.ncycles,
+        ports=[ name for name, x, y in zip( s._out_names, model_outs,
+                                            dut_outs ) if x != y ] )
+
+  #---------------------------------------------------------------------
+  # _trace_window
+  #---------------------------------------------------------------------
+  # Format the recorded history leading up to the first divergence.
+
+  def _trace_window( s ):
+
+    def fmt( names, values, others=None ):
+      others = others or values
+      return ' '.join(
+        '{}{}={}'.format( '*' if x != y else '', name, x )
+        for name, x, y in zip( names, values, others )
+      )
+
+    ncycles, step, ins, model_outs, dut_outs = s._history[-1]
+    lines = [
+      "Models diverged at cycle {} ({})".format( ncycles, step ),
+      "",
+    ]
+
+    for ncycles, step, ins, model_outs, dut_outs in s._history:
+      lines += [
+        "  {:>6} {:<18} in:    {}".format( ncycles, step,
+                                           fmt( s._in_names, ins ) ),
+        "  {:>6} {:<18} model: {}".format( '', '',
+                                           fmt( s._out_names, model_outs, dut_outs ) ),
+        "  {:>6} {:<18} dut:   {}".format( '', '',
+                                           fmt( s._out_names, dut_outs, model_outs ) ),
+      ]
+
+    lines += [
+      "",
+      "model line trace: {}".format( s.model.line_trace() ),
+      "dut line trace:   {}".format( s.dut  .line_trace() ),
+    ]
+    return '\n'.join( lines )
@@ -0,0 +1,122 @@
+#=======================================================================
+# cosim_test.py
+#=======================================================================
+
+import pytest
+
+from pymtl      import *
+from cosim      import CoSimulationTool
+from exceptions import CoSimulationError
+
+#-----------------------------------------------------------------------
+# Models
+#-----------------------------------------------------------------------
+
+class Accumulator( Model ):
+  def __init__( s, nbits=8 ):
+    s.in_ = InPort ( nbits )
+    s.out = OutPort( nbits )
+    s.sum = OutPort( nbits )
+
+    @s.combinational
+    def comb_logic():
+      s.sum.value = s.out + s.in_
+
+    @s.posedge_clk
+    def seq_logic():
+      if s.reset:
+        s.out.next = 0
+      else:
+        s.out.next = s.sum
+
+  def line_trace( s ):
+    return '{} ({})'.format( s.in_, s.out )
+
+# Ignores inputs of 0xff
+
+class BuggyAccumulator( Accumulator ):
+  def __init__( s, nbits=8 ):
+    s.in_ = InPort ( nbits )
+    s.out = OutPort( nbits )
+    s.sum = OutPort( nbits )
+
+    @s.combinational
+    def comb_logic():
+      if s.in_ == 0xff:
+        s.sum.value = s.out
+      else:
+        s.sum.value = s.out + s.in_
+
+    @s.posedge_clk
+    def seq_logic():
+      if s.reset:
+        s.out.next = 0
+      else:
+        s.out.next = s.sum
+
+#-----------------------------------------------------------------------
+# test_cosim_match
+#-----------------------------------------------------------------------
+def test_cosim_match():
+  cosim = CoSimulationTool( Accumulator(), dut=Accumulator() )
+  cosim.run( 200, seed=0 )
+  assert cosim.ncycles == 202
+
+#-----------------------------------------------------------------------
+# test_cosim_mismatch
+#-----------------------------------------------------------------------
+def test_cosim_mismatch():
+  cosim = CoSimulationTool( Accumulator(), dut=BuggyAccumulator(), window=4 )
+  cosim.reset()
+
+  for value in [ 1, 2, 3 ]:
+    cosim.model.in_.value = value
+    cosim.eval_combinational()
+    cosim.cycle()
+
+  cosim.model.in_.value = 0xff
+  with pytest.raises( CoSimulationError ) as e:
+    cosim.eval_combinational()
+
+  assert e.value.cycle == 5
+  assert e.value.ports == [ 'sum' ]
+
+  trace = str( e.value ).splitlines()
+  assert trace[0] == 'Models diverged at cycle 5 (eval_combinational)'
+  assert len( [ x for x in trace if ' in: ' in x ] ) == 4
+  assert any( '*sum=5' in x and 'model:' in x for x in trace )
+  assert 'model line trace: ff (06)' in trace
+
+#-----------------------------------------------------------------------
+# test_cosim_stimulus
+#-----------------------------------------------------------------------
+def test_cosim_stimulus():
+  cosim = CoSimulationTool( Accumulator(), dut=BuggyAccumulator() )
+
+  def stimulus( cycle, model ):
+    model.in_.value = 0xff if cycle == 10 else 1
+
+  with pytest.raises( CoSimulationError ) as e:
+    cosim.run( 20, stimulus )
+  assert e.value.cycle == 13
+
+#-----------------------------------------------------------------------
+# test_cosim_ports
+#-----------------------------------------------------------------------
+class Passthrough( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+    s.connect( s.in_, s.out )
+
+def test_cosim_ports():
+  with pytest.raises( CoSimulationError ):
+    CoSimulationTool( Accumulator(), dut=Passthrough() )
+
+#-----------------------------------------------------------------------
+# test_cosim_translation
+#-----------------------------------------------------------------------
+@requires_verilator
+def test_cosim_translation():
+  cosim = CoSimulationTool( Accumulator( 16 ) )
+  cosim.run( 1000, seed=0 )
@@ -21,3 +21,12 @@ class VerilatorCompileError( Exception ):
 #-----------------------------------------------------------------------
 class IVerilogCompileError( Exception ):
   pass
+
+#-----------------------------------------------------------------------
+# CoSimulationError
+#-----------------------------------------------------------------------
+class CoSimulationError( Exception ):
+  def __init__( self, message, cycle=None, ports=None ):
+    super( CoSimulationError, self ).__init__( message )
+    self.cycle = cycle
+    self.ports = ports or []
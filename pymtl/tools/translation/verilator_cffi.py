@@ -6,24 +6,32 @@ from __future__ import print_function
 
 import os
 import shutil
+import multiprocessing
 
 import verilog_structural
 from ...tools.simulation.vcd import get_vcd_timescale
 
 from subprocess          import check_output, STDOUT, CalledProcessError
+from multiprocessing.pool import ThreadPool
 from ...model.signals    import InPort, OutPort
 from ...model.PortBundle import PortBundle
 from exceptions          import VerilatorCompileError
+from build_cache         import BuildCache, cache_key
+from build_timer         import BuildTimer
 
 #-----------------------------------------------------------------------
 # verilog_to_pymtl
 #-----------------------------------------------------------------------
-# Create a PyMTL compatible interface for Verilog HDL.
+# Create a PyMTL compatible interface for Verilog HDL. If a BuildTimer is
+# given, the time spent in each step is recorded in it.
 
 def verilog_to_pymtl( model, verilog_file, c_wrapper_file,
-                      lib_file, py_wrapper_file, vcd_en, lint, verilator_xinit ):
+                      lib_file, py_wrapper_file, vcd_en, lint, verilator_xinit,
+                      opt_level=None, jobs=None, threads=None,
+                      verilator_flags=None, timer=None ):
 
   model_name = model.class_name
+  timer      = timer or BuildTimer()
 
   try:
     vlinetrace = model.vlinetrace
@@ -31,7 +39,9 @@ def verilog_to_pymtl( model, verilog_file, c_wrapper_file,
     vlinetrace = False
 
   # Verilate the model  # TODO: clean this up
-  verilate_model( verilog_file, model_name, vcd_en, lint )
+  with timer.phase( 'verilator' ):
+    verilate_model( verilog_file, model_name, vcd_en, lint,
+                    threads, verilator_flags )
 
   # Add names to ports of module
   for port in model.get_ports():
@@ -39,23 +49,69 @@ def verilog_to_pymtl( model, verilog_file, c_wrapper_file,
     port.verilator_name = verilator_mangle( port.verilog_name )
 
   # Create C++ Wrapper
-  cdefs = create_c_wrapper( model, c_wrapper_file, vcd_en, vlinetrace, verilator_xinit )
+  with timer.phase( 'c wrapper' ):
+    cdefs = create_c_wrapper( model, c_wrapper_file, vcd_en, vlinetrace, verilator_xinit )
 
   # Create Shared C Library
-  create_shared_lib( model_name, c_wrapper_file, lib_file,
-                     vcd_en, vlinetrace )
+  with timer.phase( 'g++' ):
+    create_shared_lib( model_name, c_wrapper_file, lib_file,
+                       vcd_en, vlinetrace, opt_level, jobs, threads )
 
   # Create PyMTL wrapper for CFFI interface to Verilated model
-  create_verilator_py_wrapper( model, py_wrapper_file, lib_file,
-                               cdefs, vlinetrace )
+  with timer.phase( 'py wrapper' ):
+    create_verilator_py_wrapper( model, py_wrapper_file, lib_file,
+                                 cdefs, vlinetrace )
+
+#-----------------------------------------------------------------------
+# get_verilator_version
+#-----------------------------------------------------------------------
+# Return the version string of the installed verilator, used to key
+# cached builds.
+
+_verilator_version = None
+
+def get_verilator_version():
+
+  global _verilator_version
+
+  if _verilator_version is None:
+    try:
+      cmd = [ 'verilator', '--version' ]
+      _verilator_version = check_output( cmd, stderr=STDOUT ).strip()
+    except ( OSError, CalledProcessError ):
+      _verilator_version = 'unknown'
+
+  return _verilator_version
+
+#-----------------------------------------------------------------------
+# get_wrapper_templates
+#-----------------------------------------------------------------------
+# Return the contents of the C and Python wrapper templates, used to key
+# cached builds.
+
+def get_wrapper_templates():
+
+  template_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  templates    = []
+  for filename in [ 'verilator_wrapper.templ.c', 'verilator_wrapper.templ.py' ]:
+    with open( os.path.join( template_dir, filename ) ) as fd:
+      templates.append( fd.read() )
+
+  return templates
 
 #-----------------------------------------------------------------------
 # verilate_model
 #-----------------------------------------------------------------------
 # Convert Verilog HDL into a C++ simulator using Verilator.
 # http://www.veripool.org/wiki/verilator
+#
+# If threads is given the model is partitioned into that many threads
+# with --threads. Any extra verilator_flags (e.g., --x-assign fast or
+# --noassert) are appended after the default flags so they take
+# precedence.
 
-def verilate_model( filename, model_name, vcd_en, lint ):
+def verilate_model( filename, model_name, vcd_en, lint,
+                    threads=None, verilator_flags=None ):
 
   # verilator commandline template
 
@@ -73,7 +129,13 @@ def verilate_model( filename, model_name, vcd_en, lint ):
               '--unroll-stmts 1000000',
               '--assert',
               '--trace' if vcd_en else '',
-            ])
+              '--threads {}'.format( threads ) if threads else '',
+            ] + list( verilator_flags or [] ) )
+
+  if threads is not None and threads < 1:
+    raise VerilatorCompileError(
+      "Invalid number of threads {}, expected at least 1!".format( threads )
+    )
 
   # remove the obj_dir because issues with staleness
 
@@ -167,10 +229,48 @@ def create_c_wrapper( model, c_wrapper_file, vcd_en, vlinetrace, verilator_xinit
   indent_four = '\n    '
   indent_six  = '\n      '
 
+  # Utility function for unpacking an input port from the input buffer
+  def port_to_unpack( port, offset, nwords ):
+    name = port.verilator_name
+    if   port.nbits <= 32:
+      return [ '*m->{} = in[{}];'.format( name, offset ) ]
+    elif port.nbits <= 64:
+      return [ '*m->{} = ( (uint64_t) in[{}] << 32 ) | in[{}];'
+               .format( name, offset+1, offset ) ]
+    else:
+      return [ 'm->{}[{}] = in[{}];'.format( name, i, offset+i )
+               for i in range( nwords ) ]
+
+  # Utility function for packing an output port into the output buffer
+  def port_to_pack( port, offset, nwords, index ):
+    name = port.verilator_name
+    if   port.nbits <= 32:
+      words = [ '*m->{}'.format( name ) ]
+    elif port.nbits <= 64:
+      words = [ '(uint32_t) *m->{}'.format( name ),
+                '(uint32_t) ( *m->{} >> 32 )'.format( name ) ]
+    else:
+      words = [ 'm->{}[{}]'.format( name, i ) for i in range( nwords ) ]
+    syncs = [ 'sync_word( &out[{}], {} )'.format( offset+i, x )
+              for i, x in enumerate( words ) ]
+    return [ 'if ( {} | force )'.format( ' | '.join( syncs ) ),
+             '  changed[n++] = {};'.format( index ) ]
+
   port_externs = indent_two .join( [ port_to_decl( x ) for x in ports ] )
   port_decls   = indent_zero.join( [ port_to_decl( x ) for x in ports ] )
   port_inits   = indent_two .join( [ port_to_init( x ) for x in ports ] )
 
+  in_ports  = get_port_words( get_io_inports( model ) )
+  out_ports = get_port_words( model.get_outports() )
+
+  unpack_inputs = []
+  for port, offset, nwords in in_ports:
+    unpack_inputs.extend( port_to_unpack( port, offset, nwords ) )
+
+  pack_outputs  = []
+  for i, ( port, offset, nwords ) in enumerate( out_ports ):
+    pack_outputs.extend( port_to_pack( port, offset, nwords, i ) )
+
   # Convert verilator_xinit to number
   if   ( verilator_xinit == "zeros" ) : verilator_xinit_num = 0
   elif ( verilator_xinit == "ones"  ) : verilator_xinit_num = 1
@@ -191,6 +291,10 @@ def create_c_wrapper( model, c_wrapper_file, vcd_en, vlinetrace, verilator_xinit
                           vcd_timescale = get_vcd_timescale( model ),
                           dump_vcd      = '1' if vcd_en else '0',
                           vlinetrace    = '1' if vlinetrace else '0',
+                          unpack_inputs = indent_two.join( unpack_inputs ),
+                          pack_outputs  = indent_two.join( pack_outputs ),
+                          n_in_words    = sum( x[2] for x in in_ports  ),
+                          n_out_words   = sum( x[2] for x in out_ports ),
 
                           verilator_xinit_num = verilator_xinit_num,
                         )
@@ -244,9 +348,11 @@ def create_c_wrapper( model, c_wrapper_file, vcd_en, vlinetrace, verilator_xinit
 #
 # http://www.veripool.org/projects/verilator/wiki/Manual-verilator
 
-# I have added a new feature which compiles all of the standard Verilator
-# code into a static library and then simply links this in. This reduces
-# compile times.
+# The standard Verilator runtime (verilated.cpp, verilated_dpi.cpp and
+# verilated_vcd_c.cpp) is compiled once per Verilator version and flag set
+# and kept in the global build cache. The cached objects are then linked
+# into every model library. This removes a large fixed cost from every
+# cold build.
 
 def try_cmd( name, cmd ):
 
@@ -287,31 +393,81 @@ def compile( flags, include_dirs, output_file, input_files ):
 
   try_cmd( "Compilation", compile_cmd )
 
-def make_lib( output_file, input_files ):
-
-  # First run ar command
+def compile_objects( flags, include_dirs, obj_dir, input_files, jobs=None,
+                     cache=None ):
+
+  # Each source file is compiled into an object file with the same base
+  # name in obj_dir. The compiler does the heavy lifting in a separate
+  # process, so a thread pool is enough to keep all the cores busy.
+
+  objs = [ os.path.join( obj_dir, os.path.splitext( os.path.basename( f ) )[0]+'.o' )
+           for f in input_files ]
+
+  def compile_object( src_obj ):
+    src, obj = src_obj
+    compile( flags + ' -c', include_dirs, obj, [ src ] )
+
+  # If given a build cache, objects are keyed on the source, the flags
+  # and the Verilator version and are only compiled on a cache miss
+
+  def fetch_or_compile_object( src_obj ):
+    src, obj = src_obj
+    obj_name = os.path.basename( obj )
+    with open( src ) as fd:
+      key = cache_key( obj_name, fd.read(), flags, include_dirs,
+                       get_verilator_version() )
+    with cache.lock( key ):
+      if not cache.fetch( key, [ obj_name ], obj_dir ):
+        compile_object( src_obj )
+        cache.store( key, [ obj_name ], obj_dir )
+
+  if cache is not None and cache.enabled:
+    func = fetch_or_compile_object
+  else:
+    func = compile_object
+
+  jobs = min( jobs or multiprocessing.cpu_count(), len( input_files ) )
+
+  if jobs <= 1:
+    map( func, zip( input_files, objs ) )
+  else:
+    pool = ThreadPool( jobs )
+    try:
+      pool.map( func, zip( input_files, objs ) )
+    finally:
+      pool.close()
+      pool.join()
 
-  ar_cmd = 'ar rcv {ofile} {ifiles}'
+  return objs
 
-  ar_cmd = ar_cmd.format(
-    ofile  = output_file,
-    ifiles = ' '.join( input_files ),
-  )
+#-----------------------------------------------------------------------
+# get_opt_flag
+#-----------------------------------------------------------------------
+# Return the g++ optimization flag used to compile Verilated models. Use
+# -O0 for quick debug builds and -O2 or -O3 for long simulations. If
+# opt_level is not given we use the PYMTL_VERILATOR_OPT_LEVEL environment
+# variable, falling back on -O0.
 
-  try_cmd( "Make library", ar_cmd )
+def get_opt_flag( opt_level=None ):
 
-  # Then run ranlib command
+  if opt_level is None:
+    opt_level = os.environ.get( 'PYMTL_VERILATOR_OPT_LEVEL', '0' )
 
-  ranlib_cmd = 'ranlib {lib}'
+  opt_level = str( opt_level )
+  if opt_level.startswith( '-O' ):
+    opt_level = opt_level[2:]
 
-  ranlib_cmd = ranlib_cmd.format(
-    lib = output_file,
-  )
+  if opt_level not in [ '0', '1', '2', '3', 's' ]:
+    raise VerilatorCompileError(
+      "Invalid optimization level '{}', expected 0, 1, 2, 3 or s!"
+      .format( opt_level )
+    )
 
-  try_cmd( "Make library", ranlib_cmd )
+  return '-O' + opt_level
 
 def create_shared_lib( model_name, c_wrapper_file, lib_file,
-                       vcd_en, vlinetrace ):
+                       vcd_en, vlinetrace, opt_level=None, jobs=None,
+                       threads=None ):
 
   # We need to find out where the verilator include directories are
   # globally installed. We first check the PYMTL_VERILATOR_INCLUDE_DIR
@@ -378,43 +534,33 @@ Error:
     verilator_include_dir+"/vltstd",
   ]
 
-  # Compile standard Verilator code if libverilator.a does not exist.
-  # Originally, I was also including verilated_dpi.cpp in this library,
-  # but for some reason that screws up line tracing. Somehow there is
-  # some kind of global state or something that is shared across the
-  # shared libraries or something. I was able to fix it by recompiling
-  # verilated_dpi if linetracing is enabled. Actually, the line tracing
-  # doesn't work -- if you use this line tracing approach, so we are back
-  # to always recomping everyting every time for now.
-
-  # if not os.path.exists( "libverilator.a" ):
-  #
-  #   compile(
-  #     flags        = "-O3 -c",
-  #     include_dirs = include_dirs,
-  #     output_file  = "verilator.o",
-  #     input_files  = [ verilator_include_dir+"/verilated.cpp" ]
-  #   )
-  #
-  #   compile(
-  #     flags        = "-O3 -c",
-  #     include_dirs = include_dirs,
-  #     output_file  = "verilator_vcd_c.o",
-  #     input_files  = [ verilator_include_dir+"/verilated_vcd_c.cpp" ]
-  #   )
-  #
-  #   # compile(
-  #   #   flags        = "-O3 -c",
-  #   #   include_dirs = include_dirs,
-  #   #   output_file  = "verilator_dpi.o",
-  #   #   input_files  = [ verilator_include_dir+"/verilated_dpi.cpp" ]
-  #   # )
-  #
-  #   make_lib(
-  #     output_file  = "libverilator.a",
-  #     # input_files  = [ "verilator.o", "verilator_vcd_c.o", "verilator_dpi.o" ]
-  #     input_files  = [ "verilator.o", "verilator_vcd_c.o" ]
-  #    )
+  # Originally the standard Verilator code was compiled into a shared
+  # libverilator.a, but line tracing broke because Verilator keeps global
+  # state (e.g., the DPI scope table) which ended up shared across the
+  # model libraries. We now compile the runtime objects with hidden
+  # visibility, so each model library gets its own private copy of the
+  # runtime and its global state while the objects themselves are still
+  # compiled only once and reused from the build cache.
+
+  runtime_sources = [
+    verilator_include_dir+"/verilated.cpp",
+    verilator_include_dir+"/verilated_dpi.cpp",
+  ]
+
+  if vcd_en:
+    runtime_sources += [
+      verilator_include_dir+"/verilated_vcd_c.cpp",
+    ]
+
+  # Models verilated with --threads need the threading runtime, and
+  # everything including the link must agree on VL_THREADED and pthreads
+
+  thread_flags = ""
+  if threads:
+    thread_flags     = " -DVL_THREADED -pthread"
+    runtime_sources += [
+      verilator_include_dir+"/verilated_threads.cpp",
+    ]
 
   obj_dir_prefix = "obj_dir_{m}/V{m}".format( m=model_name )
 
@@ -440,24 +586,41 @@ Error:
 
   cpp_sources_list += [
     obj_dir_prefix+"__Syms.cpp",
-    verilator_include_dir+"/verilated.cpp",
-    verilator_include_dir+"/verilated_dpi.cpp",
     c_wrapper_file,
   ]
 
   if vcd_en:
     cpp_sources_list += [
-      verilator_include_dir+"/verilated_vcd_c.cpp",
       obj_dir_prefix+"__Trace.cpp",
       obj_dir_prefix+"__Trace__Slow.cpp",
     ]
 
-  compile(
-    # flags        = "-O1 -fstrict-aliasing -fPIC -shared -L. -lverilator",
-    flags        = "-O0 -fPIC -shared",
+  # Compile every source file in parallel and then link the objects
+
+  opt_flag = get_opt_flag( opt_level )
+
+  objs = compile_objects(
+    flags        = opt_flag + " -fPIC -fvisibility=hidden" + thread_flags,
     include_dirs = include_dirs,
-    output_file  = lib_file,
+    obj_dir      = "obj_dir_" + model_name,
+    input_files  = runtime_sources,
+    jobs         = jobs,
+    cache        = BuildCache(),
+  )
+
+  objs += compile_objects(
+    flags        = opt_flag + " -fPIC" + thread_flags,
+    include_dirs = include_dirs,
+    obj_dir      = "obj_dir_" + model_name,
     input_files  = cpp_sources_list,
+    jobs         = jobs,
+  )
+
+  compile(
+    flags        = "-shared" + thread_flags,
+    include_dirs = [],
+    output_file  = lib_file,
+    input_files  = objs,
   )
 
 #-----------------------------------------------------------------------
@@ -471,7 +634,7 @@ def create_verilator_py_wrapper( model, wrapper_filename, lib_file,
   template_filename = template_dir + os.path.sep + 'verilator_wrapper.templ.py'
 
   port_defs  = []
-  set_inputs = []
+  in_words   = []
   set_comb   = []
   set_next   = []
 
@@ -479,15 +642,26 @@ def create_verilator_py_wrapper( model, wrapper_filename, lib_file,
   for x in model.get_ports( preserve_hierarchy=True ):
     recurse_port_hierarchy( x, port_defs )
 
-  for port in model.get_inports():
-    if port.name == 'clk': continue
-    input_ = set_input_stmt( port )
-    set_inputs.extend( input_ )
+  in_ports  = get_port_words( get_io_inports( model ) )
+  out_ports = get_port_words( model.get_outports() )
+
+  for port, offset, nwords in in_ports:
+    in_words.extend( set_input_stmt( port, nwords ) )
+
+  for i, ( port, offset, nwords ) in enumerate( out_ports ):
+    comb, next_ = set_output_stmt( port, offset, nwords, i )
+    set_comb.append( comb  )
+    set_next.append( next_ )
 
-  for port in model.get_outports():
-    comb, next_ = set_output_stmt( port )
-    set_comb.extend( comb  )
-    set_next.extend( next_ )
+  # Pack all inputs into the input buffer with a single slice assignment
+
+  set_inputs = ''
+  if in_words:
+    set_inputs = 'in_buf[0:{}] = [ {} ]'.format( len( in_words ),
+                                                 ', '.join( in_words ) )
+
+  n_in_words  = sum( nwords for _, _, nwords in in_ports  )
+  n_out_words = sum( nwords for _, _, nwords in out_ports )
 
   # pretty printing
   indent_four = '\n    '
@@ -503,9 +677,16 @@ def create_verilator_py_wrapper( model, wrapper_filename, lib_file,
         port_decls  = cdefs,
         lib_file    = lib_file,
         port_defs   = indent_four.join( port_defs ),
-        set_inputs  = indent_six .join( set_inputs ),
-        set_comb    = indent_six .join( set_comb ),
-        set_next    = indent_six .join( set_next ),
+        set_inputs  = set_inputs,
+        set_comb    = indent_four.join( set_comb ),
+        set_next    = indent_four.join( set_next ),
+        comb_funcs  = ', '.join( 'comb_{}'.format( i ) for i in range( len( out_ports ) ) ),
+        next_funcs  = ', '.join( 'next_{}'.format( i ) for i in range( len( out_ports ) ) ),
+        n_in_words  = n_in_words,
+        n_out_words = n_out_words,
+        n_outs      = len( out_ports ),
+        in_layout   = get_layout_dict( in_ports  ),
+        out_layout  = get_layout_dict( out_ports ),
         vlinetrace  = '1' if vlinetrace else '0',
     )
 
@@ -515,47 +696,65 @@ def create_verilator_py_wrapper( model, wrapper_filename, lib_file,
     #print( py_src )
 
 #-----------------------------------------------------------------------
-# get_indices
+# get_io_inports
+#-----------------------------------------------------------------------
+# Input ports exchanged through the packed input buffer. The clock is
+# driven separately by tick_io.
+def get_io_inports( model ):
+  return [ x for x in model.get_inports() if x.name != 'clk' ]
+
+#-----------------------------------------------------------------------
+# get_port_words
+#-----------------------------------------------------------------------
+# Utility function for laying out ports in a packed buffer of 32-bit
+# words. Returns a list of ( port, word offset, number of words ).
+def get_port_words( ports ):
+  layout = []
+  offset = 0
+  for port in ports:
+    nwords = ( port.nbits - 1 ) / 32 + 1
+    layout.append( ( port, offset, nwords ) )
+    offset += nwords
+  return layout
+
+#-----------------------------------------------------------------------
+# get_layout_dict
 #-----------------------------------------------------------------------
-# Utility function for determining assignment of wide ports
-def get_indices( port ):
-  num_assigns = 1 if port.nbits <= 64 else (port.nbits-1)/32 + 1
-  if num_assigns == 1:
-    return [(0, "")]
-  return [ ( i, '[{}:{}]'.format( i*32, min( i*32+32, port.nbits) ) )
-           for i in range(num_assigns) ]
+# Source for a dictionary mapping port names to ( word offset, number of
+# words ) in a packed buffer.
+def get_layout_dict( layout ):
+  return '{{ {} }}'.format( ', '.join(
+    "'{}' : ( {}, {} )".format( port.name, offset, nwords )
+    for port, offset, nwords in layout
+  ))
 
 #-----------------------------------------------------------------------
 # set_input_stmt
 #-----------------------------------------------------------------------
-def set_input_stmt( port ):
-  inputs = []
-  for idx, offset in get_indices( port ):
-    inputs.append( 's._m.{v_name}[{idx}] = s.{py_name}{offset}' \
-                    .format( v_name  = port.verilator_name,
-                             py_name = port.name,
-                             idx     = idx,
-                             offset  = offset )
-                   )
-  return inputs
+# Returns one expression per word of the port in the input buffer.
+def set_input_stmt( port, nwords ):
+  if nwords == 1:
+    return [ 's.{}'.format( port.name ) ]
+  return [ 's.{}[{}:{}]'.format( port.name, i*32, min( i*32+32, port.nbits ) )
+           for i in range( nwords ) ]
 
 #-----------------------------------------------------------------------
 # set_output_stmt
 #-----------------------------------------------------------------------
+# Returns functions writing the port from the output buffer, either
+# combinationally or as the next value of a register.
 # TODO: no way to distinguish between combinational and sequential
 #       outputs, so we set outputs both ways...
 #       This seems broken, but I can't think of a better way.
-def set_output_stmt( port ):
-  comb, next_ = [], []
-  for idx, offset in get_indices( port ):
-    assign = 's.{py_name}{offset}.{sigtype} = s._m.{v_name}[{idx}]' \
-             .format( v_name  = port.verilator_name,
-                      py_name = port.name,
-                      idx     = idx,
-                      offset  = offset,
-                      sigtype = '{sigtype}' )
-    comb .append( assign.format( sigtype = 'value' ) )
-    next_.append( assign.format( sigtype = 'next'  ) )
+def set_output_stmt( port, offset, nwords, index ):
+  value  = ' | '.join( [ 'out[{}]'.format( offset ) ] +
+                       [ 'out[{}] << {}'.format( offset+i, i*32 )
+                         for i in range( 1, nwords ) ] )
+  assign = 'def {func}_{index}(): s.{py_name}.{sigtype} = {value}'
+  comb   = assign.format( func='comb', sigtype='value', index=index,
+                          py_name=port.name, value=value )
+  next_  = assign.format( func='next', sigtype='next',  index=index,
+                          py_name=port.name, value=value )
   return comb, next_
 
 #-----------------------------------------------------------------------
@@ -0,0 +1,309 @@
+#=======================================================================
+# verilator_cffi_test.py
+#=======================================================================
+
+import os
+import imp
+import pytest
+
+from cffi           import FFI
+from pymtl          import *
+from verilator_cffi import compile_objects, compile, get_opt_flag
+from verilator_cffi import get_port_words, set_input_stmt, set_output_stmt
+from exceptions     import VerilatorCompileError
+
+#-----------------------------------------------------------------------
+# test_get_opt_flag
+#-----------------------------------------------------------------------
+def test_get_opt_flag( monkeypatch ):
+  monkeypatch.delenv( 'PYMTL_VERILATOR_OPT_LEVEL', raising=False )
+  assert get_opt_flag()       == '-O0'
+  assert get_opt_flag( 2 )    == '-O2'
+  assert get_opt_flag( '-O3' ) == '-O3'
+
+  monkeypatch.setenv( 'PYMTL_VERILATOR_OPT_LEVEL', 's' )
+  assert get_opt_flag()       == '-Os'
+
+  with pytest.raises( VerilatorCompileError ):
+    get_opt_flag( 5 )
+
+#-----------------------------------------------------------------------
+# test_compile_objects
+#-----------------------------------------------------------------------
+@pytest.mark.parametrize( 'jobs', [ 1, 4 ] )
+def test_compile_objects( tmpdir, jobs ):
+
+  sources = []
+  for i in range( 4 ):
+    src = tmpdir.join( 'f{}.cpp'.format( i ) )
+    src.write( 'extern "C" int f{0}() {{ return {0}; }}\n'.format( i ) )
+    sources.append( str( src ) )
+
+  objs = compile_objects( '-O2 -fPIC', [], str( tmpdir ), sources, jobs )
+  assert objs == [ str( tmpdir.join( 'f{}.o'.format( i ) ) ) for i in range( 4 ) ]
+  for obj in objs:
+    assert os.path.exists( obj )
+
+  lib_file = str( tmpdir.join( 'libf.so' ) )
+  compile( '-shared', [], lib_file, objs )
+
+  ffi = FFI()
+  ffi.cdef( '\n'.join( 'int f{}();'.format( i ) for i in range( 4 ) ) )
+  lib = ffi.dlopen( lib_file )
+  assert [ getattr( lib, 'f{}'.format( i ) )() for i in range( 4 ) ] == range( 4 )
+
+#-----------------------------------------------------------------------
+# test_compile_objects_error
+#-----------------------------------------------------------------------
+def test_compile_objects_error( tmpdir ):
+  src = tmpdir.join( 'bad.cpp' )
+  src.write( 'int f() { return }\n' )
+  with pytest.raises( Exception ) as e:
+    compile_objects( '-O0 -fPIC', [], str( tmpdir ), [ str( src ) ], 2 )
+  assert 'Compilation error' in str( e.value )
+
+#-----------------------------------------------------------------------
+# test_compile_objects_cache
+#-----------------------------------------------------------------------
+def test_compile_objects_cache( tmpdir, monkeypatch ):
+
+  import verilator_cffi
+  from build_cache import BuildCache
+
+  src = tmpdir.join( 'runtime.cpp' )
+  src.write( 'int runtime() { return 42; }\n' )
+
+  ncompiles = []
+  def counting_compile( *args ):
+    ncompiles.append( args )
+    compile( *args )
+  monkeypatch.setattr( verilator_cffi, 'compile', counting_compile )
+
+  cache = BuildCache( str( tmpdir.join( 'cache' ) ) )
+  for obj_dir in [ 'obj_dir_a', 'obj_dir_b' ]:
+    objs = compile_objects( '-O0 -fPIC', [], str( tmpdir.mkdir( obj_dir ) ),
+                            [ str( src ) ], cache=cache )
+    assert os.path.exists( objs[0] )
+  assert len( ncompiles ) == 1
+
+  # Different flags are a different cache entry
+
+  compile_objects( '-O2 -fPIC', [], str( tmpdir.join( 'obj_dir_a' ) ),
+                   [ str( src ) ], cache=cache )
+  assert len( ncompiles ) == 2
+
+#-----------------------------------------------------------------------
+# test_port_words
+#-----------------------------------------------------------------------
+def test_port_words():
+
+  ports = [ InPort( 8 ), InPort( 48 ), InPort( 100 ) ]
+  for i, port in enumerate( ports ):
+    port.name = 'p{}'.format( i )
+
+  layout = get_port_words( ports )
+  assert [ ( offset, nwords ) for _, offset, nwords in layout ] == \
+         [ ( 0, 1 ), ( 1, 2 ), ( 3, 4 ) ]
+
+  assert set_input_stmt( ports[0], 1 ) == [ 's.p0' ]
+  assert set_input_stmt( ports[1], 2 ) == [ 's.p1[0:32]', 's.p1[32:48]' ]
+
+  comb, next_ = set_output_stmt( ports[1], 1, 2, 1 )
+  assert comb  == 'def comb_1(): s.p1.value = out[1] | out[2] << 32'
+  assert next_ == 'def next_1(): s.p1.next = out[1] | out[2] << 32'
+
+#-----------------------------------------------------------------------
+# test_verilate_model_flags
+#-----------------------------------------------------------------------
+def test_verilate_model_flags( tmpdir, monkeypatch ):
+
+  import verilator_cffi
+
+  cmds = []
+  monkeypatch.chdir( tmpdir )
+  monkeypatch.setattr( verilator_cffi, 'check_output',
+                       lambda cmd, **kwargs: cmds.append( cmd ) )
+
+  verilator_cffi.verilate_model( 'Foo.v', 'Foo', False, False )
+  assert '--threads' not in cmds[-1]
+
+  verilator_cffi.verilate_model( 'Foo.v', 'Foo', False, False, threads=4,
+                                 verilator_flags=[ '--x-assign fast' ] )
+  assert '--threads 4'     in cmds[-1]
+  assert '--x-assign fast' in cmds[-1]
+
+  with pytest.raises( VerilatorCompileError ):
+    verilator_cffi.verilate_model( 'Foo.v', 'Foo', False, False, threads=0 )
+
+#-----------------------------------------------------------------------
+# Stub Verilated model
+#-----------------------------------------------------------------------
+# The tests below build the generated C and Python wrappers against a
+# stub Verilated model written by hand, so that they do not need
+# Verilator. The stub passes in48 and in100 through to out48 and out100,
+# registers in100 into reg100, and counts the cycles where en is set in
+# count.
+
+class StubModel( Model ):
+  def __init__( s ):
+    s.en     = InPort ( 1   )
+    s.in48   = InPort ( 48  )
+    s.in100  = InPort ( 100 )
+    s.out48  = OutPort( 48  )
+    s.out100 = OutPort( 100 )
+    s.reg100 = OutPort( 100 )
+    s.count  = OutPort( 32  )
+
+stub_verilated_h = '''
+#include <stdlib.h>
+#include <stdint.h>
+typedef uint64_t vluint64_t;
+struct Verilated {
+  static void randReset( int ) {}
+};
+'''
+
+stub_model_h = '''
+#include <string.h>
+class V{name} {
+ public:
+  unsigned char  clk, reset, en, prev_clk;
+  unsigned long  in48, out48;
+  unsigned int   in100[4], out100[4], reg100[4], count;
+  V{name}() { memset( this, 0, sizeof( *this ) ); }
+  void eval() {
+    if ( clk && !prev_clk ) {
+      memcpy( reg100, in100, sizeof( in100 ) );
+      count = reset ? 0 : count + en;
+    }
+    prev_clk = clk;
+    out48 = in48;
+    memcpy( out100, in100, sizeof( in100 ) );
+  }
+  void final() {}
+};
+'''
+
+def build_stub_model( tmpdir, monkeypatch ):
+
+  import verilator_cffi
+  import verilog_structural
+
+  monkeypatch.chdir( tmpdir )
+
+  model = StubModel()
+  model.elaborate()
+  name  = model.class_name
+
+  for port in model.get_ports():
+    port.verilog_name   = verilog_structural.mangle_name( port.name )
+    port.verilator_name = verilator_cffi.verilator_mangle( port.verilog_name )
+
+  obj_dir = tmpdir.mkdir( 'obj_dir_' + name )
+  obj_dir.join( 'V{}.h'.format( name ) ).write(
+    stub_model_h.replace( '{name}', name ) )
+  tmpdir.join( 'verilated.h'       ).write( stub_verilated_h )
+  tmpdir.join( 'verilated_vcd_c.h' ).write( '' )
+
+  c_wrapper_file  = 'V{}_v.cpp'.format( name )
+  lib_file        = 'libV{}_v.so'.format( name )
+  py_wrapper_file = 'V{}_v.py'.format( name )
+
+  cdefs = verilator_cffi.create_c_wrapper( model, c_wrapper_file, False,
+                                           False, 'zeros' )
+  compile( '-shared -fPIC', [ str( tmpdir ) ], lib_file, [ c_wrapper_file ] )
+  verilator_cffi.create_verilator_py_wrapper( model, py_wrapper_file,
+                                              lib_file, cdefs, False )
+
+  module = imp.load_source( 'V{}_v'.format( name ), py_wrapper_file )
+  model  = getattr( module, name )()
+  model.elaborate()
+
+  sim = SimulationTool( model )
+  sim.reset()
+  return model, sim
+
+#-----------------------------------------------------------------------
+# test_eval_io
+#-----------------------------------------------------------------------
+# Ports are exchanged through the packed buffers, including ports which
+# span several words with a partial top word, and only changed outputs
+# are written back.
+def test_eval_io( tmpdir, monkeypatch ):
+
+  model, sim = build_stub_model( tmpdir, monkeypatch )
+
+  values = [
+    ( 0,                0                                     ),
+    ( 2**48-1,          2**100-1                              ),
+    ( 0x800000000001,   0x8000000010000000200000003           ),
+    ( 0x0000ffffffff,   0xfffffffff00000000ffffffff           ),
+    ( 0x123456789abc,   0xa5a5a5a5a5a5a5a5a5a5a5a5a           ),
+  ]
+
+  model.en.value = 1
+  for i, ( v48, v100 ) in enumerate( values ):
+
+    model.in48.value  = v48
+    model.in100.value = v100
+    sim.eval_combinational()
+
+    assert model.out48  == v48
+    assert model.out100 == v100
+
+    sim.cycle()
+
+    assert model.reg100 == v100
+    assert model.count  == i + 1
+
+  # Outputs which did not change keep their values
+
+  model.en.value = 0
+  sim.cycle()
+  sim.cycle()
+
+  assert model.out48  == values[-1][0]
+  assert model.out100 == values[-1][1]
+  assert model.count  == len( values )
+
+#-----------------------------------------------------------------------
+# test_run_native
+#-----------------------------------------------------------------------
+def test_run_native( tmpdir, monkeypatch ):
+
+  model, sim = build_stub_model( tmpdir, monkeypatch )
+
+  model.en.value = 0
+  sim.eval_combinational()
+
+  # Inputs not given in a vector keep their previous value, and all
+  # inputs hold after the stimulus runs out. We stop before the clock
+  # edge of the cycle where count reaches 3.
+
+  stimulus = [ { 'en' : 1, 'in48' : 5 }, { 'en' : 0 }, { 'en' : 1 } ]
+
+  ncycles, responses = model.run_native( 20, stop_on_port='count',
+                                         stop_value=3, stimulus=stimulus,
+                                         response=True )
+  assert ncycles == 4
+  assert [ x['count'] for x in responses ] == [ 0, 1, 1, 2, 3 ]
+  assert [ x['out48'] for x in responses ] == [ 5, 5, 5, 5, 5 ]
+  assert model.count == 3
+  assert model.out48 == 5
+
+  # Without stimulus the inputs hold their last values
+
+  assert model.run_native( 3 ) == 3
+  assert model.count == 6
+
+  # Wide ports are returned across all of their words
+
+  value = 0xfedcba9876543210fedcba987
+  ncycles, responses = model.run_native( 2, stimulus=[ { 'in100' : value } ],
+                                         response=True )
+  assert ncycles == 2
+  assert [ x['out100'] for x in responses ] == [ value, value ]
+  assert model.reg100 == value
+
+  with pytest.raises( ValueError ):
+    model.run_native( 1, stop_on_port='out48' )
@@ -9,23 +9,41 @@ import sys
 import filecmp
 import verilog
 
-from os.path        import exists
-from verilator_cffi import verilog_to_pymtl
+from os.path          import exists
+from verilator_cffi   import verilog_to_pymtl, get_opt_flag
+from verilator_cffi   import get_verilator_version, get_wrapper_templates
+from build_cache      import BuildCache, cache_key
+from build_timer      import BuildTimer, timing_enabled
+from ..simulation.vcd import get_vcd_timescale
 
 #-----------------------------------------------------------------------
 # TranslationTool
 #-----------------------------------------------------------------------
-def TranslationTool( model_inst, lint=False, enable_blackbox=False, verilator_xinit="zeros" ):
+def TranslationTool( model_inst, lint=False, enable_blackbox=False,
+                     verilator_xinit="zeros", threads=None,
+                     verilator_flags=None, timing=False ):
   """Translates a PyMTL model into Python-wrapped Verilog.
 
   model_inst:      an un-elaborated Model instance
   lint:            run verilator linter, warnings are fatal
                    (disables -Wno-lint flag)
   enable_blackbox: also generate a .v file with black boxes
+  threads:         number of threads to partition the Verilated model
+                   into (verilator --threads)
+  verilator_flags: list of extra flags passed to verilator
+                   (e.g., [ '--x-assign fast', '--noassert' ])
+  timing:          print a breakdown of the build time and store it as
+                   a dict in the build_timing attribute of the returned
+                   model (also enabled by PYMTL_BUILD_TIMING)
+
+  Built models are shared between processes and directories through the
+  global build cache, see build_cache.py.
   """
 
   model_inst.elaborate()
 
+  timer = BuildTimer( model_inst.class_name )
+
   # Translate the PyMTL module to Verilog, if we've already done
   # translation check if there's been any changes to the source
   model_name      = model_inst.class_name
@@ -46,23 +64,34 @@ def TranslationTool( model_inst, lint=False, enable_blackbox=False, verilator_xi
     vcd_en = False
 
   # Write the output to a temporary file
-  with open( temp_file, 'w+' ) as fd:
-    verilog.translate( model_inst, fd, verilator_xinit=verilator_xinit )
+  with timer.phase( 'translation' ), open( temp_file, 'w+' ) as fd:
+    verilog.translate( model_inst, fd, verilator_xinit=verilator_xinit,
+                       timer=timer )
 
   # write Verilog with black boxes
   if enable_blackbox:
-    with open( blackbox_file, 'w+' ) as fd:
+    with timer.phase( 'translation' ), open( blackbox_file, 'w+' ) as fd:
       verilog.translate( model_inst, fd, enable_blackbox=True, verilator_xinit=verilator_xinit )
 
+  # Key the build on everything that goes into it, including the
+  # verilator options which are not part of the Verilog source
+
+  key = get_cache_key( model_inst, temp_file, vcd_en, lint,
+                       verilator_xinit, threads, verilator_flags )
+
   # Check if the temporary file matches an existing file (caching)
 
-  cached = False
-  if (     exists(verilog_file)
+  cache       = BuildCache()
+  cached      = False
+  build_stamp = os.path.join( obj_dir, 'pymtl_build_key' )
+  if (     not cache.enabled
+       and exists(verilog_file)
        and exists(py_wrapper_file)
        and exists(lib_file)
-       and exists(obj_dir) ):
+       and exists(build_stamp) ):
 
-    cached = filecmp.cmp( temp_file, verilog_file )
+    with open( build_stamp ) as fd:
+      cached = filecmp.cmp( temp_file, verilog_file ) and fd.read() == key
 
     # if not cached:
     #   os.system( ' diff %s %s'%( temp_file, verilog_file ))
@@ -70,25 +99,83 @@ def TranslationTool( model_inst, lint=False, enable_blackbox=False, verilator_xi
   # Rename temp to actual output
   os.rename( temp_file, verilog_file )
 
-  # Verilate the module only if we've updated the verilog source
-  if not cached:
-    #print( "NOT CACHED", verilog_file )
+  def build():
     verilog_to_pymtl( model_inst, verilog_file, c_wrapper_file,
                       lib_file, py_wrapper_file, vcd_en, lint,
-                      verilator_xinit )
+                      verilator_xinit, threads=threads,
+                      verilator_flags=verilator_flags, timer=timer )
+
+  # With the global build cache enabled, only verilate if no process has
+  # built the model before. Otherwise verilate the module only if we've
+  # updated the verilog source or the verilator options
+
+  if cache.enabled:
+    with cache.lock( key ):
+      with timer.phase( 'build cache' ):
+        cached = cache.fetch( key, [ lib_file, py_wrapper_file ] )
+      if not cached:
+        build()
+        with timer.phase( 'build cache' ):
+          cache.store( key, [ lib_file, py_wrapper_file ] )
+
+  elif not cached:
+    #print( "NOT CACHED", verilog_file )
+    build()
+    with open( build_stamp, 'w' ) as fd:
+      fd.write( key )
   #else:
   #  print( "CACHED", verilog_file )
 
-  # Use some trickery to import the verilated version of the model
-  sys.path.append( os.getcwd() )
-  __import__( py_wrapper_file[:-3] )
-  imported_module = sys.modules[ py_wrapper_file[:-3] ]
+  timer.add_cache( 'library', cached )
+
+  # Use some trickery to import the verilated version of the model. The
+  # library itself is loaded when the model is instantiated.
+  with timer.phase( 'import' ):
+    sys.path.append( os.getcwd() )
+    __import__( py_wrapper_file[:-3] )
+    imported_module = sys.modules[ py_wrapper_file[:-3] ]
 
-  # Get the model class from the module, instantiate and elaborate it
-  model_class = imported_module.__dict__[ model_name ]
-  model_inst  = model_class()
+    # Get the model class from the module, instantiate and elaborate it
+    model_class = imported_module.__dict__[ model_name ]
+    model_inst  = model_class()
 
   if vcd_en:
     model_inst.vcd_file = vcd_file
 
+  if timing_enabled( timing ):
+    timer.add_artifacts( verilog_file, obj_dir, lib_file, py_wrapper_file )
+    timer.print_report()
+    model_inst.build_timing = timer.as_dict()
+
   return model_inst
+
+#-----------------------------------------------------------------------
+# get_cache_key
+#-----------------------------------------------------------------------
+# Hash everything which affects the Verilated model library and wrapper.
+
+def get_cache_key( model_inst, verilog_file, vcd_en, lint, verilator_xinit,
+                   threads=None, verilator_flags=None ):
+
+  try:
+    vlinetrace = model_inst.vlinetrace
+  except AttributeError:
+    vlinetrace = False
+
+  with open( verilog_file ) as fd:
+    verilog_src = fd.read()
+
+  return cache_key(
+    model_inst.class_name,
+    verilog_src,
+    get_verilator_version(),
+    vcd_en,
+    lint,
+    verilator_xinit,
+    vlinetrace,
+    get_vcd_timescale( model_inst ),
+    get_opt_flag(),
+    threads,
+    list( verilator_flags or [] ),
+    *get_wrapper_templates()
+  )
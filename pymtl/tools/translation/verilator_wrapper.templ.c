@@ -7,6 +7,7 @@
 
 #include "obj_dir_{model_name}/V{model_name}.h"
 #include "stdio.h"
+#include "string.h"
 #include "stdint.h"
 #include "verilated.h"
 #include "verilated_vcd_c.h"
@@ -17,6 +18,10 @@
 // set to true when Verilog module has line tracing
 #define VLINETRACE {vlinetrace}
 
+// number of 32-bit words in the packed input and output buffers
+#define N_IN_WORDS  {n_in_words}
+#define N_OUT_WORDS {n_out_words}
+
 #if VLINETRACE
 #include "obj_dir_{model_name}/V{model_name}__Syms.h"
 #include "svdpi.h"
@@ -52,6 +57,11 @@ extern "C" {{
   V{model_name}_t * create_model( const char * );
   void destroy_model( V{model_name}_t *);
   void eval( V{model_name}_t * );
+  int  eval_io( V{model_name}_t *, const uint32_t *, uint32_t *, uint32_t *, int );
+  int  tick_io( V{model_name}_t *, uint32_t *, uint32_t *, int );
+  uint32_t run_native( V{model_name}_t *, uint32_t, const uint32_t *, uint32_t,
+                       uint32_t *, uint32_t *, uint32_t *,
+                       int, uint32_t, uint32_t );
 
   #if VLINETRACE
   void trace( V{model_name}_t *, char * );
@@ -174,6 +184,131 @@ void eval( V{model_name}_t * m ) {{
 
 }}
 
+//----------------------------------------------------------------------
+// sync_word()
+//----------------------------------------------------------------------
+// Write one word of an output port into the output buffer, returning
+// true if the word changed.
+
+static inline int sync_word( uint32_t * out, uint32_t value ) {{
+  int changed = ( *out != value );
+  *out = value;
+  return changed;
+}}
+
+//----------------------------------------------------------------------
+// sync_outputs()
+//----------------------------------------------------------------------
+// Pack all output ports into the output buffer, which also holds the
+// output values from the previous call. The index of every output port
+// which changed (or every port if force is set) is written to changed.
+// Returns the number of changed output ports.
+
+static int sync_outputs( V{model_name}_t * m, uint32_t * out,
+                         uint32_t * changed, int force ) {{
+
+  int n = 0;
+
+  {pack_outputs}
+
+  return n;
+}}
+
+//----------------------------------------------------------------------
+// unpack_inputs()
+//----------------------------------------------------------------------
+// Write all input ports from the input buffer.
+
+static void unpack_inputs( V{model_name}_t * m, const uint32_t * in ) {{
+
+  {unpack_inputs}
+
+}}
+
+//----------------------------------------------------------------------
+// eval_io()
+//----------------------------------------------------------------------
+// Unpack all input ports from the input buffer, simulate one time-step
+// and pack the output ports into the output buffer, all in a single
+// call. Ports are packed into consecutive 32-bit words, least
+// significant word first.
+
+int eval_io( V{model_name}_t * m, const uint32_t * in, uint32_t * out,
+             uint32_t * changed, int force ) {{
+
+  unpack_inputs( m, in );
+
+  eval( m );
+
+  return sync_outputs( m, out, changed, force );
+}}
+
+//----------------------------------------------------------------------
+// tick_io()
+//----------------------------------------------------------------------
+// Simulate a rising clock edge and pack the output ports into the output
+// buffer.
+
+int tick_io( V{model_name}_t * m, uint32_t * out,
+             uint32_t * changed, int force ) {{
+
+  *m->clk = 0;
+  eval( m );
+  *m->clk = 1;
+  eval( m );
+
+  return sync_outputs( m, out, changed, force );
+}}
+
+//----------------------------------------------------------------------
+// run_native()
+//----------------------------------------------------------------------
+// Simulate up to ncycles cycles without returning to Python. Each cycle
+// we:
+//
+//  1. unpack the inputs for this cycle from the stimulus buffer, if
+//     there is one (nstim packed input vectors); after the stimulus runs
+//     out the inputs keep their last values
+//  2. evaluate the combinational logic and pack the outputs into out
+//  3. copy the outputs into the response buffer, if there is one
+//     (ncycles packed output vectors)
+//  4. stop if the output word stop_word masked by stop_mask equals
+//     stop_value (only if stop_word is not negative)
+//  5. simulate a rising clock edge
+//
+// Returns the number of cycles completed before stopping. On return, out
+// holds the current outputs.
+
+uint32_t run_native( V{model_name}_t * m, uint32_t ncycles,
+                     const uint32_t * stim, uint32_t nstim,
+                     uint32_t * resp, uint32_t * out, uint32_t * changed,
+                     int stop_word, uint32_t stop_mask, uint32_t stop_value ) {{
+
+  uint32_t i;
+  for ( i = 0; i < ncycles; i++ ) {{
+
+    if ( i < nstim )
+      unpack_inputs( m, stim + i*N_IN_WORDS );
+
+    eval( m );
+    sync_outputs( m, out, changed, 0 );
+
+    if ( resp )
+      memcpy( resp + i*N_OUT_WORDS, out, N_OUT_WORDS*sizeof(uint32_t) );
+
+    if ( stop_word >= 0 && ( out[stop_word] & stop_mask ) == stop_value )
+      return i;
+
+    *m->clk = 0;
+    eval( m );
+    *m->clk = 1;
+    eval( m );
+  }}
+
+  sync_outputs( m, out, changed, 0 );
+  return i;
+}}
+
 //----------------------------------------------------------------------
 // trace()
 //----------------------------------------------------------------------
@@ -15,6 +15,12 @@ from cffi  import FFI
 class {model_name}( Model ):
   id_ = 0
 
+  # Layout of the packed port buffers, port name -> ( offset, nwords )
+  _in_layout  = {in_layout}
+  _out_layout = {out_layout}
+  _n_in_words  = {n_in_words}
+  _n_out_words = {n_out_words}
+
   def __init__( s ):
 
     # initialize FFI, define the exposed interface
@@ -36,6 +42,11 @@ class {model_name}( Model ):
       V{model_name}_t * create_model( const char * );
       void destroy_model( V{model_name}_t *);
       void eval( V{model_name}_t * );
+      int  eval_io( V{model_name}_t *, uint32_t *, uint32_t *, uint32_t *, int );
+      int  tick_io( V{model_name}_t *, uint32_t *, uint32_t *, int );
+      uint32_t run_native( V{model_name}_t *, uint32_t, uint32_t *, uint32_t,
+                           uint32_t *, uint32_t *, uint32_t *,
+                           int, uint32_t, uint32_t );
       void trace( V{model_name}_t *, char * );
 
     ''')
@@ -80,6 +91,31 @@ class {model_name}( Model ):
 
     s._m = s._ffi.create_model( s.ffi.new("char[]", verilator_vcd_file) )
 
+    # Ports are exchanged with the model through packed buffers of 32-bit
+    # words in a single call per eval. The model reports which outputs
+    # changed since the last call and only those are written back. The
+    # first call forces all outputs to be written.
+
+    m       = s._m
+    eval_io = s._ffi.eval_io
+    tick_io = s._ffi.tick_io
+    in_buf  = s.ffi.new( "uint32_t[{n_in_words}]" )
+    out     = s.ffi.new( "uint32_t[{n_out_words}]" )
+    changed = s.ffi.new( "uint32_t[{n_outs}]" )
+    force   = [ 1 ]
+
+    # output writers, indexed by output port
+    {set_comb}
+    {set_next}
+
+    comb_writers = [ {comb_funcs} ]
+    next_writers = [ {next_funcs} ]
+
+    s._in_buf       = in_buf
+    s._out_buf      = out
+    s._changed      = changed
+    s._comb_writers = comb_writers
+
     @s.combinational
     def logic():
 
@@ -87,23 +123,100 @@ class {model_name}( Model ):
       {set_inputs}
 
       # execute combinational logic
-      s._ffi.eval( s._m )
+      nchanged = eval_io( m, in_buf, out, changed, force[0] )
+      force[0] = 0
 
-      # set outputs
+      # set changed outputs
       # FIXME: currently write all outputs, not just combinational outs
-      {set_comb}
+      for i in changed[0:nchanged]:
+        comb_writers[i]()
 
     @s.posedge_clk
     def tick():
 
-      s._m.clk[0] = 0
-      s._ffi.eval( s._m )
-      s._m.clk[0] = 1
-      s._ffi.eval( s._m )
+      nchanged = tick_io( m, out, changed, force[0] )
+      force[0] = 0
 
-      # double buffer register outputs
+      # double buffer changed register outputs
       # FIXME: currently write all outputs, not just registered outs
-      {set_next}
+      for i in changed[0:nchanged]:
+        next_writers[i]()
+
+  def run_native( s, ncycles, stop_on_port=None, stop_value=1,
+                  stimulus=None, response=False ):
+    """Simulate up to ncycles cycles entirely inside the Verilated model.
+
+    stop_on_port: name of an output port (at most 32 bits); stop before
+                  the clock edge of the first cycle where it equals
+                  stop_value
+    stimulus:     list of dictionaries mapping input port names to values,
+                  one per cycle; ports not given keep their last value,
+                  and all inputs hold after the stimulus runs out
+    response:     if true, also return a list of dictionaries with the
+                  output port values of every cycle
+
+    Returns the number of cycles completed, plus the responses if
+    requested. All outputs are written back to the PyMTL ports, but the
+    input ports and the simulator cycle count are not updated.
+    """
+
+    ffi = s.ffi
+
+    # Pack the stimulus, starting from the inputs last driven
+
+    stim  = ffi.NULL
+    nstim = 0
+    if stimulus:
+      n     = s._n_in_words
+      row   = list( s._in_buf[0:n] )
+      nstim = len( stimulus )
+      stim  = ffi.new( "uint32_t[]", nstim * n )
+      for i, vector in enumerate( stimulus ):
+        for name, value in vector.items():
+          offset, nwords = s._in_layout[ name ]
+          value = int( value )
+          for j in range( nwords ):
+            row[ offset+j ] = ( value >> 32*j ) & 0xffffffff
+        stim[ i*n:(i+1)*n ] = row
+
+    # Find the output word to stop on
+
+    stop_word = -1
+    if stop_on_port is not None:
+      stop_word, nwords = s._out_layout[ stop_on_port ]
+      if nwords != 1:
+        raise ValueError( "run_native can only stop on ports of at most "
+                          "32 bits!" )
+
+    resp = ffi.new( "uint32_t[]", ncycles * s._n_out_words ) if response \
+           else ffi.NULL
+
+    ncompleted = s._ffi.run_native( s._m, ncycles, stim, nstim, resp,
+                                    s._out_buf, s._changed, stop_word,
+                                    0xffffffff, int( stop_value ) )
+
+    # Write all outputs back to the PyMTL ports
+
+    for write in s._comb_writers:
+      write()
+
+    if not response:
+      return ncompleted
+
+    # Unpack one dictionary of output values per simulated cycle,
+    # including the cycle we stopped on
+
+    nrows     = min( ncompleted + 1, ncycles )
+    n         = s._n_out_words
+    responses = []
+    for i in range( nrows ):
+      words = resp[ i*n:(i+1)*n ]
+      responses.append({{
+        name : sum( words[ offset+j ] << 32*j for j in range( nwords ) )
+        for name, ( offset, nwords ) in s._out_layout.items()
+      }})
+
+    return ncompleted, responses
 
   def line_trace( s ):
     if {vlinetrace}:
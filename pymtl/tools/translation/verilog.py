@@ -5,22 +5,35 @@
 
 from __future__ import print_function
 
+import os
+import re
 import sys
+import time
+import types
+import inspect
+import hashlib
+import StringIO
 import collections
 import tempfile
 
-from subprocess         import check_output, STDOUT, CalledProcessError
-from verilog_structural import *
-from verilog_behavioral import translate_logic_blocks
-from exceptions         import IVerilogCompileError
+from subprocess          import check_output, STDOUT, CalledProcessError
+from verilog_structural  import *
+from verilog_behavioral  import translate_logic_blocks
+from exceptions          import IVerilogCompileError
+from build_cache         import BuildCache, cache_key
 
-from ..integration      import verilog
+from ..integration       import verilog
+from ...model.Model      import Model
+from ...model.signals    import Signal
+from ...model.PortBundle import PortBundle
 
 #-----------------------------------------------------------------------
 # translate
 #-----------------------------------------------------------------------
-# Generates Verilog source from a PyMTL model.
-def translate( model, o=sys.stdout, enable_blackbox=False, verilator_xinit='zeros' ):
+# Generates Verilog source from a PyMTL model. If a BuildTimer is given,
+# the translation time of each module is recorded in it.
+def translate( model, o=sys.stdout, enable_blackbox=False, verilator_xinit='zeros',
+               timer=None ):
 
   # List of models to translate
   translation_queue = collections.OrderedDict()
@@ -36,15 +49,25 @@ def translate( model, o=sys.stdout, enable_blackbox=False, verilator_xinit='zero
     for subm in m.get_submodules():
       collect_all_models( subm )
 
-  # Collect all submodels in design and translate them
+  # Collect all submodels in design and translate them. Module bodies are
+  # reused from the translation cache when their inputs are unchanged.
+  cache = BuildCache()
+
   collect_all_models( model )
   for k, v in translation_queue.items():
+    start  = time.time()
+    cached = False
     if isinstance( v, verilog.VerilogModel ):
       x = verilog.import_module( v, o )
       if x not in append_queue:
         append_queue.append( x )
+    elif cache.enabled:
+      cached = translate_module_cached( v, o, cache, enable_blackbox,
+                                        verilator_xinit )
     else:
       translate_module( v, o, enable_blackbox, verilator_xinit )
+    if timer:
+      timer.add_module( k, time.time() - start, cached )
 
   # Append source code for imported modules and dependecies
   verilog.import_sources( append_queue, o )
@@ -84,6 +107,193 @@ def translate_module( model, o, enable_blackbox=False, verilator_xinit='zeros' )
 
   print( file=o )
 
+#-----------------------------------------------------------------------
+# translate_module_cached
+#-----------------------------------------------------------------------
+# Translate a single module, reusing the generated Verilog from a previous
+# translation if nothing it depends on has changed. Translated modules are
+# kept both in memory for the lifetime of the process and in the build
+# cache on disk. Returns True if a previous translation was reused.
+
+_translated = {}
+
+def translate_module_cached( model, o, cache=None, enable_blackbox=False,
+                             verilator_xinit='zeros' ):
+
+  key = get_module_key( model, enable_blackbox, verilator_xinit )
+  if key is None:
+    translate_module( model, o, enable_blackbox, verilator_xinit )
+    return False
+
+  cache = cache or BuildCache()
+  src   = _translated.get( key )
+
+  if src is None and cache.enabled:
+    src = cache.load( key, 'module.v' )
+
+  cached = src is not None
+  if not cached:
+    buf = StringIO.StringIO()
+    translate_module( model, buf, enable_blackbox, verilator_xinit )
+    src = buf.getvalue()
+    if cache.enabled:
+      cache.save( key, 'module.v', src )
+
+  _translated[ key ] = src
+  o.write( src )
+  return cached
+
+#-----------------------------------------------------------------------
+# get_module_key
+#-----------------------------------------------------------------------
+# Return a cache key for the translation of a single module, or None if
+# the model's source cannot be found. The class_name only hashes the
+# hashable elaboration parameters, so the key also covers all parameters,
+# the source files of the model class and its base classes, the globals
+# and closure values referenced by its concurrent blocks (which are
+# translated into localparams), the module's interface and connections,
+# and the translator itself.
+
+def get_module_key( model, enable_blackbox=False, verilator_xinit='zeros' ):
+
+  try:
+    class_src = [ _file_hash( inspect.getsourcefile( c ) )
+                  for c in type( model ).__mro__
+                  if c not in ( Model, object ) ]
+    blocks        = ( model.get_combinational_blocks() +
+                      model.get_posedge_clk_blocks() +
+                      model.get_tick_blocks() )
+    block_globals = [ _globals_hash( func ) for func in blocks ]
+    block_consts  = [ _closure_hash( func, model ) for func in blocks ]
+  except ( TypeError, IOError, OSError ):
+    return None
+
+  signals = [ _signal_hash( x ) for x in model.get_ports() + model.get_wires() ]
+
+  # The instantiation of each submodule declares and connects all of its
+  # ports, so the key covers the submodule's interface as well
+
+  submodels = [ ( x.name, x.class_name, x.vbb_modulename, x.vblackbox,
+                  x.vbb_no_reset, x.vbb_no_clk,
+                  [ _signal_hash( p ) for p in x.get_ports() ] )
+                for x in model.get_submodules() ]
+
+  connections = sorted(
+    ( signal_to_str( c.dest_node, c.dest_slice, model ),
+      signal_to_str( c.src_node,  c.src_slice,  model ) )
+    for c in model.get_connections()
+  )
+
+  args = sorted( model._args.items() ) if hasattr( model, '_args' ) else None
+
+  return cache_key(
+    'verilog-module',
+    model.class_name,
+    _repr( args ),
+    enable_blackbox,
+    verilator_xinit,
+    hasattr( model, 'vcd_file' ) and model.vcd_file != '',
+    model.vblackbox,
+    model.vbb_modulename,
+    model.vbb_no_reset,
+    model.vbb_no_clk,
+    sorted( model.vannotate_arrays.items() ),
+    model.vmark_as_bram,
+    class_src,
+    block_globals,
+    block_consts,
+    signals,
+    submodels,
+    connections,
+    _translator_hash(),
+  )
+
+#-----------------------------------------------------------------------
+# Source hashing helpers
+#-----------------------------------------------------------------------
+# File hashes are memoized on the file's modification time and size so
+# that repeated translations in the same process do not reread sources.
+# Objects without a source file are hashed by their repr, with any memory
+# address removed so that keys are stable across processes.
+
+_file_hashes = {}
+
+def _file_hash( filename ):
+  stat = os.stat( filename )
+  memo = ( filename, stat.st_mtime, stat.st_size )
+  if memo not in _file_hashes:
+    with open( filename, 'rb' ) as fd:
+      _file_hashes[ memo ] = hashlib.sha1( fd.read() ).hexdigest()
+  return _file_hashes[ memo ]
+
+def _object_hash( obj ):
+  if isinstance( obj, ( types.ModuleType, type, types.ClassType,
+                        types.FunctionType ) ):
+    try:
+      return _file_hash( inspect.getsourcefile( obj ) )
+    except TypeError:
+      return _repr( obj )
+  return _repr( obj )
+
+def _repr( obj ):
+  return re.sub( r' at 0x[0-9a-fA-F]+', '', repr( obj ) )
+
+def _type_hash( dtype ):
+  return _object_hash( type( dtype ) ), _repr( dtype )
+
+def _signal_hash( signal ):
+  return ( signal.name, signal.nbits, type( signal ).__name__,
+           _type_hash( signal.dtype ) )
+
+def _globals_hash( func ):
+  return [ ( name, _object_hash( func.func_globals[ name ] ) )
+           for name in _code_names( func.func_code )
+           if name in func.func_globals ]
+
+# Values captured by the closure of a block, and attributes of the model
+# read by the block which are not part of its structure, are translated
+# into localparams, so their values are part of the key.
+
+def _closure_hash( func, model ):
+  if not func.func_closure:
+    return []
+
+  closure = zip( func.func_code.co_freevars,
+                 [ x.cell_contents for x in func.func_closure ] )
+
+  consts = [ ( name, _value_hash( value ) ) for name, value in closure
+             if value is not model ]
+
+  if any( value is model for _, value in closure ):
+    consts += [ ( name, _value_hash( getattr( model, name ) ) )
+                for name in sorted( set( _code_names( func.func_code ) ) )
+                if name in model.__dict__ ]
+
+  return consts
+
+def _value_hash( obj ):
+  if isinstance( obj, ( Signal, PortBundle, Model ) ):
+    return type( obj ).__name__, getattr( obj, 'name', None )
+  if isinstance( obj, ( list, tuple ) ):
+    return [ _value_hash( x ) for x in obj ]
+  if isinstance( obj, dict ):
+    return sorted( ( _repr( k ), _value_hash( v ) ) for k, v in obj.items() )
+  return _object_hash( obj )
+
+def _code_names( code ):
+  names = list( code.co_names )
+  for const in code.co_consts:
+    if isinstance( const, types.CodeType ):
+      names.extend( _code_names( const ) )
+  return names
+
+def _translator_hash():
+  import verilog_structural, verilog_behavioral, visitors
+  from .. import ast_helpers
+  modules = [ sys.modules[ __name__ ], verilog_structural,
+              verilog_behavioral, visitors, ast_helpers ]
+  return [ _file_hash( inspect.getsourcefile( x ) ) for x in modules ]
+
 #-----------------------------------------------------------------------
 # check_compile
 #-----------------------------------------------------------------------
@@ -0,0 +1,219 @@
+#=======================================================================
+# verilog_cache_test.py
+#=======================================================================
+
+import StringIO
+import pytest
+
+from pymtl import *
+
+import verilog
+import verilog_cache_test
+
+#-----------------------------------------------------------------------
+# Models
+#-----------------------------------------------------------------------
+
+class Inverter( Model ):
+  def __init__( s, nbits ):
+    s.in_ = InPort ( nbits )
+    s.out = OutPort( nbits )
+
+    @s.combinational
+    def logic():
+      s.out.value = ~s.in_
+
+class InverterChain( Model ):
+  def __init__( s, nbits, nstages ):
+    s.in_ = InPort ( nbits )
+    s.out = OutPort( nbits )
+    s.inv = [ Inverter( nbits ) for _ in range( nstages ) ]
+
+    s.connect( s.in_, s.inv[0].in_ )
+    for i in range( 1, nstages ):
+      s.connect( s.inv[i-1].out, s.inv[i].in_ )
+    s.connect( s.inv[-1].out, s.out )
+
+# Two versions of the same submodule, which only differ in their ports.
+# Wrapper instantiates whichever one is currently bound to Sub, so its
+# own source and parameters are the same for both.
+
+class SubV1( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+
+    @s.combinational
+    def logic():
+      s.out.value = s.in_
+
+class SubV2( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+    s.dbg = OutPort( 8 )
+
+    @s.combinational
+    def logic():
+      s.out.value = s.in_
+      s.dbg.value = s.in_
+
+SubV1.__name__ = SubV2.__name__ = 'Sub'
+
+Sub = SubV1
+
+class Wrapper( Model ):
+  def __init__( s ):
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+    s.sub = Sub()
+    s.connect( s.in_, s.sub.in_ )
+    s.connect( s.out, s.sub.out )
+
+# Constants captured by the closure of a block and attributes of the
+# model read by a block are translated into localparams, but are not
+# parameters of the model.
+
+class Config( object ):
+  INCR = 1
+
+class Incrementer( Model ):
+  def __init__( s ):
+    s.in_  = InPort ( 8 )
+    s.out  = OutPort( 8 )
+    s.out2 = OutPort( 8 )
+    s.incr = Config.INCR
+    inc    = Config.INCR
+
+    @s.combinational
+    def logic():
+      s.out.value  = s.in_ + inc
+      s.out2.value = s.in_ + s.incr
+
+#-----------------------------------------------------------------------
+# Fixtures
+#-----------------------------------------------------------------------
+
+@pytest.fixture
+def translations( tmpdir, monkeypatch ):
+  monkeypatch.setenv( 'PYMTL_CACHE_DIR', str( tmpdir.join( 'cache' ) ) )
+  monkeypatch.setattr( verilog, '_translated', {} )
+
+  translated = []
+  def counting_translate_logic_blocks( model ):
+    translated.append( model.class_name )
+    return translate_logic_blocks( model )
+
+  translate_logic_blocks = verilog.translate_logic_blocks
+  monkeypatch.setattr( verilog, 'translate_logic_blocks',
+                       counting_translate_logic_blocks )
+  return translated
+
+def translate( model ):
+  model.elaborate()
+  o = StringIO.StringIO()
+  verilog.translate( model, o )
+  return o.getvalue()
+
+#-----------------------------------------------------------------------
+# test_cache_hit
+#-----------------------------------------------------------------------
+def test_cache_hit( translations, monkeypatch ):
+  src = translate( InverterChain( 8, 3 ) )
+  assert len( translations ) == 2
+
+  # In memory
+
+  assert translate( InverterChain( 8, 3 ) ) == src
+  assert len( translations ) == 2
+
+  # On disk, e.g., from another process
+
+  monkeypatch.setattr( verilog, '_translated', {} )
+  assert translate( InverterChain( 8, 3 ) ) == src
+  assert len( translations ) == 2
+
+#-----------------------------------------------------------------------
+# test_cache_miss
+#-----------------------------------------------------------------------
+def test_cache_miss( translations ):
+  translate( InverterChain( 8, 3 ) )
+  del translations[:]
+
+  # Only the top module is translated again when its structure changes,
+  # while changing the bitwidth changes both modules.
+
+  model = InverterChain( 8, 4 )
+  translate( model )
+  assert translations == [ model.class_name ]
+  del translations[:]
+
+  translate( InverterChain( 16, 3 ) )
+  assert len( translations ) == 2
+
+#-----------------------------------------------------------------------
+# test_cache_disabled
+#-----------------------------------------------------------------------
+def test_cache_disabled( translations, monkeypatch ):
+  monkeypatch.setenv( 'PYMTL_CACHE_DIR', '' )
+  src = translate( InverterChain( 8, 3 ) )
+  assert translate( InverterChain( 8, 3 ) ) == src
+  assert len( translations ) == 4
+
+#-----------------------------------------------------------------------
+# test_cache_miss_submodule_ports
+#-----------------------------------------------------------------------
+def test_cache_miss_submodule_ports( translations, monkeypatch ):
+  src = translate( Wrapper() )
+  assert 'sub$dbg' not in src
+
+  monkeypatch.setattr( verilog_cache_test, 'Sub', SubV2 )
+  src = translate( Wrapper() )
+  assert 'wire   [   7:0] sub$dbg;' in src
+  assert '.dbg   ( sub$dbg ),' in src
+
+#-----------------------------------------------------------------------
+# test_globals_hash
+#-----------------------------------------------------------------------
+# Globals referenced from nested functions and generator expressions are
+# part of the key, and keys do not depend on memory addresses.
+
+SCALE = 1
+
+class Opaque( object ):
+  pass
+
+OPAQUE = Opaque()
+
+def test_globals_hash( monkeypatch ):
+
+  def func():
+    return [ x * SCALE for x in ( OPAQUE, ) ], lambda: SCALE
+
+  def gen():
+    return sum( x * SCALE for x in range( 4 ) )
+
+  for f in [ func, gen ]:
+    key = verilog._globals_hash( f )
+    assert 'SCALE' in [ name for name, _ in key ]
+    monkeypatch.setattr( verilog_cache_test, 'SCALE', 2 )
+    assert verilog._globals_hash( f ) != key
+    monkeypatch.setattr( verilog_cache_test, 'SCALE', 1 )
+
+  key = verilog._globals_hash( func )
+  assert ' at 0x' not in str( key )
+  monkeypatch.setattr( verilog_cache_test, 'OPAQUE', Opaque() )
+  assert verilog._globals_hash( func ) == key
+
+#-----------------------------------------------------------------------
+# test_cache_miss_closure
+#-----------------------------------------------------------------------
+def test_cache_miss_closure( translations, monkeypatch ):
+  src = translate( Incrementer() )
+  assert 'localparam inc = 1;'  in src
+  assert 'localparam incr = 1;' in src
+
+  monkeypatch.setattr( Config, 'INCR', 7 )
+  src = translate( Incrementer() )
+  assert 'localparam inc = 7;'  in src
+  assert 'localparam incr = 7;' in src